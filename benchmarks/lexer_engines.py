@@ -0,0 +1,39 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from py_compiler.lexer import Lexer, LEXER_ENGINES
+
+SAMPLE_FILES = ['CustomLang/libs/customlang/utils/array.lang',
+                'CustomLang/libs/customlang/utils/Syscall.lang',
+                'CustomLang/src/testfile.lang']
+
+def load_sample(repeat: int) -> str:
+    root = os.path.join(os.path.dirname(__file__), '..')
+    content = ''
+    for path in SAMPLE_FILES:
+        with open(os.path.join(root, path)) as file:
+            content += file.read().strip() + '\n'
+    return content * repeat
+
+def count_tokens(text: str, engine: str) -> tuple[int, float]:
+    lexer = Lexer(text, engine=engine)
+    start = time.perf_counter()
+    ntokens = 0
+    while lexer.next_token() is not None: ntokens += 1
+    return ntokens, time.perf_counter() - start
+
+if __name__ == '__main__':
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    text = load_sample(repeat)
+
+    print(f"Lexing {len(text)} characters ({text.count(chr(10))} lines)")
+    results = {}
+    for engine in LEXER_ENGINES:
+        ntokens, elapsed = count_tokens(text, engine)
+        results[engine] = ntokens / elapsed
+        print(f"{engine:>8}: {ntokens} tokens in {elapsed:.3f}s ({results[engine]:,.0f} tokens/sec)")
+
+    print(f"regex engine speedup over loop: {results['regex'] / results['loop']:.1f}x")
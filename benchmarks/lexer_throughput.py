@@ -0,0 +1,118 @@
+import mmap
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from py_compiler.lexer import Lexer
+
+# Corpus sizes in lines and where the results are written (next to the unit test results)
+SIZES = [1_000, 100_000, 10_000_000]
+MODES = ['next_token', 'tokenize_all']
+RESULTS_LOG = os.path.join(ROOT, 'tests', 'benchmark_results.log')
+
+def member_group(i: int) -> str:
+    # Class members mixing declarations, expressions, switch/case, asm and comments (all parseable)
+    return f"""    // Member group {i}
+    public static u32 count{i} = {i} * 3 + 0x1F;
+    static mut f32 ratio{i} = 1.5;
+
+    /* Computes a value for
+       member group {i} */
+    public u32 func compute{i}(u32 a, u32 b) {{
+        u32 total = (a + b) * {i % 7 + 1} - a / 3 % 5;
+        if (total > 100 && a != b) {{
+            total -= a << 2;
+        }} else {{
+            total += 'c';
+        }}
+        switch (total & 3) {{
+            case 0:
+                total += 1;
+                break;
+            case 1:
+                total *= b;
+                break;
+            default:
+                total = 0;
+        }}
+        asm {{"
+            mov rax, {i % 16}
+        "}}
+        return total;
+    }}
+
+"""
+
+def generate_corpus(path: str, lines: int) -> int:
+    '''
+    Write a synthetic class of about `lines` lines to path and return the number of lines written
+    '''
+    written = 2
+    with open(path, 'w') as file:
+        file.write("public class Bench {\n")
+        i = 0
+        while written < lines:
+            group = member_group(i)
+            file.write(group)
+            written += group.count('\n')
+            i += 1
+        file.write("}\n")
+    return written
+
+def measure(path: str, mode: str, engine: str) -> tuple[int, float, int]:
+    '''
+    Lex the mapped file and return the token count, seconds, and peak RSS in KB of this process
+    '''
+    with open(path, 'rb') as file:
+        content = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    lexer = Lexer(content, engine=engine, keep_trivia=False)  # Only the tokens, the trivia table would dominate memory
+    start = time.perf_counter()
+    if mode == 'tokenize_all':
+        ntokens = len(lexer.tokenize_all())
+    else:
+        ntokens = 0
+        while lexer.next_token() is not None: ntokens += 1
+    elapsed = time.perf_counter() - start
+
+    content.close()
+    return ntokens, elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def run_measure(path: str, mode: str, engine: str) -> tuple[int, float, int]:
+    # Each run gets a fresh process so its peak RSS only covers that corpus and mode
+    output = subprocess.run([sys.executable, __file__, '--measure', path, mode, engine],
+                            capture_output=True, text=True, check=True).stdout.split()
+    return int(output[0]), float(output[1]), int(output[2])
+
+if __name__ == '__main__':
+    if len(sys.argv) == 5 and sys.argv[1] == '--measure':
+        print(*measure(sys.argv[2], sys.argv[3], sys.argv[4]))
+        exit()
+
+    # Usage: lexer_throughput.py [engine] [sizes...]
+    engine = sys.argv[1] if len(sys.argv) > 1 else 'regex'
+    sizes = [int(size) for size in sys.argv[2:]] or SIZES
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for size in sizes:
+            path = os.path.join(tmpdir, f'bench_{size}.lang')
+            nlines = generate_corpus(path, size)
+            print(f"Lexing {nlines:,} lines ({os.path.getsize(path):,} bytes)")
+
+            for mode in MODES:
+                ntokens, elapsed, rss = run_measure(path, mode, engine)
+                line = f"{engine} {mode:>12} {nlines:>10} lines: {ntokens} tokens in {elapsed:.3f}s ({ntokens / elapsed:,.0f} tokens/sec), peak RSS {rss / 1024:,.1f} MB"
+                print(line)
+                results.append(line)
+
+    with open(RESULTS_LOG, 'w') as log_file:
+        log_file.write(f"Python {sys.version.split()[0]}\n")
+        for line in results:
+            log_file.write(line + '\n')
@@ -0,0 +1,114 @@
+import mmap
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from py_compiler.lexer import Lexer
+from py_compiler.parser import Parser
+
+RESULTS_LOG = os.path.join(ROOT, 'tests', 'parser_stress_results.log')
+
+def in_function(body: str, members: str = '') -> str:
+    # Wraps statements in a function of a class so parse_class reaches them
+    return f"public class Stress {{\n{members}    public u32 func run(u32 a) {{\n{body}\n        return a;\n    }}\n}}\n"
+
+def nested_parens(n: int) -> str:
+    # parse_operation_tree recurses once per '('
+    return in_function("        u32 x = " + "(" * n + "a + 1" + ")" * n + ";")
+
+def else_if_chain(n: int) -> str:
+    # parse_if_block parses each 'else if' as a nested if block
+    chain = "".join(f" else if (a > {i}) {{\n            a += {i};\n        }}" for i in range(1, n))
+    return in_function("        if (a > 0) {\n            a += 1;\n        }" + chain + " else {\n            a = 0;\n        }")
+
+def switch_cases(n: int) -> str:
+    cases = "".join(f"            case {i}:\n                a = {i};\n                break;\n" for i in range(n))
+    return in_function("        switch (a) {\n" + cases + "            default:\n                a = 0;\n        }")
+
+def argument_list(n: int) -> str:
+    # As many parameters in the declaration as arguments in the call
+    params = ", ".join(f"u32 p{i}" for i in range(n))
+    args = ", ".join(f"a + {i}" for i in range(n))
+    return in_function(f"        a = this.sum({args});", f"    public u32 func sum({params}) {{\n        return p0;\n    }}\n")
+
+def wide_class(n: int) -> str:
+    members = "".join(f"    public static u32 m{i} = {i};\n    public u32 func f{i}(u32 a) {{\n        return a + m{i};\n    }}\n" for i in range(n))
+    return f"public class Stress {{\n{members}}}\n"
+
+# Shape -> (source generator, input sizes), the size being the nesting depth or number of repeated elements
+SHAPES = {
+    'nested_parens': (nested_parens, [10, 100, 250, 500, 1_000]),
+    'else_if_chain': (else_if_chain, [10, 100, 250, 500, 1_000, 10_000]),
+    'switch_cases': (switch_cases, [100, 1_000, 10_000, 100_000]),
+    'argument_list': (argument_list, [100, 1_000, 10_000, 100_000]),
+    'wide_class': (wide_class, [100, 1_000, 10_000, 100_000]),
+}
+
+def measure(path: str) -> tuple[str, float, int]:
+    '''
+    Parse the mapped file and return whether it parsed, the seconds spent lexing and parsing, and peak RSS in KB of this process
+    '''
+    with open(path, 'rb') as file:
+        content = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    start = time.perf_counter()
+    try:
+        Parser(Lexer(content, keep_trivia=False), suppress_err=True).parse_class()
+        status = 'ok'
+    except RecursionError:  # Too deep for the recursive descent, reported instead of a time
+        status = 'RecursionError'
+    elapsed = time.perf_counter() - start
+
+    content.close()
+    return status, elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def run_generate(path: str, shape: str, size: int):
+    # Sources are built in their own process as well, the parent's peak RSS would otherwise carry over to the measuring children
+    subprocess.run([sys.executable, __file__, '--generate', path, shape, str(size)], check=True)
+
+def run_measure(path: str) -> tuple[str, float, int]:
+    # Each run gets a fresh process so its peak RSS only covers that input
+    output = subprocess.run([sys.executable, __file__, '--measure', path],
+                            capture_output=True, text=True, check=True).stdout.split()
+    return output[0], float(output[1]), int(output[2])
+
+if __name__ == '__main__':
+    if len(sys.argv) == 3 and sys.argv[1] == '--measure':
+        print(*measure(sys.argv[2]))
+        exit()
+    if len(sys.argv) == 5 and sys.argv[1] == '--generate':
+        with open(sys.argv[2], 'w') as file:
+            file.write(SHAPES[sys.argv[3]][0](int(sys.argv[4])))
+        exit()
+
+    # Usage: parser_stress.py [shapes...]
+    shapes = sys.argv[1:] or list(SHAPES)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for shape in shapes:
+            sizes = SHAPES[shape][1]
+            base = None  # Seconds per element of the smallest input, growth against it shows super-linear productions
+            for size in sizes:
+                path = os.path.join(tmpdir, f'{shape}_{size}.lang')
+                run_generate(path, shape, size)
+                status, elapsed, rss = run_measure(path)
+                if status != 'ok':
+                    line = f"{shape:>13} {size:>7}: {status} after {elapsed:.3f}s, peak RSS {rss / 1024:,.1f} MB"
+                else:
+                    per_element = elapsed / size
+                    base = base or per_element
+                    line = f"{shape:>13} {size:>7}: {elapsed:.3f}s ({per_element * 1e6:,.1f} us/element, x{per_element / base:.2f} vs smallest), peak RSS {rss / 1024:,.1f} MB"
+                print(line)
+                results.append(line)
+
+    with open(RESULTS_LOG, 'w') as log_file:
+        log_file.write(f"Python {sys.version.split()[0]}\n")
+        for line in results:
+            log_file.write(line + '\n')
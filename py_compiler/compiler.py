@@ -39,13 +39,18 @@ class IntermediateValue:
     def __str__(self): return self.name
 
 class ClassEnvironment:
-    def __init__(self, name: str, static_imut_vars: list[Variable], static_mut_vars: list[Variable], static_vars: list[Variable], member_vars: list[CompiledVariable], imports: list[Class]):
+    def __init__(self, name: str, static_imut_vars: list[Variable], static_mut_vars: list[Variable], static_vars: list[Variable], member_vars: list[CompiledVariable], imports: list[ClassInterface]):
         self.name: str = name
         self.static_imut_vars: list[Variable] = static_imut_vars
         self.static_mut_vars: list[Variable] = static_mut_vars
         self.static_vars: list[Variable] = static_vars
         self.member_vars: list[CompiledVariable] = member_vars  # Variable data and offset address
-        self.imports = imports
+        self.imports: list[ClassInterface] = imports
+
+    def find_import(self, name: str) -> ClassInterface | None:
+        for interface in self.imports:
+            if interface.name == name: return interface
+        return None
 
 register_names = [['r8b', 'r9b', 'r10b', 'r11b', 'r12b', 'r13b', 'r14b', 'r15b'],
                   ['r8w', 'r9w', 'r10w', 'r11w', 'r12w', 'r13w', 'r14w', 'r15w'],
@@ -207,10 +212,11 @@ class LocalEnvironment:
 
 class Compiler:
 
-    def __init__(self, path: str, classes: list[Class], filenames: list[str], debug_mode: bool = False):
+    def __init__(self, path: str, classes: list[Class], filenames: list[str], debug_mode: bool = False, interfaces: list[ClassInterface] | None = None):
         self.path = path
         self.classes: list[Class] = classes
         self.filenames: list[str] = filenames
+        self.interfaces: list[ClassInterface] = (interfaces or []) + [klass.interface() for klass in classes]  # Every class that can be resolved
         self.depth = 0
         self.line = 0
 
@@ -264,7 +270,7 @@ class Compiler:
             else: # Immutible initialized class-level var
                 static_imut_vars.append(var)
 
-        return ClassEnvironment(name, static_imut_vars, static_mut_vars, static_vars, member_vars, [])
+        return ClassEnvironment(name, static_imut_vars, static_mut_vars, static_vars, member_vars, self.interfaces)
 
     # Insert immutable, static, primitive member variables
     def build_readonly_data_section(self, file, class_env: ClassEnvironment):
@@ -502,31 +508,31 @@ class Compiler:
         op: VariableSetOperation = var_update.op
 
         if op == VariableSetOperation.INC:
-            exp: Expression = Expression([var_update.member_access, '1'],  [Operation.ADD])
+            exp: Expression = BinaryOperation(var_update.member_access, Operation.ADD, Value('1'))
         elif op == VariableSetOperation.DEC:
-            exp: Expression = Expression([var_update.member_access, '1'],  [Operation.SUB])
+            exp: Expression = BinaryOperation(var_update.member_access, Operation.SUB, Value('1'))
         elif op == VariableSetOperation.SET_ADD:
-            exp: Expression = Expression([var_update.member_access, exp], [Operation.ADD])
+            exp: Expression = BinaryOperation(var_update.member_access, Operation.ADD, exp)
         elif op == VariableSetOperation.SET_SUB:
-            exp: Expression = Expression([var_update.member_access, exp], [Operation.SUB])
+            exp: Expression = BinaryOperation(var_update.member_access, Operation.SUB, exp)
         elif op == VariableSetOperation.SET_MULT:
-            exp: Expression = Expression([var_update.member_access, exp], [Operation.MULT])
+            exp: Expression = BinaryOperation(var_update.member_access, Operation.MULT, exp)
         elif op == VariableSetOperation.SET_DIV:
-            exp: Expression = Expression([var_update.member_access, exp], [Operation.DIV])
+            exp: Expression = BinaryOperation(var_update.member_access, Operation.DIV, exp)
         elif op == VariableSetOperation.SET_MOD:
-            exp: Expression = Expression([var_update.member_access, exp], [Operation.MOD])
+            exp: Expression = BinaryOperation(var_update.member_access, Operation.MOD, exp)
         elif op == VariableSetOperation.SET_BIT_AND:
-            exp: Expression = Expression([var_update.member_access, exp], [Operation.BIT_AND])
+            exp: Expression = BinaryOperation(var_update.member_access, Operation.BIT_AND, exp)
         elif op == VariableSetOperation.SET_BIT_OR:
-            exp: Expression = Expression([var_update.member_access, exp], [Operation.BIT_OR])
+            exp: Expression = BinaryOperation(var_update.member_access, Operation.BIT_OR, exp)
         elif op == VariableSetOperation.SET_BIT_NOT:
-            exp: Expression = Expression([var_update.member_access, exp], [Operation.BIT_NOT])
+            exp: Expression = UnaryOperation(Operation.BIT_NOT, exp)
         elif op == VariableSetOperation.SET_BIT_XOR:
-            exp: Expression = Expression([var_update.member_access, exp], [Operation.BIT_XOR])
+            exp: Expression = BinaryOperation(var_update.member_access, Operation.BIT_XOR, exp)
         elif op == VariableSetOperation.SET_BIT_LSHIFT:
-            exp: Expression = Expression([var_update.member_access, exp], [Operation.BIT_LSHIFT])
+            exp: Expression = BinaryOperation(var_update.member_access, Operation.BIT_LSHIFT, exp)
         elif op == VariableSetOperation.SET_BIT_RSHIFT:
-            exp: Expression = Expression([var_update.member_access, exp], [Operation.BIT_RSHIFT])
+            exp: Expression = BinaryOperation(var_update.member_access, Operation.BIT_RSHIFT, exp)
 
         # TODO: Evaluate expression and store value in variable
         self.print(f"Run expression evaluation on {exp}")
@@ -534,13 +540,44 @@ class Compiler:
 
     # Maybe store expression result in rax register?  Could provide consistency in evaluations
     def build_expression_evaluation(self, file, env: LocalEnvironment, expression: Expression):
-        rpn = expression.generate_RPN()
+        num = fold_operation_tree(expression)  # Constant trees need no code, i.e. 2 + 3
+        rpn = [Value(str(num))] if num is not None else operation_tree_RPN(expression)
 
         index = 0
         while index < len(rpn):
             while index < len(rpn) and not type(rpn[index]) == Operation: index += 1
             if index >= len(rpn): break
 
+            if rpn[index] == Operation.BIT_NOT:  # Unary, only takes the value before it
+                v, op = rpn[index-1], rpn[index]
+                if type(v) == MemberAccess: v = v.accesses[0]  # Single access only, as for the binary operations below
+
+                if type(v) == Value:  # Fold explicit values now, i.e. ~5
+                    if type(v.num) is not int:
+                        print(f"Bitwise not requires an integer, not {v}")
+                        raise Exception()
+                    del rpn[index-1:index+1]
+                    index -= 1
+                    rpn.insert(index, Value(str(~v.num)))
+                    continue
+
+                if type(v) == VariableAccess or type(v) == IntermediateValue: 
+                    reg = env.get_register(v.name, file, '  '*self.depth)
+                    env.remove_variable_reference(v.name)
+
+                intermediate_val = IntermediateValue(f"|RPN|{op.value}{str(v)}", "u32")
+                env.add_intermediate_val(intermediate_val)
+                result_reg = env.get_register(intermediate_val.name, file, '  '*self.depth, False)
+                file.write('  '*self.depth + f"mov {result_reg}, {reg}\n")
+                file.write('  '*self.depth + f"not {result_reg}\n")
+                file.write("\n")
+                file.flush()
+
+                del rpn[index-1:index+1]
+                index -= 1
+                rpn.insert(index, intermediate_val)
+                continue
+
             v1, v2, op = rpn[index-2], rpn[index-1], rpn[index]
 
             # If v1&v2 are explicit values, evaluate them now
@@ -719,9 +756,9 @@ class Compiler:
                 
                 # Check INC/DEC updates
                 if update.op == VariableSetOperation.INC:
-                    update.val = Expression([update.member_access, Value('1')], [Operation.ADD])
+                    update.val = BinaryOperation(update.member_access, Operation.ADD, Value('1'))
                 elif update.op == VariableSetOperation.DEC:
-                    update.val = Expression([update.member_access, Value('1')], [Operation.SUB])
+                    update.val = BinaryOperation(update.member_access, Operation.SUB, Value('1'))
 
                 # Check variable updates
                 if all([type(acc) == VariableAccess for acc in update.member_access.accesses]):
@@ -745,7 +782,7 @@ class Compiler:
             self.generate_variable_access_list_from_expression(env, condition.right)
 
     def generate_variable_access_list_from_expression(self, env: LocalEnvironment, exp: Expression):
-        for val in exp.generate_RPN():
+        for val in operation_tree_RPN(exp):
             if type(val) == VariableAccess:
                 env.add_variable_reference(val.name, val.pos)
             elif type(val) == MemberAccess:
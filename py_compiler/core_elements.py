@@ -1,4 +1,9 @@
+import re
+
+from array import array
+from bisect import bisect_left, bisect_right
 from enum import Enum
+from typing import Callable
 
 # Primitive types are char, u8, u16, u32, u64, i8, i16, i32, i64, f32, and f64
 
@@ -116,21 +121,116 @@ class FunctionCall:
         if not isinstance(other, FunctionCall): return False
         return self.name == other.name and self.args == other.args
 
+char_escapes = {'n': '\n', 't': '\t', 'r': '\r', '0': '\0'}
+
+def decode_literal(val: str) -> tuple[int | float, str]:
+    '''
+    Decode the text of a literal value (decimal, hex 0x, octal 0o, binary 0b, float or 'c' character)
+    into its number and the smallest primitive type that holds it
+    '''
+    if val[0] == "'":  # Character literal, possibly escaped
+        char = char_escapes.get(val[2], val[2]) if val[1] == '\\' else val[1]
+        return ord(char), 'char'
+    elif val[:2] in ('0x', '0o', '0b'): num = int(val, 0)
+    elif '.' in val:
+        num = float(val)
+        if num == 0 or 1.4e-45 <= abs(num) <= 3.4e38: return num, 'f32'
+        return num, 'f64'
+    else: num = int(val)
+
+    if num < 0:
+        if num >= -0x80: return num, 'i8'
+        elif num >= -0x8000: return num, 'i16'
+        elif num >= -0x80000000: return num, 'i32'
+        return num, 'i64'
+    if num <= 0xFF: return num, 'u8'
+    elif num <= 0xFFFF: return num, 'u16'
+    elif num <= 0xFFFFFFFF: return num, 'u32'
+    return num, 'u64'
+
+class LineIndex:
+    '''
+    Offsets of the start of every line in a source, built once so an offset (i.e. a token or node pos)
+    maps to its line and column with a binary search instead of rescanning the text.  Lines and
+    columns count from 1.  Offsets into a bytes-like source are byte offsets so columns count bytes.
+    '''
+    NEWLINE: re.Pattern = re.compile(r'\n')
+    BYTES_NEWLINE: re.Pattern = re.compile(rb'\n')
+
+    def __init__(self, text):
+        newline: re.Pattern = self.NEWLINE if isinstance(text, str) else self.BYTES_NEWLINE
+        self.starts: array = array('I', [0])  # array('I') of line start offsets
+        self.starts.extend(match.end() for match in newline.finditer(text))
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def line_of(self, pos: int) -> int:
+        return bisect_right(self.starts, pos)
+
+    def line_col(self, pos: int) -> tuple[int, int]:
+        line: int = bisect_right(self.starts, pos)
+        return line, pos - self.starts[line-1] + 1
+
+class SpanTable:
+    '''
+    Source spans [start, end) of parsed nodes kept in arrays beside the tree and found by node id, so nodes
+    don't each need span attributes.  Offsets are character offsets (byte offsets for a bytes-like source).
+    Spans start at a token start and end at a token end, so the token span of a node is found with a binary
+    search over the token starts of a TokenStream of the same source.
+    '''
+    def __init__(self):
+        self.rows: dict[int, int] = {}  # Node id -> row in starts/ends
+        self.nodes: list = []  # Keeps the nodes alive so their ids stay unique
+        self.starts: array = array('I')
+        self.ends: array = array('I')
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def __contains__(self, node) -> bool:
+        return id(node) in self.rows
+
+    def add(self, node, start: int, end: int):
+        if end < start: end = start  # Empty, i.e. a body with no statements
+        row: int | None = self.rows.get(id(node))
+        if row is None:
+            self.rows[id(node)] = len(self.nodes)
+            self.nodes.append(node)
+            self.starts.append(start)
+            self.ends.append(end)
+        else:  # Widened by an enclosing rule (i.e. a class member with its modifiers)
+            self.starts[row] = start
+            self.ends[row] = end
+
+    def span(self, node) -> tuple[int, int] | None:
+        row: int | None = self.rows.get(id(node))
+        if row is None: return None
+        return self.starts[row], self.ends[row]
+
+    def token_span(self, node, token_starts: array) -> tuple[int, int] | None:
+        '''
+        [first, last+1) token indexes of a node given the starts array of a TokenStream
+        '''
+        span: tuple[int, int] | None = self.span(node)
+        if span is None: return None
+        return bisect_left(token_starts, span[0]), bisect_left(token_starts, span[1])
+
+    def copy_subtree(self, other: 'SpanTable', node, delta: int):
+        '''
+        Copy the spans of a node and everything parsed inside it from another table, moved by delta.  A node's
+        descendants are the rows added just before it that start inside it.
+        '''
+        last: int = other.rows[id(node)]
+        first: int = last
+        while first > 0 and other.starts[first-1] >= other.starts[last]: first -= 1
+        for row in range(first, last+1):
+            self.add(other.nodes[row], other.starts[row] + delta, other.ends[row] + delta)
+
 class Value:
-    def __init__(self, val: str):
+    def __init__(self, val: str, literal: tuple[int | float, str] | None = None):  # Literal is the already decoded (number, type)
         self.val: str = val
-
-        val = float(val)
-        if int(val) == val: # Val is an integer
-            signed = (val < 0)
-            val = abs(val)
-            if val >= 0xFFFFFF: self.type = 'i64' if signed else 'u64'
-            elif val >= 0xFFFF: self.type = 'i32' if signed else 'u32'
-            elif val >= 0xFF: self.type = 'i16' if signed else 'u16'
-            else: self.type = 'i8' if signed else 'u8'
-        else: # Val is a float
-            if abs(val) < 1.4e-45 or abs(val) > 3.4e38: self.type = 'f64'
-            else: self.type = 'f32'
+        self.num, self.type = literal if literal is not None else decode_literal(val)
 
     def __str__(self):
         return self.val
@@ -139,6 +239,9 @@ class Value:
         if not isinstance(other, Value): return False
         return self.val == other.val
 
+    def evaluate(self) -> str:
+        return self.val
+
 class VariableAccess:
     def __init__(self, name: str, pos: int):
         self.name: str = name
@@ -146,6 +249,9 @@ class VariableAccess:
 
     def __str__(self):
         return self.name
+
+    def line_col(self, lines: LineIndex) -> tuple[int, int]:
+        return lines.line_col(self.pos)
     
     def __eq__(self, other):
         if not isinstance(other, VariableAccess): return False
@@ -166,56 +272,134 @@ class MemberAccess:
         if not isinstance(other, MemberAccess): return False
         return self.accesses == other.accesses
 
-class Expression:
-    def __init__(self, values: list[Expression | MemberAccess | Value], ops: list[Operation] = []): # Val is a raw value or a function call
-        if (not type(values) is list and len(ops) > 0) or (not len(values)-1 == len(ops)):
-            print("Values/Operations mismatch !!!")
-            raise Exception()
-        self.values: list[Expression | MemberAccess | Value] = values
-        self.ops: list[Operation] = ops
+    def evaluate(self) -> str:
+        return str(self)
+
+class BinaryOperation:
+    pass
+
+class UnaryOperation:
+    pass
+
+class BinaryOperation:
+    def __init__(self, left: BinaryOperation | UnaryOperation | MemberAccess | Value, op: Operation, right: BinaryOperation | UnaryOperation | MemberAccess | Value):
+        self.left = left
+        self.op: Operation = op
+        self.right = right
 
     def __str__(self):
-        output: str = "("
-        for i in range(len(self.ops)):
-            output += f"{self.values[i]} {self.ops[i].value} "
-        output += f"{self.values[-1]}"
-        output += ")"
-        return output
-    
+        return f"({self.left} {self.op.value} {self.right})"
+
     def __eq__(self, other):
-        if not isinstance(other, Expression): return False
-        return self.values == other.values and self.ops == other.ops
-    
-    def generate_RPN(self) -> list[MemberAccess | VariableAccess | FunctionCall | ConstructorCall | Value | Operation]:
-        if len(self.values) == 1: return self.values if type(self.values[0]) is not Expression else self.values[0].generate_RPN()
+        if not isinstance(other, BinaryOperation): return False
+        return self.op == other.op and self.left == other.left and self.right == other.right
 
-        if type(self.values[0]) is not Expression:
-            output = [self.values[0]]   
-        else:
-            output = self.values[0].generate_RPN()
-        op_stack = []
-
-        index = 0
-        while index < len(self.ops):
-            if type(self.values[index+1]) is not Expression:
-                output.append(self.values[index+1])
-            else:
-                output.extend(self.values[index+1].generate_RPN())
-            while (op_stack and precedence_map[op_stack[-1]] <= precedence_map[self.ops[index]]):
-                output.append(op_stack.pop())
-            op_stack.append(self.ops[index])
-            index += 1
-
-        while op_stack:
-            output.append(op_stack.pop())
+    def generate_RPN(self) -> list[MemberAccess | Value | Operation]:
+        return operation_tree_RPN(self)
 
-        return output
-    
-    def evaluate(self):
-        if len(self.values) == 1: return str(self.values[0])
+    def evaluate(self) -> str:
+        num = fold_operation_tree(self)
+        return str(self) if num is None else str(num)
 
-        # TODO: Implement actual evaluation of expressions
-        return str(self)
+class UnaryOperation:
+    def __init__(self, op: Operation, operand: BinaryOperation | UnaryOperation | MemberAccess | Value):
+        self.op: Operation = op
+        self.operand = operand
+
+    def __str__(self):
+        return f"{self.op.value}{self.operand}"
+
+    def __eq__(self, other):
+        if not isinstance(other, UnaryOperation): return False
+        return self.op == other.op and self.operand == other.operand
+
+    def generate_RPN(self) -> list[MemberAccess | Value | Operation]:
+        return operation_tree_RPN(self)
+
+    def evaluate(self) -> str:
+        num = fold_operation_tree(self)
+        return str(self) if num is None else str(num)
+
+# An expression is an operation tree, or a single operand when it has no operators
+Expression = BinaryOperation | UnaryOperation | MemberAccess | Value
+
+def operation_tree(values: list[Expression], ops: list[Operation] | None = None) -> Expression:
+    '''
+    Operation tree of operands joined by binary operators (ops[i] between values[i] and values[i+1]),
+    grouped by precedence_map with equal precedence to the left, without recursing on long chains
+    '''
+    ops = ops or []
+    if not len(values)-1 == len(ops):
+        print("Values/Operations mismatch !!!")
+        raise Exception()
+
+    operands: list[Expression] = [values[0]]
+    pending: list[Operation] = []  # Operators waiting for their right operand to be complete
+    for op, value in zip(ops, values[1:]):
+        while pending and precedence_map[pending[-1]] <= precedence_map[op]:
+            right = operands.pop()
+            operands.append(BinaryOperation(operands.pop(), pending.pop(), right))
+        pending.append(op)
+        operands.append(value)
+    while pending:
+        right = operands.pop()
+        operands.append(BinaryOperation(operands.pop(), pending.pop(), right))
+    return operands[0]
+
+def operation_tree_RPN(node: Expression) -> list[MemberAccess | Value | Operation]:
+    '''
+    Postfix order of an operation tree (operands before their operator) without recursing, since
+    chains of left associative operators build trees as deep as the chain is long
+    '''
+    output = []
+    stack = [node]
+    while stack:  # Visit node, right, left and reverse to get left, right, node
+        node = stack.pop()
+        if type(node) is BinaryOperation:
+            output.append(node.op)
+            stack.append(node.left)
+            stack.append(node.right)
+        elif type(node) is UnaryOperation:
+            output.append(node.op)
+            stack.append(node.operand)
+        else: output.append(node)
+    output.reverse()
+    return output
+
+def fold_operation_tree(node: Expression) -> int | float | None:
+    '''
+    Value of an operation tree whose operands are all Values, or None if it depends on anything else
+    '''
+    stack: list[int | float] = []
+    for item in operation_tree_RPN(node):
+        if type(item) is Value: stack.append(item.num)
+        elif type(item) is not Operation: return None
+        elif item == Operation.BIT_NOT:
+            if type(stack[-1]) is float: return None
+            stack[-1] = ~stack[-1]
+        else:
+            b = stack.pop()
+            a = stack.pop()
+            if item in (Operation.DIV, Operation.MOD) and b == 0: return None
+            if item in (Operation.BIT_LSHIFT, Operation.BIT_RSHIFT) and (type(b) is float or b < 0): return None
+            if type(a) is float or type(b) is float:
+                if item == Operation.ADD: stack.append(a + b)
+                elif item == Operation.SUB: stack.append(a - b)
+                elif item == Operation.MULT: stack.append(a * b)
+                elif item == Operation.DIV: stack.append(a / b)
+                else: return None  # Bitwise operators and MOD take integers
+            elif item == Operation.ADD: stack.append(a + b)
+            elif item == Operation.SUB: stack.append(a - b)
+            elif item == Operation.MULT: stack.append(a * b)
+            elif item == Operation.DIV or item == Operation.MOD:
+                quotient = abs(a) // abs(b) * (1 if (a < 0) == (b < 0) else -1)  # Truncates toward zero
+                stack.append(quotient if item == Operation.DIV else a - b * quotient)
+            elif item == Operation.BIT_AND: stack.append(a & b)
+            elif item == Operation.BIT_OR: stack.append(a | b)
+            elif item == Operation.BIT_XOR: stack.append(a ^ b)
+            elif item == Operation.BIT_LSHIFT: stack.append(a << b)
+            elif item == Operation.BIT_RSHIFT: stack.append(a >> b)
+    return stack[0]
 
 
 class Condition:
@@ -284,7 +468,7 @@ class Variable:
         self.typedefs: list[str] = typedefs
         self.name: str = name
         self.pos: int = pos
-        self.val: Expression|None = val
+        self.val: Expression | None = val
 
     def __str__(self) -> str:
         output = ''
@@ -296,6 +480,9 @@ class Variable:
         if self.val is not None:
             output += f" = {self.val}"
         return output
+
+    def line_col(self, lines: LineIndex) -> tuple[int, int]:
+        return lines.line_col(self.pos)
     
     def __eq__(self, other):
         if not isinstance(other, Variable): return False
@@ -397,6 +584,9 @@ class VariableUpdate:
             if self.val: return f"--{self.member_access}"
             else: return f"{self.member_access}--"
         return f"{self.member_access} {self.op.value} {self.val}"
+
+    def line_col(self, lines: LineIndex) -> tuple[int, int]:
+        return lines.line_col(self.pos)
     
     def __eq__(self, other):
         if not isinstance(other, VariableUpdate): return False
@@ -514,12 +704,34 @@ class Switch:
         if not isinstance(other, Switch): return False
         return self.test_val == other.test_val and self.cases == other.cases
 
+class DeferredBody:
+    '''
+    Function or constructor body skipped by a parser in defer_bodies mode, parsed the first time it
+    is used.  The source it was skipped in must stay open (i.e. an mmap) until then.
+    '''
+    def __init__(self, parse: Callable[[], Body], start: int, end: int):
+        self.parse: Callable[[], Body] = parse
+        self.start: int = start  # Range of the body between its braces (token indexes for a TokenCursor,
+        self.end: int = end      # character offsets for a Lexer)
+
 class Constructor:
-    def __init__(self, mods: list[str], params: list[Parameter], body: Body):
+    def __init__(self, mods: list[str], params: list[Parameter], body: Body | DeferredBody):
         self.mods: list[str] = mods
         self.params: list[Parameter] = params
         self.body: Body = body
 
+    @property
+    def body(self) -> Body:
+        if type(self.__body) is DeferredBody: self.__body = self.__body.parse()
+        return self.__body
+
+    @body.setter
+    def body(self, body: Body | DeferredBody):
+        self.__body = body
+
+    def is_body_parsed(self) -> bool:
+        return type(self.__body) is not DeferredBody
+
     def __str__(self) -> str:
         output = ''
         for m in self.mods:
@@ -536,13 +748,25 @@ class Constructor:
         return self.mods == other.mods and self.params == other.params and self.body == other.body
 
 class Function:
-    def __init__(self, mods: list[str], name: str, return_type: str, params: list[Parameter], body: Body):
+    def __init__(self, mods: list[str], name: str, return_type: str, params: list[Parameter], body: Body | DeferredBody):
         self.mods: list[str] = mods
         self.name: str = name
         self.return_type: str = return_type
         self.params: list[Parameter] = params
         self.body: Body = body
 
+    @property
+    def body(self) -> Body:
+        if type(self.__body) is DeferredBody: self.__body = self.__body.parse()
+        return self.__body
+
+    @body.setter
+    def body(self, body: Body | DeferredBody):
+        self.__body = body
+
+    def is_body_parsed(self) -> bool:
+        return type(self.__body) is not DeferredBody
+
     def __str__(self) -> str:
         output = ''
         for m in self.mods:
@@ -559,6 +783,26 @@ class Function:
         return self.mods == other.mods and self.name == other.name and self.return_type == other.return_type \
                 and self.params == other.params and self.body == other.body
 
+def shift_positions(node, delta: int):
+    '''
+    Move every pos/end_pos in a parsed tree by delta, i.e. when a member reused from a previous parse moved
+    in the edited source.  Unset positions (-1 or None) and bodies that are not parsed yet are left alone.
+    '''
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if type(node) is list:
+            stack.extend(node)
+            continue
+        if node is None or type(node) in position_leaf_types or isinstance(node, Enum): continue
+        fields: dict = node.__dict__
+        for name, value in fields.items():
+            if type(value) is int:
+                if value >= 0 and (name == 'pos' or name == 'end_pos'): fields[name] = value + delta
+            elif value is not None and type(value) not in position_leaf_types: stack.append(value)
+
+position_leaf_types = {str, float, bool, DeferredBody}
+
 class Class:
     pass
 
@@ -605,6 +849,11 @@ class Class:
             if 'static' not in var.mods: self.size += var.get_reserve_size()
         return self.size
 
+    def interface(self) -> 'ClassInterface':
+        return ClassInterface(self.mods, self.name, self.typedefs, self.extension, self.body.member_vars,
+                              [Constructor(c.mods, c.params, None) for c in self.body.constructors],
+                              [Function(f.mods, f.name, f.return_type, f.params, None) for f in self.body.functions],
+                              [c.interface() for c in self.body.classes])
 
     def __str__(self) -> str:
         output = ''
@@ -621,20 +870,66 @@ class Class:
         return self.mods == other.mods and self.name == other.name and self.typedefs == other.typedefs \
                 and self.extension == other.extension and self.body == other.body
 
+class ClassInterface:
+    '''
+    Summary of a class for resolving it from other classes: its declaration, member variables (with
+    their sizes), and constructor/function signatures.  Constructors and functions have no body.
+    '''
+    def __init__(self, mods: list[str], name: str, typedefs: list[str], extension: str, member_vars: list[Variable],
+                 constructors: list[Constructor], functions: list[Function], classes: list['ClassInterface']):
+        self.mods: list[str] = mods
+        self.name: str = name
+        self.typedefs: list[str] = typedefs
+        self.extension: str = extension
+        self.member_vars: list[Variable] = member_vars
+        self.constructors: list[Constructor] = constructors
+        self.functions: list[Function] = functions
+        self.classes: list[ClassInterface] = classes
+        self.size = 0
+
+    def get_size(self) -> int:
+        if self.size > 0: return self.size
+        self.size = 8  # Reserve space for function table pointer
+        for var in self.member_vars:
+            if 'static' not in var.mods: self.size += var.get_reserve_size()
+        return self.size
+
+    def find_member_var(self, name: str) -> Variable | None:
+        for var in self.member_vars:
+            if var.name == name: return var
+        return None
+
+    def find_functions(self, name: str) -> list[Function]:
+        return [func for func in self.functions if func.name == name]
+
+    def __eq__(self, other):
+        if not isinstance(other, ClassInterface): return False
+        return self.mods == other.mods and self.name == other.name and self.typedefs == other.typedefs \
+                and self.extension == other.extension and self.member_vars == other.member_vars \
+                and self.constructors == other.constructors and self.functions == other.functions \
+                and self.classes == other.classes
+
 class Program:
     def __init__(self):
         self.nclasses = 0
         self.classes: list[Class] = []
         self.packages: list[str] = []
+        self.interfaces: list[ClassInterface] = []  # Classes only needed for resolution (i.e. already compiled libs)
+        self.interface_packages: list[str] = []
 
     def add_class(self, klass: Class, pkg: str):
         self.nclasses += 1
         self.classes.append(klass)
         self.packages.append(pkg)
 
+    def add_interface(self, interface: ClassInterface, pkg: str):
+        self.interfaces.append(interface)
+        self.interface_packages.append(pkg)
+
     def __eq__(self, other):
         if not isinstance(other, Program): return False
-        return self.classes == other.classes and self.packages == other.packages
+        return self.classes == other.classes and self.packages == other.packages \
+                and self.interfaces == other.interfaces and self.interface_packages == other.interface_packages
     
     # def __str__(self) -> str:
     #     output = '\n' + str(self.klass) + '\n'
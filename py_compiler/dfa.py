@@ -0,0 +1,314 @@
+import re
+
+# Generates a deterministic finite automaton from the token regex patterns so text can be scanned
+# with transition tables instead of regex backtracking.  Only the regex subset used by the token
+# patterns is supported: literals, escapes, character classes, '.', groups (plain or '(?:'), '|',
+# '*', '+', '?', '{m,n}' and '\b' at the end of an alternative.  A leading '\b' is dropped since every token
+# starts right after a non-word character or a token that ended on a word boundary.
+
+# Representative characters for everything outside ASCII that the patterns can tell apart
+UNICODE_REPS = ['٣', 'é', ' ', '€']  # Decimal digit, letter, whitespace, other
+
+class Boundary:
+    pass
+
+class Atom:
+    def __init__(self, src: str):
+        self.src: str = src  # Regex source matching exactly one character (i.e. 'a', '\d', '[0-7]')
+
+class Seq:
+    def __init__(self, items: list):
+        self.items = items
+
+class Alt:
+    def __init__(self, options: list):
+        self.options = options
+
+class Repeat:
+    def __init__(self, item, min: int, max: int | None):  # max is None for unbounded
+        self.item = item
+        self.min: int = min
+        self.max: int | None = max
+
+class PatternParser:
+    def __init__(self, pattern: str):
+        self.pattern: str = pattern
+        self.pos: int = 0
+
+    def parse(self):
+        node = self.parse_alt()
+        if self.pos < len(self.pattern):
+            raise Exception(f"Unsupported pattern syntax at {self.pos}: {self.pattern}")
+        return node
+
+    def parse_alt(self):
+        options = [self.parse_seq()]
+        while self.pos < len(self.pattern) and self.pattern[self.pos] == '|':
+            self.pos += 1
+            options.append(self.parse_seq())
+        return options[0] if len(options) == 1 else Alt(options)
+
+    def parse_seq(self) -> Seq:
+        items = []
+        while self.pos < len(self.pattern) and self.pattern[self.pos] not in '|)':
+            item = self.parse_atom()
+            items.append(self.parse_quantifier(item))
+        return Seq(items)
+
+    def parse_atom(self):
+        c = self.pattern[self.pos]
+        if c == '(':
+            self.pos += 3 if self.pattern.startswith('(?:', self.pos) else 1
+            node = self.parse_alt()
+            if self.pos >= len(self.pattern) or self.pattern[self.pos] != ')':
+                raise Exception(f"Unclosed group in pattern: {self.pattern}")
+            self.pos += 1
+            return node
+        elif c == '[':
+            end = self.pattern.index(']', self.pos + 2)
+            while self.pattern[end-1] == '\\': end = self.pattern.index(']', end + 1)
+            src = self.pattern[self.pos:end+1]
+            self.pos = end + 1
+            return Atom(src)
+        elif c == '\\':
+            src = self.pattern[self.pos:self.pos+2]
+            self.pos += 2
+            if src == r'\b': return Boundary()
+            return Atom(src)
+        elif c in '*+?':
+            raise Exception(f"Quantifier without target in pattern: {self.pattern}")
+        self.pos += 1
+        return Atom(re.escape(c) if c != '.' else '.')
+
+    def parse_quantifier(self, item):
+        if self.pos >= len(self.pattern): return item
+        c = self.pattern[self.pos]
+        if c == '*':
+            self.pos += 1
+            return Repeat(item, 0, None)
+        elif c == '+':
+            self.pos += 1
+            return Repeat(item, 1, None)
+        elif c == '?':
+            self.pos += 1
+            return Repeat(item, 0, 1)
+        elif c == '{':
+            match = re.compile(r'\{(\d+)(,(\d*))?\}').match(self.pattern, self.pos)
+            if match is None: return item  # Literal brace
+            self.pos = match.end()
+            if match.group(2) is None: return Repeat(item, int(match.group(1)), int(match.group(1)))
+            return Repeat(item, int(match.group(1)), int(match.group(3)) if match.group(3) else None)
+        return item
+
+class NFA:
+    def __init__(self):
+        self.edges: list[list[tuple[int, int]]] = []  # (atom index, target) transitions
+        self.eps: list[list[int]] = []
+        self.bounds: list[list[int]] = []  # Transitions taken only on a word boundary
+        self.accepts: list[int] = []  # Pattern index accepted in each state, -1 if none
+        self.atoms: list[str] = []
+        self.atom_ids: dict[str, int] = {}
+
+    def new_state(self) -> int:
+        self.edges.append([])
+        self.eps.append([])
+        self.bounds.append([])
+        self.accepts.append(-1)
+        return len(self.accepts) - 1
+
+    def build(self, node, start: int) -> int:
+        if isinstance(node, Atom):
+            if node.src not in self.atom_ids:
+                self.atom_ids[node.src] = len(self.atoms)
+                self.atoms.append(node.src)
+            end = self.new_state()
+            self.edges[start].append((self.atom_ids[node.src], end))
+            return end
+        elif isinstance(node, Boundary):
+            end = self.new_state()
+            self.bounds[start].append(end)
+            return end
+        elif isinstance(node, Seq):
+            for item in node.items:
+                start = self.build(item, start)
+            return start
+        elif isinstance(node, Alt):
+            end = self.new_state()
+            for option in node.options:
+                s = self.new_state()
+                self.eps[start].append(s)
+                self.eps[self.build(option, s)].append(end)
+            return end
+        elif isinstance(node, Repeat):
+            for _ in range(node.min):
+                start = self.build(node.item, start)
+            end = self.new_state()
+            self.eps[start].append(end)
+            if node.max is None:  # Loop back for unbounded repeats
+                s = self.new_state()
+                self.eps[start].append(s)
+                e = self.build(node.item, s)
+                self.eps[e].append(s)
+                self.eps[e].append(end)
+            else:
+                for _ in range(node.max - node.min):
+                    start = self.build(node.item, start)
+                    self.eps[start].append(end)
+            return end
+        raise Exception(f"Unhandled pattern node: {type(node)}")
+
+    def closure(self, states) -> frozenset[int]:
+        stack = list(states)
+        seen = set(stack)
+        while stack:
+            for t in self.eps[stack.pop()]:
+                if t not in seen:
+                    seen.add(t)
+                    stack.append(t)
+        return frozenset(seen)
+
+class DFA:
+    '''
+    Scans the longest match for the highest priority (lowest index) pattern that matches at a
+    position, which is the same token a regex alternation of the patterns in order would return.
+    '''
+    NO_MATCH = 1 << 30
+
+    def __init__(self, patterns: list[str]):
+        nfa = NFA()
+        start = nfa.new_state()
+        for i, pattern in enumerate(patterns):
+            if pattern.startswith(r'\b'): pattern = pattern[2:]
+            s = nfa.new_state()
+            nfa.eps[start].append(s)
+            nfa.accepts[nfa.build(PatternParser(pattern).parse(), s)] = i
+
+        self.build_classes(nfa.atoms)
+
+        # Subset construction over character classes
+        self.transitions: list[int] = []  # transitions[state * nclasses + class] -> state, -1 if dead
+        self.plain_accepts: list[int] = []  # Best pattern accepted in each state
+        self.bound_accepts: list[int] = []  # Best pattern accepted in each state if at a word boundary
+
+        initial = nfa.closure([start])
+        state_ids: dict[frozenset[int], int] = {initial: 0}
+        pending = [initial]
+        while pending:
+            states = pending.pop()
+            row = [-1] * self.nclasses
+            for cls in range(self.nclasses):
+                targets = set()
+                for s in states:
+                    for atom, t in nfa.edges[s]:
+                        if self.class_atoms[cls][atom]: targets.add(t)
+                if not targets: continue
+                target = nfa.closure(targets)
+                if target not in state_ids:
+                    state_ids[target] = len(state_ids)
+                    pending.append(target)
+                row[cls] = state_ids[target]
+
+            sid = state_ids[states]
+            while len(self.plain_accepts) <= sid:
+                self.plain_accepts.append(self.NO_MATCH)
+                self.bound_accepts.append(self.NO_MATCH)
+                self.transitions.extend([-1] * self.nclasses)
+            self.transitions[sid*self.nclasses:(sid+1)*self.nclasses] = row
+            self.plain_accepts[sid] = min([nfa.accepts[s] for s in states if nfa.accepts[s] >= 0], default=self.NO_MATCH)
+
+            bound_states = nfa.closure([t for s in states for t in nfa.bounds[s]])
+            for s in bound_states:
+                if nfa.edges[s] or nfa.bounds[s]:
+                    raise Exception("Word boundaries are only supported at the end of a pattern")
+            self.bound_accepts[sid] = min([nfa.accepts[s] for s in bound_states if nfa.accepts[s] >= 0], default=self.NO_MATCH)
+
+    def build_classes(self, atoms: list[str]):
+        # Characters matched by exactly the same atoms (and equally word/non-word) share a class
+        compiled = [re.compile(atom) for atom in atoms]
+        signatures: dict[tuple[bool, ...], int] = {}
+        self.class_atoms: list[tuple[bool, ...]] = []
+        self.word_classes: list[bool] = []
+
+        def class_of(c: str) -> int:
+            signature = tuple(bool(regex.fullmatch(c)) for regex in compiled) + (bool(re.fullmatch(r'\w', c)),)
+            if signature not in signatures:
+                signatures[signature] = len(signatures)
+                self.class_atoms.append(signature[:-1])
+                self.word_classes.append(signature[-1])
+            return signatures[signature]
+
+        self.ascii_classes: list[int] = [class_of(chr(i)) for i in range(128)]
+        self.unicode_classes: list[int] = [class_of(c) for c in UNICODE_REPS]
+        self.nclasses: int = len(signatures)
+
+    def char_class(self, c: str) -> int:
+        o = ord(c)
+        if o < 128: return self.ascii_classes[o]
+        elif c.isdecimal(): return self.unicode_classes[0]
+        elif c.isalnum(): return self.unicode_classes[1]
+        elif c.isspace(): return self.unicode_classes[2]
+        return self.unicode_classes[3]
+
+    def is_word(self, text: str, pos: int) -> bool:
+        return pos < len(text) and self.word_classes[self.char_class(text[pos])]
+
+    def scan(self, text: str, pos: int) -> tuple[int, int]:
+        '''
+        Returns the index of the matched pattern and the end of the match, or (-1, -1)
+        '''
+        transitions = self.transitions
+        nclasses = self.nclasses
+        best = self.NO_MATCH
+        end = -1
+
+        state = 0
+        i = pos
+        while i < len(text):
+            state = transitions[state * nclasses + self.char_class(text[i])]
+            if state < 0: break
+            i += 1
+
+            accept = self.plain_accepts[state]
+            if accept <= best:
+                best = accept
+                end = i
+            accept = self.bound_accepts[state]
+            if accept <= best and self.is_word(text, i-1) != self.is_word(text, i):
+                best = accept
+                end = i
+
+        if best == self.NO_MATCH: return -1, -1
+        return best, end
+
+    def scan_bytes(self, text, pos: int) -> tuple[int, int]:
+        '''
+        Same as scan for a bytes-like buffer.  Like bytes regex patterns, bytes outside ASCII are
+        never word, digit or whitespace characters.
+        '''
+        transitions = self.transitions
+        nclasses = self.nclasses
+        classes = self.ascii_classes
+        other = self.unicode_classes[3]
+        words = self.word_classes
+        best = self.NO_MATCH
+        end = -1
+
+        state = 0
+        i = pos
+        while i < len(text):
+            c = text[i]
+            state = transitions[state * nclasses + (classes[c] if c < 128 else other)]
+            if state < 0: break
+            i += 1
+
+            accept = self.plain_accepts[state]
+            if accept <= best:
+                best = accept
+                end = i
+            accept = self.bound_accepts[state]
+            if accept <= best and words[classes[c] if c < 128 else other] != (i < len(text) and text[i] < 128 and words[classes[text[i]]]):
+                best = accept
+                end = i
+
+        if best == self.NO_MATCH: return -1, -1
+        return best, end
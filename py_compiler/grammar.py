@@ -0,0 +1,156 @@
+from typing import Callable, Hashable
+
+class Nonterminal:
+    '''
+    A grammar symbol defined by productions.  row maps the type of the next token (Grammar.end at the end of the input) to
+    the production to expand, or to another row for the token after it when one token doesn't decide.  default is
+    expanded for any other token: the production that can derive empty, so a token that can't follow is reported
+    by whatever symbol comes next, as the hand-written rules leave it to their caller
+    '''
+    def __init__(self, name: str):
+        self.name: str = name
+        self.productions: list[Production] = []
+        self.row: dict[Hashable, 'Production | dict'] = {}
+        self.default: Production | None = None
+
+    def __repr__(self) -> str:
+        return self.name
+
+class Production:
+    def __init__(self, lhs: Nonterminal, rhs: tuple, names: list[str], action: Callable):
+        self.lhs: Nonterminal = lhs
+        self.rhs: tuple = rhs  # Terminals and Nonterminals
+        self.names: list[str] = names
+        self.action: Callable = action  # Called with the values of the rhs symbols, returns the value of lhs
+        self.size: int = len(rhs)
+        self.pushed: tuple = tuple(reversed(rhs))  # Pushed on the parse stack so the first symbol is on top
+
+    def __repr__(self) -> str:
+        return f"{self.lhs} : {' '.join(self.names) or 'empty'}"
+
+class Grammar:
+    '''
+    Strong LL(k) parse tables generated from productions written like the parser docstrings:
+
+        Name : TERMINAL Nonterminal
+              | empty
+
+    Names in capitals are terminals (looked up in terminals, which gives the token types the tables are keyed by),
+    other names are nonterminals and empty is the empty production.  end is the key for the end of the input.  Where k tokens of lookahead still don't decide between productions the one listed first is taken,
+    like the hand-written rules checking their cases in order (i.e. a dangling else belongs to the nearest if), and
+    the ambiguity is recorded in conflicts
+    '''
+    def __init__(self, rules: list[tuple[str, Callable]], terminals: dict[str, Hashable], start: str, k: int = 2,
+                 end: Hashable = None):
+        self.k: int = k
+        self.end: Hashable = end
+        self.nonterminals: dict[str, Nonterminal] = {}
+        self.productions: list[Production] = []
+        self.conflicts: list[tuple[Nonterminal, tuple, list[Production]]] = []
+
+        for rule, action in rules:
+            name, _, alternatives = rule.partition(':')
+            lhs: Nonterminal = self.nonterminal(name.strip())
+            for alternative in alternatives.split('|'):
+                names: list[str] = alternative.split()
+                if names == ['empty']: names = []
+                rhs = tuple(terminals[name] if name.isupper() else self.nonterminal(name) for name in names)
+                production: Production = Production(lhs, rhs, names, action)
+                lhs.productions.append(production)
+                self.productions.append(production)
+
+        for nonterminal in self.nonterminals.values():
+            if not nonterminal.productions: raise Exception(f"Nonterminal {nonterminal} has no productions")
+        self.start: Nonterminal = self.nonterminals[start]
+
+        self.first: dict[Nonterminal, set[tuple]] = self.build_first()
+        self.follow: dict[Nonterminal, set[tuple]] = self.build_follow()
+        for nonterminal in self.nonterminals.values():
+            self.build_row(nonterminal)
+
+    def nonterminal(self, name: str) -> Nonterminal:
+        if name not in self.nonterminals: self.nonterminals[name] = Nonterminal(name)
+        return self.nonterminals[name]
+
+    def concat(self, left: set[tuple], right: set[tuple]) -> set[tuple]:
+        '''
+        Every string of left followed by every string of right, cut to k symbols
+        '''
+        result: set[tuple] = set()
+        for prefix in left:
+            if len(prefix) >= self.k: result.add(prefix)
+            else: result.update((prefix + suffix)[:self.k] for suffix in right)
+        return result
+
+    def first_of(self, symbols: tuple, first: dict[Nonterminal, set[tuple]] | None = None) -> set[tuple]:
+        '''
+        The first k terminals of every string symbols derives (fewer if the string is shorter)
+        '''
+        first = first if first is not None else self.first
+        result: set[tuple] = {()}
+        for sym in symbols:
+            if all(len(prefix) >= self.k for prefix in result): break
+            result = self.concat(result, first[sym] if type(sym) is Nonterminal else {(sym,)})
+        return result
+
+    def build_first(self) -> dict[Nonterminal, set[tuple]]:
+        first: dict[Nonterminal, set[tuple]] = {nonterminal: set() for nonterminal in self.nonterminals.values()}
+        changed: bool = True
+        while changed:
+            changed = False
+            for production in self.productions:
+                strings: set[tuple] = self.first_of(production.rhs, first)
+                if not strings <= first[production.lhs]:
+                    first[production.lhs] |= strings
+                    changed = True
+        return first
+
+    def build_follow(self) -> dict[Nonterminal, set[tuple]]:
+        follow: dict[Nonterminal, set[tuple]] = {nonterminal: set() for nonterminal in self.nonterminals.values()}
+        follow[self.start].add(())  # End of input
+        changed: bool = True
+        while changed:
+            changed = False
+            for production in self.productions:
+                for i, sym in enumerate(production.rhs):
+                    if type(sym) is not Nonterminal: continue
+                    strings: set[tuple] = self.concat(self.first_of(production.rhs[i+1:]), follow[production.lhs])
+                    if not strings <= follow[sym]:
+                        follow[sym] |= strings
+                        changed = True
+        return follow
+
+    def build_row(self, nonterminal: Nonterminal):
+        candidates: list[tuple[Production, set[tuple]]] = []
+        for production in nonterminal.productions:
+            first: set[tuple] = self.first_of(production.rhs)
+            if nonterminal.default is None and () in first: nonterminal.default = production
+            candidates.append((production, self.concat(first, self.follow[nonterminal])))
+        nonterminal.row = self.build_cell(nonterminal, candidates, 0)
+
+    def build_cell(self, nonterminal: Nonterminal, candidates: list[tuple[Production, set[tuple]]], depth: int) -> dict:
+        '''
+        Row of the productions to expand by the token at depth, the candidates being the productions with the
+        lookahead strings that still lead to them
+        '''
+        by_token: dict[Hashable, list[tuple[Production, set[tuple]]]] = {}
+        for production, strings in candidates:
+            split: dict[Hashable, set[tuple]] = {}
+            for string in strings:
+                split.setdefault(string[depth] if len(string) > depth else self.end, set()).add(string)
+            for token, subset in split.items():
+                by_token.setdefault(token, []).append((production, subset))
+
+        row: dict = {}
+        for token, cell in by_token.items():
+            if len(cell) == 1: row[token] = cell[0][0]
+            elif token == self.end or depth + 1 == self.k:  # Nothing further to look at, the first listed is taken
+                prefix: tuple = next(iter(cell[0][1]))[:depth + 1]  # The strings in a cell share their first depth + 1 tokens
+                self.conflicts.append((nonterminal, prefix, [production for production, _ in cell]))
+                row[token] = cell[0][0]
+            else:
+                subrow: dict = self.build_cell(nonterminal, cell, depth + 1)
+                entries: list = list(subrow.values())
+                # A deeper row that only ever picks one production is the same as picking it here
+                row[token] = entries[0] if all(entry is entries[0] for entry in entries) and type(entries[0]) is Production else subrow
+        return row
@@ -1,6 +1,24 @@
 import re
+import sys
 
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+from copy import copy
 from enum import Enum
+from mmap import mmap
+from typing import BinaryIO, Iterator, TextIO
+
+from .core_elements import LineIndex, decode_literal
+from .dfa import DFA
+
+# Lexers accept text or a bytes-like buffer (i.e. an mmap of the source file) which is matched
+# without decoding.  Offsets into a buffer are byte offsets.
+Source = str | bytes | memoryview | mmap
+
+def source_text(source: Source, start: int, end: int) -> str:
+    text = source[start:end]
+    return text if type(text) is str else bytes(text).decode()
 
 class Token:
     class TokenType(Enum):
@@ -28,7 +46,7 @@ class Token:
         DEFAULT = r'\bdefault\b'
         BREAK = r'\bbreak\b'
         RETURN = r'\breturn\b'
-        COMMENT = r'//.*\n|/\*.*\*/'
+        COMMENT = r'//[^\n]*\n?|/\*[^*]*\*+(?:[^/*][^*]*\*+)*/'
         VAL = r'\'\\?.\'|0x[0-9A-Fa-f]{1,8}\b|0o[0-7]{1,22}\b|0b[01]{1,64}\b|\d+\.\d*\b|\d*\.\d+\b|\d+\b'
         IDENTIFIER = r'[a-zA-Z_]\w*(\[\])?'
         QUOTE = r'\"[^\"]*\"'
@@ -73,89 +91,523 @@ class Token:
         SEMICOLON = r';'
         WS = r'\s+'
 
-    def __init__(self, type: TokenType, content: str, pos: int):
+    # Tokens only hold their type and span; content is read from the source the first time it is used
+    __slots__ = ('type', 'start', 'end', 'source', '__content', '__literal')
+
+    def __init__(self, type: TokenType, start: int, end: int, source: Source | None, content: str | None = None):
         self.type: self.TokenType = type
-        self.content: str = content
-        self.pos: int = pos
+        self.start: int = start
+        self.end: int = end
+        self.source: Source | None = source
+        self.__content: str | None = content
+        self.__literal: tuple[int | float, str] | None = None
+
+    @property
+    def pos(self) -> int:
+        return self.end
+
+    @property
+    def content(self) -> str:
+        if self.__content is None:
+            content: str = source_text(self.source, self.start, self.end)
+            self.__content = sys.intern(content) if self.type in INTERNED_TYPES else content
+        return self.__content
+
+    @property
+    def literal(self) -> tuple[int | float, str] | None:
+        '''
+        Decoded (number, primitive type) of a VAL token, computed once
+        '''
+        if self.__literal is None and self.type == Token.TokenType.VAL: self.__literal = decode_literal(self.content)
+        return self.__literal
 
     def __str__(self):
         return "Token({}, '{}'  :  {})".format(self.type.name, self.content, self.pos)
 
+# Keyword TokenTypes (PUBLIC through RETURN) keyed by their word.  Words are scanned once as an
+# IDENTIFIER and then resolved to a keyword with a single lookup instead of a pattern per keyword.
+KEYWORDS: dict[str, Token.TokenType] = {tok.value[2:-2]: tok for tok in Token.TokenType if re.fullmatch(r'\\b\w+\\b', tok.value)}
+
+# Every other token pattern joined into a single alternation of named groups, compiled once at import.
+# Alternatives are tried in TokenType declaration order so the existing priorities still hold
+# (i.e. NEQ before NOT, SET_ADD before ADD) and match.lastgroup names the matched TokenType.
+MASTER_PATTERN: re.Pattern = re.compile('|'.join(f'(?P<{tok.name}>{tok.value})' for tok in Token.TokenType if tok not in KEYWORDS.values()))
+
+# Bytes versions of the master pattern and keyword table for lexing bytes-like sources
+BYTES_MASTER_PATTERN: re.Pattern = re.compile(MASTER_PATTERN.pattern.encode())
+BYTES_KEYWORDS: dict[bytes, Token.TokenType] = {word.encode(): tok for word, tok in KEYWORDS.items()}
+
+# Names repeat throughout a file (i.e. u32, this) so their content is interned to share one string
+INTERNED_TYPES: frozenset[Token.TokenType] = frozenset(KEYWORDS.values()) | {Token.TokenType.IDENTIFIER}
+GROUP_TYPES: dict[str, Token.TokenType] = {tok.name: tok for tok in Token.TokenType}
+
+# Small integer codes for each TokenType (declaration order) used by compact token streams
+TOKEN_TYPES: list[Token.TokenType] = list(Token.TokenType)
+TOKEN_CODES: dict[Token.TokenType, int] = {tok: code for code, tok in enumerate(TOKEN_TYPES)}
+END_CODE: int = len(TOKEN_TYPES)  # Code read past the last token by a TokenCursor, no TokenType has it
+
+# Whitespace and comments between tokens.  No other pattern can match where these do (COMMENT comes
+# before DIV and SET_DIV) so they can be skipped with this smaller pattern before scanning a token.
+TRIVIA_PATTERN: re.Pattern = re.compile(f'(?P<COMMENT>{Token.TokenType.COMMENT.value})|(?P<WS>{Token.TokenType.WS.value})')
+BYTES_TRIVIA_PATTERN: re.Pattern = re.compile(TRIVIA_PATTERN.pattern.encode())
+
+class TokenStream:
+    '''
+    Struct-of-arrays token stream for a whole file.  Token i has type code types[i] (see TOKEN_TYPES)
+    and covers text[starts[i]:ends[i]].  Token objects are only built when indexed.  The whitespace and
+    comments skipped between tokens are kept in trivia, a TokenStream of their own.
+    '''
+    def __init__(self, text: Source, types: array, starts: array, ends: array, trivia: 'TokenStream | None' = None):
+        self.text: Source = text
+        self.types: array = types  # array('B') of token type codes
+        self.starts: array = starts  # array('I') of start offsets
+        self.ends: array = ends  # array('I') of end offsets
+        self.trivia: TokenStream | None = trivia
+
+    @classmethod
+    def empty(cls, text: Source) -> 'TokenStream':
+        return cls(text, array('B'), array('I'), array('I'))
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    def __getitem__(self, i: int) -> Token:
+        return Token(TOKEN_TYPES[self.types[i]], self.starts[i], self.ends[i], self.text)
+
+    def __iter__(self):
+        for i in range(len(self.types)): yield self[i]
+
+    def type_of(self, i: int) -> Token.TokenType:
+        return TOKEN_TYPES[self.types[i]]
+
+    def content_of(self, i: int) -> str:
+        return source_text(self.text, self.starts[i], self.ends[i])
+
+    def append(self, tok: Token.TokenType, start: int, end: int) -> None:
+        self.types.append(TOKEN_CODES[tok])
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def cursor(self) -> 'TokenCursor':
+        return TokenCursor(self)
+
+class TokenCursor:
+    '''
+    Reads a TokenStream with an index instead of lexing, through the same lookahead methods as Lexer
+    so a Parser can take either.  Pops always consume the next tokens (the parser only pops tokens it
+    has just peeked) and token types can be checked by code (see TOKEN_CODES) without building Tokens.
+    '''
+    BLOCK_SIZE = 256
+    LOOKAHEAD = 2  # END_CODEs after the stream's codes, so codes[index + k] for k < LOOKAHEAD needs no bounds check
+
+    def __init__(self, stream: TokenStream, debug_mode: bool = False):
+        self.stream: TokenStream = stream
+        self.text: Source = stream.text
+        self.types: array = stream.types
+        self.codes: array = stream.types + array('B', [END_CODE] * self.LOOKAHEAD)
+        self.index: int = 0  # Next token to consume
+        self.debug_mode: bool = debug_mode
+        self.__lines: LineIndex | None = None
+
+        # Tokens are built a block at a time as the index reaches them, so the parser's repeated peeks
+        # of the same tokens are list lookups and memory stays bounded by the block size
+        self.__base: int = 0  # Index of the first token in the block
+        self.__block: list[Token] = []
+
+        self.MODS = [Token.TokenType.PUBLIC,
+                        Token.TokenType.SEALED,
+                        Token.TokenType.ABSTRACT,
+                        Token.TokenType.STATIC,
+                        Token.TokenType.MUTABLE]
+
+    @property
+    def line_index(self) -> LineIndex:
+        if self.__lines is None: self.__lines = LineIndex(self.text)
+        return self.__lines
+
+    def line_col(self, pos: int) -> tuple[int, int]:
+        return self.line_index.line_col(pos)
+
+    @property
+    def last_end(self) -> int:
+        # End of the last token taken
+        return self.stream.ends[self.index-1] if self.index > 0 else 0
+
+    def token(self, i: int) -> Token:
+        j: int = i - self.__base
+        if 0 <= j < len(self.__block): return self.__block[j]
+        if i >= len(self.types): return None
+
+        end: int = min(i + self.BLOCK_SIZE, len(self.types))
+        stream: TokenStream = self.stream
+        text: Source = self.text
+        self.__block = [Token(TOKEN_TYPES[code], start, stop, text) for code, start, stop in zip(self.types[i:end], stream.starts[i:end], stream.ends[i:end])]
+        self.__base = i
+        return self.__block[0]
+
+    def peek_code(self, k: int = 0) -> int:
+        '''
+        Type code of the token k ahead of the index without building it, or END_CODE past the end
+        '''
+        i: int = self.index + k
+        return self.types[i] if i < len(self.types) else END_CODE
+
+    def fork(self, index: int) -> 'TokenCursor':
+        '''
+        Another cursor over the same stream at index, sharing the codes instead of copying them again
+        '''
+        cursor: TokenCursor = copy(self)
+        cursor.index = index
+        return cursor
+
+    def next_token(self) -> Token:
+        i: int = self.index
+        if i < len(self.types): self.index = i + 1
+        return self.token(i)
+
+    def next_tokens(self, n: int) -> list[Token]:
+        i: int = self.index
+        self.index = min(i + n, len(self.types))
+        return [self.token(j) for j in range(i, i + n)]
+
+    def peek_next(self) -> Token:
+        j: int = self.index - self.__base
+        if 0 <= j < len(self.__block): return self.__block[j]
+        return self.token(self.index)
+
+    def peek_tokens(self, n: int) -> list[Token]:
+        i: int = self.index
+        return [self.token(j) for j in range(i, i + n)]
+
+    def pop_token(self) -> None:
+        if self.index < len(self.types): self.index += 1
+
+    def pop_tokens(self, n: int) -> None:
+        self.index = min(self.index + n, len(self.types))
+
+    def push_token(self, tok: Token) -> None:
+        # Put back the last token taken (tok) so it is read again
+        self.index -= 1
+
+def shifted(offsets: array, delta: int) -> array:
+    '''
+    Offsets moved by delta for the part of a stream after an edit
+    '''
+    return offsets if delta == 0 else array('I', [offset + delta for offset in offsets])
+
+LEXER_ENGINES = ['regex', 'loop', 'dfa']
+
+token_dfa: DFA = None
+
+def get_dfa() -> DFA:
+    '''
+    Token DFA built from the TokenType patterns on first use
+    '''
+    global token_dfa
+    if token_dfa is None: token_dfa = DFA([tok.value for tok in TOKEN_TYPES])
+    return token_dfa
+
 class Lexer:
-    def __init__(self, text: str, debug_mode: bool = False):
-        self.text: str = text
+    def __init__(self, text: Source, debug_mode: bool = False, engine: str = 'regex', keep_trivia: bool = False):
+        self.text: Source = text
+        self.binary: bool = not isinstance(text, str)  # Buffers are matched with bytes patterns
         self.pos: int = 0
-        self.hold_tokens: list[tuple[Token,int]] = []
+        self.hold_tokens: deque[Token] = deque()  # Lookahead tokens that have been peeked but not consumed
+        self.last_end: int = 0  # End of the last token taken
+        self.keep_trivia: bool = keep_trivia  # Record skipped whitespace and comments (one entry each), for tools that want comments
+        self.trivia: TokenStream | None = TokenStream.empty(text) if keep_trivia else None  # Trivia skipped by next_token
+        self.__lines: LineIndex | None = None
 
         self.debug_mode: bool = debug_mode
 
+        if engine == 'regex':
+            self.__pattern: re.Pattern = BYTES_MASTER_PATTERN if self.binary else MASTER_PATTERN
+            self.__keywords: dict[str | bytes, Token.TokenType] = BYTES_KEYWORDS if self.binary else KEYWORDS
+            self.__brackets: str | bytes = b'[]' if self.binary else '[]'
+            self.__trivia_pattern: re.Pattern = BYTES_TRIVIA_PATTERN if self.binary else TRIVIA_PATTERN
+            self.__scan = self.__scan_regex
+            self.__scan_trivia = self.__scan_trivia_regex
+        elif engine == 'loop': self.__scan = self.__scan_loop
+        elif engine == 'dfa':
+            self.dfa: DFA = get_dfa()
+            self.__scan = self.__scan_dfa
+        else: raise Exception(f"Unknown lexer engine: {engine}")
+        if engine != 'regex': self.__scan_trivia = self.__scan_trivia_engine
+        self.engine: str = engine
+
         self.MODS = [Token.TokenType.PUBLIC,
                         Token.TokenType.SEALED,
                         Token.TokenType.ABSTRACT,
                         Token.TokenType.STATIC,
                         Token.TokenType.MUTABLE]
 
+    @property
+    def line_index(self) -> LineIndex:
+        '''
+        Line start offsets of the text, built on first use
+        '''
+        if self.__lines is None: self.__lines = LineIndex(self.text)
+        return self.__lines
+
+    def line_col(self, pos: int) -> tuple[int, int]:
+        return self.line_index.line_col(pos)
+
     def next_token(self) -> Token:
-        if len(self.hold_tokens) > 0: 
-            tok: Token = self.hold_tokens.pop(0)
-            return tok
-        return self.__next_token(False)
+        tok: Token = self.hold_tokens.popleft() if self.hold_tokens else self.__next_token(False)
+        if tok is not None: self.last_end = tok.end
+        return tok
     
     def next_tokens(self, n: int) -> list[Token]:
         tokens = []
-        if len(self.hold_tokens) > 0: 
-            if n >= len(self.hold_tokens):
-                n -= len(self.hold_tokens)
-                tokens = self.hold_tokens.copy()
-                self.hold_tokens = []
-            else:
-                tokens = self.hold_tokens[0:n]
-                del self.hold_tokens[0:n]
-                return tokens
+        hold: deque[Token] = self.hold_tokens
+        while n > 0 and hold:
+            tokens.append(hold.popleft())
+            n -= 1
         
         for _ in range(n):
             tokens.append(self.__next_token(False))
+        for tok in reversed(tokens):
+            if tok is not None:
+                self.last_end = tok.end
+                break
         return tokens
     
-    def peek_next(self) -> Token: return self.peek_tokens(1)[0]
+    def peek_next(self) -> Token:
+        if self.hold_tokens: return self.hold_tokens[0]
+        return self.__next_token(True)
 
     def peek_tokens(self, n: int) -> list[Token]:
-        tokens = []
-        if len(self.hold_tokens) > 0:
-            if n >= len(self.hold_tokens):
-                n -= len(self.hold_tokens)
-                tokens = self.hold_tokens.copy()
-            else:
-                return self.hold_tokens[0:n]
-
-        for _ in range(n):
-            tokens.append(self.__next_token(True))
+        hold: deque[Token] = self.hold_tokens
+        while len(hold) < n:
+            if self.__next_token(True) is None:  # End of file, pad with None
+                return list(hold) + [None] * (n - len(hold))
 
-        return tokens
+        return [hold[i] for i in range(n)]
     
     def pop_token(self) -> None:
-        if len(self.hold_tokens) > 0:
-            self.hold_tokens.pop(0)
+        if self.hold_tokens: self.last_end = self.hold_tokens.popleft().end
 
     def pop_tokens(self, n: int) -> None:
-        for _ in range(min(len(self.hold_tokens), n)):
-            self.hold_tokens.pop(0)
-    
+        hold: deque[Token] = self.hold_tokens
+        for _ in range(min(len(hold), n)):
+            self.last_end = hold.popleft().end
+
+    def push_token(self, tok: Token) -> None:
+        # Put back the last token taken (tok) so it is read again
+        self.hold_tokens.appendleft(tok)
+
+    def tokenize_all(self) -> TokenStream:
+        '''
+        Lex the whole text in one pass into a TokenStream without creating Token objects
+        '''
+        types = array('B')
+        starts = array('I')
+        ends = array('I')
+
+        text: Source = self.text
+        trivia: TokenStream | None = TokenStream.empty(text) if self.keep_trivia else None
+        pos: int = self.__skip_trivia(0, trivia)
+        while pos < len(text):
+            tok, end = self.__scan(pos)
+            if tok is None:
+                if self.debug_mode: print("Unexpected content does not match any tokens!")
+                raise Exception()
+
+            types.append(TOKEN_CODES[tok])
+            starts.append(pos)
+            ends.append(end)
+            pos = self.__skip_trivia(end, trivia)
+
+        return TokenStream(text, types, starts, ends, trivia)
+
+    @classmethod
+    def stream(cls, file: TextIO | BinaryIO, chunk_size: int = 1 << 16, debug_mode: bool = False, engine: str = 'regex') -> Iterator[Token]:
+        '''
+        Lex a file read in chunks of chunk_size, yielding tokens as they are completed.  Token positions
+        are absolute offsets into the file and their content is copied out of the chunk, so memory stays
+        proportional to the chunk size (plus the longest line or token) instead of the file size.
+        '''
+        lexer = cls(file.read(chunk_size), debug_mode, engine)
+        eof: bool = len(lexer.text) == 0
+        base: int = 0  # Offset of the start of the buffered text in the file
+        pos: int = 0
+
+        while True:
+            text: Source = lexer.text
+
+            # Tokens other than QUOTE and block comments never cross a line break and their patterns never
+            # look past one, so every token starting before the last line break in the buffer can be decided
+            cut: int = len(text) if eof else text.rfind(b'\n' if lexer.binary else '\n') + 1
+            while pos < cut:
+                tok, end = lexer.__scan(pos)
+                if tok is None:
+                    if not eof and text[pos:pos+1] in ('"', b'"'): break  # Quote may be closed in a later chunk
+                    if lexer.debug_mode: print("Unexpected content does not match any tokens!")
+                    raise Exception()
+                if not eof and end >= len(text): break  # Token may continue in the next chunk
+                if not eof and tok == Token.TokenType.DIV and text[end:end+1] in ('*', b'*'): break  # Block comment may be closed in a later chunk
+
+                if not (tok == Token.TokenType.WS or tok == Token.TokenType.COMMENT):
+                    content: str = source_text(text, pos, end)
+                    if tok in INTERNED_TYPES: content = sys.intern(content)
+                    yield Token(tok, base + pos, base + end, None, content)
+                pos = end
+
+            if eof: return
+
+            chunk: Source = file.read(chunk_size)
+            eof = len(chunk) == 0
+            lexer.text = text[pos:] + chunk
+            base += pos
+            pos = 0
+
+    def relex(self, stream: TokenStream, offset: int, removed: int, inserted: str | bytes) -> TokenStream:
+        '''
+        Apply an edit (replace `removed` characters at offset with `inserted`) to the text of a previous
+        TokenStream and return the new stream.  Only the tokens from the last safe boundary before the
+        edit up to where the new tokens line up with the old stream again are relexed.  The lexer's text
+        becomes the edited text and its position is reset.  A bytes-like source takes bytes (offsets are
+        byte offsets) and its edited text is bytes.
+        '''
+        old_text: Source = stream.text
+        binary: bool = type(old_text) is not str
+        if binary != (type(inserted) is not str):
+            raise Exception(f"relex of a {'bytes' if binary else 'str'} source needs {'bytes' if binary else 'str'} inserted text, not {type(inserted).__name__}")
+        if binary: text: Source = bytes(old_text[:offset]) + inserted + bytes(old_text[offset+removed:])
+        else: text: Source = old_text[:offset] + inserted + old_text[offset+removed:]
+        delta: int = len(inserted) - removed
+        edit_end: int = offset + len(inserted)  # End of the inserted text in the new text
+
+        self.text = text
+        self.pos = 0
+        self.hold_tokens.clear()
+        self.last_end = 0
+        self.trivia = TokenStream.empty(text) if self.keep_trivia else None
+        self.__lines = None
+
+        # Tokens ending before the edited line are unaffected (token patterns never look past a line
+        # break unless they cross it, and a block comment reaching the edit is rescanned from its start
+        # as trivia after the last token) so lexing restarts at the end of the last of them
+        line_start: int = text.rfind(b'\n' if binary else '\n', 0, offset) + 1  # Text before the edit is unchanged
+        keep: int = bisect_left(stream.ends, line_start)
+
+        # An unclosed '/*' lexes as DIV followed by a '*' token.  If the edit may close it (a '*/' now
+        # touches the edit) lexing restarts at the first one instead.
+        if (b'*/' if binary else '*/') in text[max(offset-1, 0):edit_end+1]:
+            div: int = TOKEN_CODES[Token.TokenType.DIV]
+            for i in range(keep):
+                if stream.types[i] == div and text[stream.ends[i]:stream.ends[i]+1] in ('*', b'*'):
+                    keep = i
+                    break
+        pos: int = stream.ends[keep-1] if keep > 0 else 0
+
+        types = stream.types[:keep]
+        starts = stream.starts[:keep]
+        ends = stream.ends[:keep]
+
+        old_trivia: TokenStream | None = stream.trivia if self.keep_trivia else None
+        trivia: TokenStream | None = None
+        if old_trivia is not None:
+            trivia_keep: int = bisect_right(old_trivia.ends, pos)
+            trivia = TokenStream(text, old_trivia.types[:trivia_keep], old_trivia.starts[:trivia_keep], old_trivia.ends[:trivia_keep])
+
+        old_starts: array = stream.starts
+        resume: int = bisect_left(old_starts, offset + removed)  # First old token that may line up again
+        while pos < len(text):
+            tok, end = self.__scan(pos)
+            if tok is None:
+                if self.debug_mode: print("Unexpected content does not match any tokens!")
+                raise Exception()
+
+            if tok == Token.TokenType.WS or tok == Token.TokenType.COMMENT:
+                if trivia is not None: trivia.append(tok, pos, end)
+            else:
+                if pos > edit_end:  # Past the edit, stop once an old token starts at the same place
+                    while resume < len(old_starts) and old_starts[resume] + delta < pos: resume += 1
+                    if resume < len(old_starts) and old_starts[resume] + delta == pos:
+                        types.extend(stream.types[resume:])
+                        starts.extend(shifted(old_starts[resume:], delta))
+                        ends.extend(shifted(stream.ends[resume:], delta))
+                        if old_trivia is not None:  # Trivia after the tokens that line up again is unchanged too
+                            i: int = bisect_left(old_trivia.starts, old_starts[resume])
+                            trivia.types.extend(old_trivia.types[i:])
+                            trivia.starts.extend(shifted(old_trivia.starts[i:], delta))
+                            trivia.ends.extend(shifted(old_trivia.ends[i:], delta))
+                        return TokenStream(text, types, starts, ends, trivia)
+
+                types.append(TOKEN_CODES[tok])
+                starts.append(pos)
+                ends.append(end)
+            pos = end
+
+        return TokenStream(text, types, starts, ends, trivia)
+
+    def __skip_trivia(self, pos: int, trivia: TokenStream | None) -> int:
+        '''
+        Skip the whitespace and comments starting at pos, recording their spans in trivia (if given),
+        and return the start of the next token
+        '''
+        while True:
+            tok, end = self.__scan_trivia(pos)
+            if tok is None: return pos
+            if trivia is not None: trivia.append(tok, pos, end)
+            pos = end
+
     def __next_token(self, peek: bool) -> Token:
-        if self.pos >= len(self.text): return None
+        start: int = self.__skip_trivia(self.pos, self.trivia)
+        self.pos = start
+        if start >= len(self.text): return None
 
-        match: re.Match[str] = None
-        for tok in Token.TokenType.__members__.values():
-            regex: re.Pattern = re.compile(tok.value)
-            match = regex.match(self.text, self.pos)
-            if match:
-                self.pos = match.end()                
-                if tok == Token.TokenType.WS or tok == Token.TokenType.COMMENT: return self.__next_token(peek)
-                else: 
-                    token = Token(tok, match.group().strip(), self.pos)
-                    if self.debug_mode: print(f"NEXT: {tok.name} {token.content} {self.pos}")
-                    if peek: self.hold_tokens.append(token)
-                    return token
+        tok, end = self.__scan(start)
+        if tok is not None:
+            self.pos = end
+            token = Token(tok, start, end, self.text)
+            if self.debug_mode: print(f"NEXT: {tok.name} {token.content} {self.pos}")
+            if peek: self.hold_tokens.append(token)
+            return token
         
         if self.debug_mode: print("Unexpected content does not match any tokens!")
-        raise Exception()
\ No newline at end of file
+        raise Exception()
+
+    # Each scan engine returns the TokenType and end position of the token at pos, or (None, -1)
+    # Trivia scans only return WS and COMMENT tokens
+
+    def __scan_trivia_regex(self, pos: int) -> tuple[Token.TokenType, int]:
+        match: re.Match = self.__trivia_pattern.match(self.text, pos)
+        if match is None: return None, -1
+        return GROUP_TYPES[match.lastgroup], match.end()
+
+    def __scan_trivia_engine(self, pos: int) -> tuple[Token.TokenType, int]:
+        c: str | bytes = self.text[pos:pos+1]
+        if self.binary: c = bytes(c)
+        if not (c.isspace() or c in ('/', b'/')): return None, -1
+        tok, end = self.__scan(pos)
+        if tok == Token.TokenType.WS or tok == Token.TokenType.COMMENT: return tok, end
+        return None, -1
+
+    def __scan_regex(self, pos: int) -> tuple[Token.TokenType, int]:
+        match: re.Match = self.__pattern.match(self.text, pos)
+        if match is None: return None, -1
+
+        tok: Token.TokenType = GROUP_TYPES[match.lastgroup]
+        if tok == Token.TokenType.IDENTIFIER:
+            word: str | bytes = match.group()
+            if word in self.__keywords: return self.__keywords[word], match.end()
+            elif word.endswith(self.__brackets) and word[:-2] in self.__keywords:  # Keyword followed by BRACKETS
+                return self.__keywords[word[:-2]], match.end() - 2
+        return tok, match.end()
+
+    def __scan_loop(self, pos: int) -> tuple[Token.TokenType, int]:
+        # Original engine that tries each pattern in turn, kept as a baseline for benchmarks
+        match: re.Match[str] = None
+        for tok in Token.TokenType.__members__.values():
+            regex: re.Pattern = re.compile(tok.value.encode() if self.binary else tok.value)
+            match = regex.match(self.text, pos)
+            if match: return tok, match.end()
+        return None, -1
+
+    def __scan_dfa(self, pos: int) -> tuple[Token.TokenType, int]:
+        if self.binary: code, end = self.dfa.scan_bytes(self.text, pos)
+        else: code, end = self.dfa.scan(self.text, pos)
+        if code < 0: return None, -1
+        return TOKEN_TYPES[code], end
\ No newline at end of file
@@ -1,5 +1,8 @@
 import sys
 import os
+import mmap
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 
 from core_elements import Program
 from lexer import Lexer
@@ -13,16 +16,43 @@ def getAllFiles(dirpath):
             file_list.append(os.path.join(root,file))
     return file_list
 
+def parseFile(path: str, interface_only: bool):
+    """
+    Parses one source file, returning its class (or only its interface when interface_only is set) along with the
+    formatted diagnostics found in it. Runs in the worker processes in --jobs mode, so everything returned is picklable
+    """
+    # Lex straight from the mapped file instead of reading and decoding it into a string
+    with open(path, 'rb') as file:
+        empty: bool = os.fstat(file.fileno()).st_size == 0
+        content: mmap.mmap | bytes = b'' if empty else mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)  # An empty file can't be mapped
+
+    try:
+        lex = Lexer(content)
+        parser = Parser(lex, suppress_err=True, recover=True)  # Errors are reported together by the caller
+
+        klass = parser.parse_class_interface() if interface_only else parser.parse_class()
+
+        messages: list[str] = []
+        for diagnostic in parser.diagnostics:
+            line, col = diagnostic.line_col(lex.line_index)
+            messages.append(f"{path}:{line}:{col}: {diagnostic}")
+    finally:
+        if not empty: content.close()
+    return klass, messages
+
 if __name__ == '__main__':
 
-    args = sys.argv[1:]
-    if not len(args) == 1: exit()
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument('dirpath')
+    argparser.add_argument('--jobs', '-j', type=int, default=1, help='number of processes parsing files in parallel')
+    args = argparser.parse_args()
 
-    dirpath = args[0]
+    dirpath = args.dirpath
     if not os.path.isdir(dirpath): exit()
 
-    libs = [(f[f.find('/libs/')+6:],f) for f in getAllFiles(dirpath+'/libs')] if os.path.isdir(args[0] + '/libs') else []
-    src = [(f[f.find('/src/')+5:],f) for f in getAllFiles(dirpath+'/src')] if os.path.isdir(args[0] + '/src') else []
+    # Sorted so classes are always added to the program in the same order, whatever order the filesystem lists them in
+    libs = [(f[f.find('/libs/')+6:],f) for f in sorted(getAllFiles(dirpath+'/libs'))] if os.path.isdir(dirpath + '/libs') else []
+    src = [(f[f.find('/src/')+5:],f) for f in sorted(getAllFiles(dirpath+'/src'))] if os.path.isdir(dirpath + '/src') else []
 
     paths = libs + src
 
@@ -35,22 +65,37 @@ if __name__ == '__main__':
         os.mkdir(dirpath+'/build/intermediaries')
 
     program: Program = Program()
+    nerrors: int = 0
 
+    packages: list[str] = []
+    interface_only: list[bool] = []
     for filename, path in paths:
-        lastslash = path.rfind('/')
         filename = filename.replace('/','.')
-        
-        if not os.path.isfile(dirpath+'/build/intermediaries/'+filename.replace('.lang','.s')):
-            print("Parsing:", dirpath+'/build/intermediaries/'+filename.replace('.lang','.s'))
-            file = open(path)
+        packages.append(filename.replace('.lang',''))
+
+        # Already compiled classes only need their interface to be resolved from other classes
+        compiled: bool = os.path.isfile(dirpath+'/build/intermediaries/'+filename.replace('.lang','.s'))
+        interface_only.append(compiled)
+        if compiled: print("Parsing interface:", path)
+        else: print("Parsing:", dirpath+'/build/intermediaries/'+filename.replace('.lang','.s'))
+
+    files = [path for _, path in paths]
+    if args.jobs > 1:
+        # map hands the results back in submission order, so the program is assembled the same way as sequentially
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            results = list(executor.map(parseFile, files, interface_only, chunksize=max(1, len(files)//(args.jobs*4))))
+    else: results = map(parseFile, files, interface_only)
 
-            content: str = file.read().strip()
-            file.close()
+    for package, compiled, (klass, messages) in zip(packages, interface_only, results):
+        if messages:
+            for message in messages: print(message)
+            nerrors += len(messages)
+        elif compiled: program.add_interface(klass, package)
+        else: program.add_class(klass, package)
 
-            lex = Lexer(content)
-            
-            parser = Parser(lex)
-            program.add_class(parser.parse_class(), filename.replace('.lang',''))
+    if nerrors > 0:
+        print(f"{nerrors} errors, nothing compiled")
+        exit(1)
 
-    compiler = Compiler(dirpath, program.classes, program.packages, True)
+    compiler = Compiler(dirpath, program.classes, program.packages, True, program.interfaces)
     compiler.compileAll()
\ No newline at end of file
@@ -1,14 +1,114 @@
+from typing import Callable
+
 from .core_elements import *
-from .lexer import Lexer, Token
+from .lexer import Lexer, Token, TokenCursor, TOKEN_CODES, TOKEN_TYPES, END_CODE
+from .parser_error_util import Diagnostic, ParseError
+
+# Binary operators by the TokenType that spells them (the TokenTypes share the Operation names)
+expression_token_operations: dict[Token.TokenType, Operation] = {Token.TokenType[op.name]: op for op in expression_operations}
+
+# Same for condition and variable update operations.  The SET_BIT_* updates have no TokenType, they are lexed as an
+# operator followed by SET, so they are left out of the tables just as they never matched a single token before
+condition_token_operations: dict[Token.TokenType, ConditionOperation] = {Token.TokenType[op.name]: op for op in ConditionOperation}
+variable_set_token_operations: dict[Token.TokenType, VariableSetOperation] = {
+    Token.TokenType[op.name]: op for op in VariableSetOperation if op.name in Token.TokenType.__members__}
+
+# TokenTypes that can follow OPERATOR in an operator overloading function declaration
+overloadable_token_types: set[Token.TokenType] = {Token.TokenType[op.name] for op in all_operations if op.name in Token.TokenType.__members__}
+
+# Statement rules by the TokenType that starts them, bound per Parser in statement_handlers
+statement_rules: dict[Token.TokenType, str] = {
+    Token.TokenType.IF: 'parse_if_block',
+    Token.TokenType.WHILE: 'parse_while_block',
+    Token.TokenType.FOR: 'parse_for_block',
+    Token.TokenType.FOREACH: 'parse_foreach_block',
+    Token.TokenType.SWITCH: 'parse_switch',
+    Token.TokenType.RETURN: 'parse_return',
+    Token.TokenType.ASM: 'parse_asm_block',
+}
+
+# Precedence above every operator in precedence_map, so a whole expression is parsed
+lowest_precedence: int = max(precedence_map.values()) + 1
+
+# Type codes the hot rules compare a TokenCursor's codes against instead of building Tokens
+LBRACE_CODE: int = TOKEN_CODES[Token.TokenType.LBRACE]
+RBRACE_CODE: int = TOKEN_CODES[Token.TokenType.RBRACE]
+LPAREN_CODE: int = TOKEN_CODES[Token.TokenType.LPAREN]
+RPAREN_CODE: int = TOKEN_CODES[Token.TokenType.RPAREN]
+SEMICOLON_CODE: int = TOKEN_CODES[Token.TokenType.SEMICOLON]
+COMMA_CODE: int = TOKEN_CODES[Token.TokenType.COMMA]
+DOT_CODE: int = TOKEN_CODES[Token.TokenType.DOT]
+LT_CODE: int = TOKEN_CODES[Token.TokenType.LT]
+BIT_NOT_CODE: int = TOKEN_CODES[Token.TokenType.BIT_NOT]
+INC_CODE: int = TOKEN_CODES[Token.TokenType.INC]
+DEC_CODE: int = TOKEN_CODES[Token.TokenType.DEC]
+IDENTIFIER_CODE: int = TOKEN_CODES[Token.TokenType.IDENTIFIER]
+VAL_CODE: int = TOKEN_CODES[Token.TokenType.VAL]
+NEW_CODE: int = TOKEN_CODES[Token.TokenType.NEW]
+CLASS_CODE: int = TOKEN_CODES[Token.TokenType.CLASS]
+CONSTRUCTOR_CODE: int = TOKEN_CODES[Token.TokenType.CONSTRUCTOR]
+FUNCTION_CODE: int = TOKEN_CODES[Token.TokenType.FUNCTION]
+BREAK_CODE: int = TOKEN_CODES[Token.TokenType.BREAK]
+MOD_CODES: frozenset[int] = frozenset(TOKEN_CODES[tok] for tok in [Token.TokenType.PUBLIC, Token.TokenType.SEALED, Token.TokenType.ABSTRACT,
+                                                                   Token.TokenType.STATIC, Token.TokenType.MUTABLE])
+
+# Binary operators and their precedence indexed by type code (END_CODE included).  Codes that aren't operators
+# get lowest_precedence, so one lookup both finds operators and stops an expression at the first non-operator
+expression_code_operations: list[Operation | None] = [expression_token_operations.get(tok) for tok in TOKEN_TYPES] + [None]
+expression_code_precedences: list[int] = [lowest_precedence if op is None else precedence_map[op] for op in expression_code_operations]
+
+# Rules whose result is recorded in the SpanTable when a Parser is given one (nodes built inside a rule's
+# loop, like Values and Parameters, are recorded where they are built)
+spanned_rules: list[str] = ['parse_class', 'parse_class_declaration', 'parse_class_body', 'parse_class_member',
+                            'parse_constructor', 'parse_variable_declaration', 'parse_function_declaration',
+                            'parse_operation_tree', 'parse_member_access', 'parse_constructor_call',
+                            'parse_function_call', 'parse_body', 'parse_statement',
+                            'parse_return', 'parse_asm_block', 'parse_if_block', 'parse_while_block',
+                            'parse_for_block', 'parse_foreach_block', 'parse_switch', 'parse_case',
+                            'parse_case_body', 'parse_conditions', 'parse_condition', 'parse_variable_update']
 
 class Parser:
 
-    def __init__(self, lexer: Lexer, debug_mode: bool = False, suppress_err: bool = False):
-        self.lexer: Lexer = lexer
+    def __init__(self, lexer: Lexer | TokenCursor, debug_mode: bool = False, suppress_err: bool = False, defer_bodies: bool = False,
+                 incremental: bool = False, recover: bool = False, spans: SpanTable | None = None):
+        # The rules read a TokenStream through a TokenCursor, a Lexer is tokenized up front into one
+        if isinstance(lexer, Lexer): lexer = TokenCursor(lexer.tokenize_all(), lexer.debug_mode)
+        self.lexer: TokenCursor = lexer
         self.debug_mode: bool = debug_mode
         self.suppress_err: bool = suppress_err
+        self.defer_bodies: bool = defer_bodies  # Skip function/constructor bodies and parse them when first used
+
+        # Collect errors in diagnostics and keep parsing after the statement or class member they are in
+        self.recover: bool = recover
+        self.diagnostics: list[Diagnostic] = []
+
+        # Class members by their source text, so reparse_class can reuse the ones an edit didn't touch
+        self.members: dict[str, list[tuple[Variable | Constructor | Function, int]]] | None = {} if incremental else None
+        self.previous_members: dict[str, list[tuple[Variable | Constructor | Function, int]]] | None = None
+        self.reused: int = 0  # Members reused by the last reparse_class
+        self.previous_spans: SpanTable | None = None  # Spans of the previous tree while reparse_class copies them
+
+        # Source span of every node, recorded by wrapping the rules so nothing is added when spans are off
+        self.spans: SpanTable | None = spans
+        if spans is not None:
+            for name in spanned_rules:
+                setattr(self, name, self.spanned(getattr(self, name)))
+
+        # Bound after the rules are wrapped so statements parsed through the table still record their spans
+        self.statement_handlers: dict[int, Callable] = {TOKEN_CODES[toktype]: getattr(self, rule) for toktype, rule in statement_rules.items()}
+
+    def spanned(self, rule: Callable):
+        def parse_spanned(*args):
+            tok: Token = self.lexer.peek_next()
+            start: int = tok.start if tok is not None else len(self.lexer.text)
+            if args and type(args[0]) is MemberAccess:  # Variable update of an already parsed member access
+                start = self.spans.span(args[0])[0]
+            node = rule(*args)
+            if node is not None: self.spans.add(node, start, self.lexer.last_end)
+            return node
+        return parse_spanned
 
-    def parse_class(self) -> Class:
+    def parse_class(self) -> Class | None:
         '''
         Program : Mods ClassDeclaration
         '''
@@ -16,11 +116,154 @@ class Parser:
         
         mods: list[str] = self.parse_mods()
 
-        class_declaration: Class = self.parse_class_declaration()
+        try:
+            class_declaration: Class = self.parse_class_declaration()
+        except ParseError as err:
+            if not self.recover: raise
+            self.add_diagnostic(err.diagnostic)
+            return None  # No class without a valid declaration
         class_declaration.mods = mods
 
         return class_declaration
 
+    def error(self, message: str, tok: Token | None, expected: list[Token.TokenType] = []):
+        '''
+        Raise a ParseError for the offending token (None if the source ended early)
+        '''
+        if not self.suppress_err: print(message)
+        pos: int = tok.start if tok is not None else len(self.lexer.text)
+        raise ParseError(Diagnostic(message, pos, expected), tok)
+
+    def add_diagnostic(self, diagnostic: Diagnostic):
+        # An error that cascades out of the enclosing bodies (i.e. reaching the end of the file) is kept once
+        if self.diagnostics and self.diagnostics[-1].pos == diagnostic.pos: return
+        self.diagnostics.append(diagnostic)
+
+    def recover_from(self, err: ParseError, start: int, member_level: bool):
+        '''
+        Record the error of a statement or class member starting at start and move past the rest of it
+        '''
+        self.add_diagnostic(err.diagnostic)
+
+        tok: Token | None = err.token
+        if tok is not None and (tok.type == Token.TokenType.SEMICOLON or tok.type == Token.TokenType.RBRACE):
+            next_tok: Token = self.lexer.peek_next()
+            if next_tok is None or next_tok.start > tok.start:  # The offending token was already taken
+                if tok.type == Token.TokenType.RBRACE: self.lexer.push_token(tok)  # It closes the enclosing body
+                return
+        self.synchronize(start, member_level)
+
+    def synchronize(self, start: int, member_level: bool):
+        '''
+        Skip the rest of a statement or class member that failed to parse (starting at start): past the next
+        semicolon or the close brace of a block opened while skipping, or up to the close brace of the enclosing
+        body.  Class members also stop before the start of the next member.
+        '''
+        depth: int = 0
+        tok: Token = self.lexer.peek_next()
+        while tok is not None:
+            if tok.type == Token.TokenType.LBRACE: depth += 1
+            elif tok.type == Token.TokenType.RBRACE:
+                if depth == 0: return  # Left for the enclosing body
+                depth -= 1
+                if depth == 0:
+                    self.lexer.pop_token()
+                    tok = self.lexer.peek_next()
+                    if member_level or tok is None or not tok.type == Token.TokenType.ELSE: return
+                    continue  # An else belongs to the skipped if statement
+            elif depth == 0:
+                if tok.type == Token.TokenType.SEMICOLON:
+                    self.lexer.pop_token()
+                    return
+                if member_level and tok.start != start:
+                    if tok.type in self.lexer.MODS or tok.type == Token.TokenType.CONSTRUCTOR or tok.type == Token.TokenType.CLASS: return
+                    toks: list[Token] = self.lexer.peek_tokens(2)
+                    if tok.type == Token.TokenType.IDENTIFIER and toks[1] is not None and toks[1].type == Token.TokenType.FUNCTION: return
+            self.lexer.pop_token()
+            tok = self.lexer.peek_next()
+
+    def parse_class_interface(self) -> ClassInterface | None:
+        '''
+        Program : Mods ClassDeclaration, skipping every function and constructor body
+        '''
+        defer_bodies: bool = self.defer_bodies
+        self.defer_bodies = True
+        try:
+            klass: Class = self.parse_class()
+        finally:
+            self.defer_bodies = defer_bodies
+
+        if klass is None: return None  # Invalid declaration in recover mode
+        return klass.interface()  # Drops the skipped bodies without parsing them
+
+    def reparse_class(self, cursor: TokenCursor) -> Class:
+        '''
+        Parse an edited version of the last class (i.e. from Lexer.relex), reusing every member whose source
+        text is unchanged instead of parsing it again.  Reused members are shared with the previous tree and
+        their positions are moved to where they are in the edited source, so the previous tree is consumed:
+        its positions (and the spans of the previous SpanTable) no longer match the old source afterwards.
+        '''
+        if self.members is None:
+            if not self.suppress_err: print("reparse_class requires an incremental Parser")
+            raise Exception()
+
+        self.lexer = cursor
+        self.previous_members = self.members
+        self.members = {}
+        self.reused = 0
+        self.previous_spans = self.spans
+        if self.spans is not None: self.spans = SpanTable()
+        try:
+            return self.parse_class()
+        finally:
+            self.previous_members = None
+            self.previous_spans = None
+
+    def member_source(self, start: int, end: int) -> str:
+        stream = self.lexer.stream
+        return stream.text[stream.starts[start]:stream.ends[end-1]]
+
+    def record_member(self, member: Variable | Constructor | Function, start: int):
+        source: str = self.member_source(start, self.lexer.index)
+        self.members.setdefault(source, []).append((member, self.lexer.stream.starts[start]))
+
+    def reuse_member(self) -> Variable | Constructor | Function | None:
+        '''
+        Previous parse of the member at the cursor if its source text is unchanged, skipping past it
+        '''
+        cursor: TokenCursor = self.lexer
+        types = cursor.types
+        start: int = cursor.index
+
+        # A member ends at a semicolon or the close brace of its body
+        i: int = start
+        depth: int = 0
+        while i < len(types):
+            code: int = types[i]
+            if code == LBRACE_CODE: depth += 1
+            elif code == RBRACE_CODE:
+                if depth == 0: return None  # End of the class body
+                depth -= 1
+                if depth == 0: break
+            elif depth == 0:
+                if code == SEMICOLON_CODE: break
+                if code == CLASS_CODE: return None  # Nested classes are parsed, their members can be reused
+            i += 1
+        else: return None
+
+        previous: list = self.previous_members.get(self.member_source(start, i+1))
+        if not previous: return None
+        member, old_start = previous.pop()
+        if type(member) is not Variable and not member.is_body_parsed(): return None  # Deferred body of the old source
+
+        delta: int = cursor.stream.starts[start] - old_start
+        if delta: shift_positions(member, delta)
+        if self.spans is not None: self.spans.copy_subtree(self.previous_spans, member, delta)
+        cursor.index = i + 1
+        self.reused += 1
+        if self.debug_mode: print(f"Reused member {member.name if type(member) is not Constructor else 'constructor'}")
+        return member
+
     def parse_mods(self) -> list[str]:
         '''
         Mods : PUBLIC Mods
@@ -32,12 +275,12 @@ class Parser:
         '''
         if self.debug_mode: print("Modifier check")
 
+        cursor: TokenCursor = self.lexer
+        codes = cursor.codes
         mods: list[str] = []
-        tok: Token = self.lexer.peek_next()
-        while not tok is None and tok.type in self.lexer.MODS:
-            mods.append(tok.content)
-            self.lexer.pop_token()
-            tok = self.lexer.peek_next()
+        while codes[cursor.index] in MOD_CODES:
+            mods.append(cursor.token(cursor.index).content)
+            cursor.index += 1
         
         return mods
 
@@ -48,19 +291,16 @@ class Parser:
         if self.debug_mode: print("Class declaration")
         toks: list[Token] = self.lexer.next_tokens(2)
         if toks[0] is None or not toks[0].type == Token.TokenType.CLASS:
-            if not self.suppress_err: print("Class declaration missing 'class' keyword")
-            raise Exception()
+            self.error("Class declaration missing 'class' keyword", toks[0], [Token.TokenType.CLASS])
         if toks[1] is None or not toks[1].type == Token.TokenType.IDENTIFIER:
-            if not self.suppress_err: print("Class declaration missing a name")
-            raise Exception()
+            self.error("Class declaration missing a name", toks[1], [Token.TokenType.IDENTIFIER])
         
         typedefs: list[str] = self.parse_typedef()
         extension: str = self.parse_class_extension()
         
         tok: Token = self.lexer.next_token()
         if tok is None or not tok.type == Token.TokenType.LBRACE:
-            if not self.suppress_err: print("Class body is missing open brace '{'")
-            raise Exception()
+            self.error("Class body is missing open brace '{'", tok, [Token.TokenType.LBRACE])
         
         body: ClassBody = self.parse_class_body()
         return Class(None, toks[1].content, typedefs, extension, body)
@@ -72,8 +312,7 @@ class Parser:
         toks: list[Token] = self.lexer.peek_tokens(2)
         if toks[0] is None or toks[0].type is not Token.TokenType.LT: return None
         if toks[1] is None or toks[1].type is not Token.TokenType.IDENTIFIER:
-            if not self.suppress_err: print("Typedef not given a name ... ")
-            raise Exception()
+            self.error("Typedef not given a name ... ", toks[1], [Token.TokenType.IDENTIFIER])
         typedefs: list[str] = [toks[1].content]
         
         self.lexer.pop_tokens(2)
@@ -81,16 +320,14 @@ class Parser:
         toks: list[Token] = self.lexer.peek_tokens(2)
         while toks[0] is not None and toks[0].type is Token.TokenType.COMMA:
             if toks[1] is None or toks[1].type is not Token.TokenType.IDENTIFIER:
-                if not self.suppress_err: print("Typedef not given a name ... ")
-                raise Exception()
+                self.error("Typedef not given a name ... ", toks[1], [Token.TokenType.IDENTIFIER])
             typedefs.append(toks[1].content)
             self.lexer.pop_tokens(2)
             toks = self.lexer.peek_tokens(2)
         
         tok: Token = self.lexer.next_token()
         if tok is None or tok.type is not Token.TokenType.GT:
-            if not self.suppress_err: print("Typedef missing close '>'")
-            raise Exception()
+            self.error("Typedef missing close '>'", tok, [Token.TokenType.GT])
         
         return typedefs
         
@@ -102,8 +339,7 @@ class Parser:
         toks: list[Token] = self.lexer.peek_tokens(2)
         if toks[0] is None or not toks[0].type == Token.TokenType.EXTENDS: return None
         if toks[1] is None or not toks[1].type == Token.TokenType.IDENTIFIER: 
-            if not self.suppress_err: print("Class extension missing name ...")
-            raise Exception()
+            self.error("Class extension missing name ...", toks[1], [Token.TokenType.IDENTIFIER])
         
         self.lexer.pop_tokens(2)
         return toks[1].content
@@ -115,50 +351,70 @@ class Parser:
         '''
         if self.debug_mode: ("Class Body")
 
+        body: ClassBody = ClassBody([],[],[],[])
+        while True:
+            start: int = self.lexer.index if self.members is not None else -1
+            member = self.reuse_member() if self.previous_members is not None else None
+            if member is None:
+                first: Token = self.lexer.peek_next() if self.recover else None
+                try:
+                    member = self.parse_class_member()
+                except ParseError as err:
+                    if not self.recover: raise
+                    if first is None:
+                        self.add_diagnostic(err.diagnostic)
+                        return body
+                    self.recover_from(err, first.start, True)
+                    if self.lexer.peek_next() is None: return body
+                    continue
+                if member is None: return body
+            if self.members is not None and type(member) is not Class: self.record_member(member, start)
+            if type(member) is Variable:
+                body.member_vars.append(member)
+            elif type(member) is Constructor:
+                body.constructors.append(member)
+            elif type(member) is Function:
+                body.functions.append(member)
+            elif type(member) is Class:
+                body.classes.append(member)
+            else:
+                self.error(f"Received unhandled class body member type: {type(member)}", self.lexer.peek_next())
+
+    def parse_class_member(self) -> Variable | Constructor | Function | Class | None:
+        '''
+        Mods Constructor|ClassDeclaration|FunctionDeclaration|VariableDeclaration, or None at the end of the class body
+        '''
         mods: list[str] = self.parse_mods()
 
-        toks: list[Token] = self.lexer.peek_tokens(2)
-        if toks[0] is None:
-            if not self.suppress_err: print("Class body missing close brace '}'")
-            raise Exception()
-        elif toks[0].type == Token.TokenType.RBRACE:
+        cursor: TokenCursor = self.lexer
+        codes = cursor.codes
+        i: int = cursor.index
+        code: int = codes[i]
+        if code == END_CODE:
+            self.error("Class body missing close brace '}'", None, [Token.TokenType.RBRACE])
+        elif code == RBRACE_CODE:
             if self.debug_mode: print("End of class body")
-            return ClassBody([],[],[],[])
-        elif toks[0].type == Token.TokenType.CONSTRUCTOR:
-            self.lexer.pop_token()
+            return None
+        elif code == CONSTRUCTOR_CODE:
+            cursor.index = i + 1
             member = self.parse_constructor()
-        elif toks[0].type == Token.TokenType.CLASS:
+        elif code == CLASS_CODE:
             member = self.parse_class_declaration()
-        elif toks[0].type == Token.TokenType.IDENTIFIER:
-            if toks[1] is None:
-                if not self.suppress_err: print("Unexpected end of file ...")
-                raise Exception()
-            elif toks[1].type == Token.TokenType.FUNCTION:
+        elif code == IDENTIFIER_CODE:
+            if codes[i+1] == END_CODE:
+                self.error("Unexpected end of file ...", None)
+            elif codes[i+1] == FUNCTION_CODE:
                 member = self.parse_function_declaration()
             else:
                 member = self.parse_variable_declaration()
-                tok: Token = self.lexer.next_token()
-                if tok is None or not tok.type == Token.TokenType.SEMICOLON:
-                    if not self.suppress_err: print("Expected semicolon ';' to follow variable declaration")
-                    raise Exception()
+                if not codes[cursor.index] == SEMICOLON_CODE:
+                    self.error("Expected semicolon ';' to follow variable declaration", cursor.next_token(), [Token.TokenType.SEMICOLON])
+                cursor.index += 1
         else:
-            if not self.suppress_err: print("Expected member in class body ...")
-            raise Exception()
-        
+            self.error("Expected member in class body ...", cursor.token(i))
+
         member.mods = mods
-        body: ClassBody = self.parse_class_body()
-        if type(member) is Variable:
-            body.member_vars.insert(0,member)
-        elif type(member) is Constructor:
-            body.constructors.insert(0,member)
-        elif type(member) is Function:
-            body.functions.insert(0,member)
-        elif type(member) is Class:
-            body.classes.insert(0,member)
-        else:
-            if not self.suppress_err: print(f"Received unhandled class body member type: {type(member)}")
-            raise Exception()
-        return body
+        return member
 
     def parse_constructor(self) -> Constructor:
         '''
@@ -167,31 +423,26 @@ class Parser:
         if self.debug_mode: print("Class Body")
         tok: Token = self.lexer.next_token()
         if tok is None or not tok.type == Token.TokenType.LPAREN:
-            if not self.suppress_err: print("Constructor missing open parenthesis '('")
-            raise Exception()
+            self.error("Constructor missing open parenthesis '('", tok, [Token.TokenType.LPAREN])
 
         params: list[Parameter] = self.parse_start_params()
         if params is None:
-            if not self.suppress_err: print("Constructor parameters missing ...")
-            raise Exception()
+            self.error("Constructor parameters missing ...", self.lexer.peek_next())
 
         tok = self.lexer.next_token()
         if tok is None or not tok.type == Token.TokenType.RPAREN:
-            if not self.suppress_err: print("Constructor missing close parenthesis ')'")
-            raise Exception()
+            self.error("Constructor missing close parenthesis ')'", tok, [Token.TokenType.RPAREN])
         
         tok = self.lexer.next_token()
         if tok is None or not tok.type == Token.TokenType.LBRACE:
-            if not self.suppress_err: print("Constructor missing open brace '{'")
-            raise Exception()
+            self.error("Constructor missing open brace '{'", tok, [Token.TokenType.LBRACE])
         
-        body: Body = self.parse_body()
+        body: Body | DeferredBody = self.skip_body() if self.defer_bodies else self.parse_body()
         if self.debug_mode: print("Complete function body")
         
         tok = self.lexer.next_token()
         if tok is None or not tok.type == Token.TokenType.RBRACE:
-            if not self.suppress_err: print("Constructor missing close brace '}'")
-            raise Exception()
+            self.error("Constructor missing close brace '}'", tok, [Token.TokenType.RBRACE])
         
         return Constructor(None, params, body)
 
@@ -206,8 +457,7 @@ class Parser:
         
         tok: Token = self.lexer.next_token()
         if tok is None or not tok.type == Token.TokenType.IDENTIFIER:
-            if not self.suppress_err: print("Variable declaration missing type")
-            raise Exception()
+            self.error("Variable declaration missing type", tok, [Token.TokenType.IDENTIFIER])
         var_type: str = tok.content
         
         tok: Token = self.lexer.peek_next()
@@ -218,8 +468,7 @@ class Parser:
 
         tok: Token = self.lexer.next_token()
         if tok is None or not tok.type == Token.TokenType.IDENTIFIER:
-            if not self.suppress_err: print("Variable declaration missing name")
-            raise Exception()
+            self.error("Variable declaration missing name", tok, [Token.TokenType.IDENTIFIER])
         name: str = tok.content
         pos: int = tok.pos
 
@@ -239,8 +488,7 @@ class Parser:
 
         tok: Token = self.lexer.next_token()
         if tok is None or not tok.type == Token.TokenType.SET:
-            if not self.suppress_err: print("Variable initialization missing '='")
-            raise Exception()
+            self.error("Variable initialization missing '='", tok, [Token.TokenType.SET])
         
         return self.parse_expression()
 
@@ -254,51 +502,43 @@ class Parser:
         
         toks: list[Token] = self.lexer.next_tokens(3)
         if toks[0] is None or not toks[0].type == Token.TokenType.IDENTIFIER:
-            if not self.suppress_err: print("Function return type not specified")
-            raise Exception()
+            self.error("Function return type not specified", toks[0], [Token.TokenType.IDENTIFIER])
         return_type: str = toks[0].content
         if toks[1] is None or not toks[1].type == Token.TokenType.FUNCTION:
-            if not self.suppress_err: print("Function declaration not specified")
-            raise Exception()
+            self.error("Function declaration not specified", toks[1], [Token.TokenType.FUNCTION])
         if toks[2] is None:
-            if not self.suppress_err: print("Function declaration missing name")
-            raise Exception()
+            self.error("Function declaration missing name", toks[2])
         elif toks[2].type == Token.TokenType.OPERATOR:
             tok: Token = self.lexer.next_token()
-            if tok is None or not tok.content in [op.value for op in all_operations]:
-                if not self.suppress_err: print(f"Operator overloading requires real operation, not {tok.content}")
-                raise Exception()
+            if tok is None:
+                self.error("Operator overloading requires real operation, reached unexpected end of input", tok)
+            elif tok.type not in overloadable_token_types:
+                self.error(f"Operator overloading requires real operation, not {tok.content}", tok)
             name: str = 'operator_' + str(tok.type).removeprefix('TokenType.')
         elif not toks[2].type == Token.TokenType.IDENTIFIER:
-            if not self.suppress_err: print("Function declaration missing name")
-            raise Exception()
+            self.error("Function declaration missing name", toks[2], [Token.TokenType.IDENTIFIER])
         else: name: str = toks[2].content
 
         tok: Token = self.lexer.next_token()
         if tok is None or not tok.type == Token.TokenType.LPAREN:
-            if not self.suppress_err: print("Function declaration missing open parenthesis '('")
-            raise Exception()
+            self.error("Function declaration missing open parenthesis '('", tok, [Token.TokenType.LPAREN])
                 
         params: list[Parameter] = self.parse_start_params()
         if params is None:
-            if not self.suppress_err: print("Function parameters missing ...")
-            raise Exception()
+            self.error("Function parameters missing ...", self.lexer.peek_next())
 
         toks = self.lexer.next_tokens(2)
         if toks[0] is None or not toks[0].type == Token.TokenType.RPAREN:
-            if not self.suppress_err: print("Function parameters missing close parenthesis ')'")
-            raise Exception()
+            self.error("Function parameters missing close parenthesis ')'", toks[0], [Token.TokenType.RPAREN])
         if toks[1] is None or not (toks[1].type == Token.TokenType.SEMICOLON or toks[1].type == Token.TokenType.LBRACE):
-            if not self.suppress_err: print("Function declaration missing semicolon ';' or open brace '{'")
-            raise Exception()
+            self.error("Function declaration missing semicolon ';' or open brace '{'", toks[1], [Token.TokenType.SEMICOLON, Token.TokenType.LBRACE])
         
         func: Function = Function(None, name, return_type, params, None)
         if toks[1].type == Token.TokenType.LBRACE:
-            body: Body = self.parse_body()
+            body: Body | DeferredBody = self.skip_body() if self.defer_bodies else self.parse_body()
             tok: Token = self.lexer.next_token()
             if tok is None or not tok.type == Token.TokenType.RBRACE:
-                if not self.suppress_err: print("Function Body is not closed ...")
-                raise Exception()
+                self.error("Function Body is not closed ...", tok, [Token.TokenType.RBRACE])
             func.body = body
 
         return func
@@ -309,10 +549,9 @@ class Parser:
         '''
         if self.debug_mode: print("Start Param check")
 
-        tok: Token = self.lexer.peek_next()
-        if tok is None: return None
-        elif tok.type == Token.TokenType.RPAREN: return []
-        elif tok.type == Token.TokenType.IDENTIFIER: return self.parse_params()
+        code: int = self.lexer.codes[self.lexer.index]
+        if code == RPAREN_CODE: return []
+        elif code == IDENTIFIER_CODE: return self.parse_params()
         else: return None
     
     def parse_params(self) -> list[Parameter]:
@@ -321,45 +560,41 @@ class Parser:
                 | IDENTIFIER Typedef IDENTIFIER
         '''
         if self.debug_mode: ("Param")
-        tok: Token = self.lexer.next_token()
+        cursor: TokenCursor = self.lexer
+        codes = cursor.codes
 
         params: list[Parameter] = []
-        while tok is not None:
+        while True:
             # Get parameter type
-            if not tok.type == Token.TokenType.IDENTIFIER:
-                if not self.suppress_err: print("Expected parameter type ...")
-                raise Exception()
-            type = tok.content
+            i: int = cursor.index
+            if codes[i] == END_CODE:
+                self.error("Expected parameter, not end of file ...", None)
+            if not codes[i] == IDENTIFIER_CODE:
+                self.error("Expected parameter type ...", cursor.next_token(), [Token.TokenType.IDENTIFIER])
+            type_tok: Token = cursor.token(i)
+            cursor.index = i + 1
 
             # Get typedefs if they exist
-            tok: Token = self.lexer.peek_next()
-            if tok is None:
-                if not self.suppress_err: print("Unexpected end of file")
-                raise Exception()
-            elif tok.type == Token.TokenType.LT:
+            if codes[i+1] == END_CODE:
+                self.error("Unexpected end of file", None)
+            elif codes[i+1] == LT_CODE:
                 typedef: list[str] = self.parse_typedef()
             else:
                 typedef = None
 
             # Get parameter name
-            tok: Token = self.lexer.next_token()
-            if tok is None or not tok.type == Token.TokenType.IDENTIFIER:
-                if not self.suppress_err: print("Expected parameter name ...")
-                raise Exception()
-            name = tok.content
+            i = cursor.index
+            if not codes[i] == IDENTIFIER_CODE:
+                self.error("Expected parameter name ...", cursor.next_token(), [Token.TokenType.IDENTIFIER])
+            tok: Token = cursor.token(i)
+            cursor.index = i + 1
 
-            params.append(Parameter(type, typedef, name))
+            params.append(Parameter(type_tok.content, typedef, tok.content))
+            if self.spans is not None: self.spans.add(params[-1], type_tok.start, tok.end)
 
             # Check for more parameters
-            tok: Token = self.lexer.peek_next()
-            if tok is None or not tok.type == Token.TokenType.COMMA: return params
-            self.lexer.pop_token()
-
-            # Get start of next parameter
-            tok: Token = self.lexer.next_token()
-
-        if not self.suppress_err: print("Expected parameter, not end of file ...")
-        raise Exception()
+            if not codes[cursor.index] == COMMA_CODE: return params
+            cursor.index += 1
     
     def parse_start_args(self) -> list[Expression]:
         '''
@@ -367,11 +602,10 @@ class Parser:
         '''
         if self.debug_mode: print("Start Args check")
 
-        tok: Token = self.lexer.peek_next()
-        if tok is None:
-            if not self.suppress_err: print("Unexpected end of file")
-            raise Exception()
-        elif tok.type == Token.TokenType.RPAREN: return []
+        code: int = self.lexer.codes[self.lexer.index]
+        if code == END_CODE:
+            self.error("Unexpected end of file", None)
+        elif code == RPAREN_CODE: return []
         else: return self.parse_args()
 
     def parse_args(self) -> list[Expression]:
@@ -380,68 +614,79 @@ class Parser:
               | Expression
         '''
         if self.debug_mode: print("Args check")
-        exp: Expression = self.parse_expression()
-        exps = [exp]
+        exps: list[Expression] = [self.parse_expression()]
 
-        tok: Token = self.lexer.peek_next()
-        while tok.type == Token.TokenType.COMMA:
-            self.lexer.pop_token()
+        cursor: TokenCursor = self.lexer
+        while cursor.codes[cursor.index] == COMMA_CODE:
+            cursor.index += 1
             exps.append(self.parse_expression())
-            tok: Token = self.lexer.peek_next()
         return exps
 
     def parse_expression(self) -> Expression:
         '''
-        Expression : MemberAccess
-                    | VAL
-                    | LPAREN Expression RPAREN Operator Expression
-                    | Expression Operator Expression
-                    | BIT_NOT Expression
+        Expression : OperationTree
         '''
-        # TODO: Add support for the BIT_NOT operator since it only has 1 input while the other operators have 2
-
         if self.debug_mode: print("Expression check")
-        tok: Token = self.lexer.peek_next()
-        if tok is None:
-            if not self.suppress_err: print("Reached unexpected end of file ...")
-            raise Exception()
-        
-        values: list[Expression] = []
-        operations: list[Operation] = []
-        while tok is not None:     
-            if tok.type == Token.TokenType.LPAREN:
-                self.lexer.pop_token()
-                values.append(self.parse_expression())
-                tok: Token = self.lexer.peek_next()
-                if tok is None or tok.type is not Token.TokenType.RPAREN:
-                    if not self.suppress_err: print("Expected close parenthesis ')'")
-                    raise Exception()
-                self.lexer.pop_token()
-            elif tok.type == Token.TokenType.VAL:
-                self.lexer.pop_token()
-                values.append(Value(tok.content))
-            else:
-                values.append(self.parse_member_access())
-        
-            tok: Token = self.lexer.peek_next()
-            if tok is None:
-                if not self.suppress_err: print("Reached unexpected end of file ...")
-                raise Exception()
-            elif not tok.content in [op.value for op in expression_operations]: break
-            
-            for op in expression_operations:
-                if tok.content == op.value:
-                    operations.append(op)
-                    break
-            self.lexer.pop_token()
+        return self.parse_operation_tree()
+
+    def parse_operation_tree(self, max_precedence: int = lowest_precedence) -> Expression:
+        '''
+        OperationTree : Operand (Operator Operand)*
+        Operand : BIT_NOT Operand
+                 | LPAREN OperationTree RPAREN
+                 | MemberAccess
+                 | VAL
+
+        Precedence climbing over precedence_map.  Only operators that bind tighter than max_precedence
+        are taken, so the right operand of an operator is parsed with its precedence and operators of
+        equal precedence group to the left.  Operands are parsed here rather than in a rule of their own
+        so nested parentheses recurse once per level.
+        '''
+        if self.debug_mode: print("Operation tree check")
+
+        cursor: TokenCursor = self.lexer
+        codes = cursor.codes
+        nots: list[int] = []  # Starts of the BIT_NOT tokens
+        while codes[cursor.index] == BIT_NOT_CODE:
+            nots.append(cursor.stream.starts[cursor.index])
+            cursor.index += 1
+
+        i: int = cursor.index
+        code: int = codes[i]
+        if code == END_CODE:
+            self.error("Reached unexpected end of file ...", None)
+        elif code == LPAREN_CODE:
+            cursor.index = i + 1
+            left = self.parse_operation_tree()
+            if not codes[cursor.index] == RPAREN_CODE:
+                self.error("Expected close parenthesis ')'", cursor.next_token(), [Token.TokenType.RPAREN])
+            cursor.index += 1
+            if self.spans is not None: self.spans.add(left, cursor.stream.starts[i], cursor.last_end)  # Parentheses are part of the operand
+        elif code == VAL_CODE:
+            tok: Token = cursor.token(i)
+            cursor.index = i + 1
+            left = Value(tok.content, tok.literal)
+            if self.spans is not None: self.spans.add(left, tok.start, tok.end)
+        else:
+            left = self.parse_member_access()
 
-            if not len(values) == len(operations):
-                if not self.suppress_err: print("No valid operation found in expression ...")
-                raise Exception()
+        for start in reversed(nots):
+            left = UnaryOperation(Operation.BIT_NOT, left)
+            if self.spans is not None: self.spans.add(left, start, cursor.last_end)
 
-            tok: Token = self.lexer.peek_next()
-        
-        return Expression(values, operations)
+        while True:
+            code = codes[cursor.index]
+            if code == END_CODE:
+                self.error("Reached unexpected end of file ...", None)
+
+            precedence: int = expression_code_precedences[code]
+            if precedence >= max_precedence: return left
+            cursor.index += 1
+            if codes[cursor.index] == END_CODE:
+                self.error("Expression missing operand after operator, reached unexpected end of file ...", None)
+
+            left = BinaryOperation(left, expression_code_operations[code], self.parse_operation_tree(precedence))
+            if self.spans is not None: self.spans.add(left, self.spans.span(left.left)[0], cursor.last_end)
 
     def parse_member_access(self) -> MemberAccess:
         '''
@@ -451,48 +696,37 @@ class Parser:
         '''
         if self.debug_mode: print("Member Access check")
 
-        toks: list[Token] = self.lexer.peek_tokens(2)
-        if toks[0] is None:
-            if not self.suppress_err: print("Unexpected end of file ...")
-            raise Exception()
-
-        if toks[0].type == Token.TokenType.NEW:  # Constructor call
-            content = self.parse_constructor_call()
-        elif toks[0].type == Token.TokenType.IDENTIFIER:
-            if toks[1] is None:
-                if not self.suppress_err: print("Unexpected end of file ...")
-                raise Exception()
-            if toks[1].type == Token.TokenType.LPAREN:
-                content = self.parse_function_call()
-            else:
-                content = VariableAccess(toks[0].content, toks[0].pos)
-                self.lexer.pop_token()
-
-        accesses = [content]
-        tok = self.lexer.peek_next()
-        while tok is not None and tok.type == Token.TokenType.DOT:
-            self.lexer.pop_token()
-            toks: list[Token] = self.lexer.peek_tokens(2)
-            if toks[0] is None:
-                if not self.suppress_err: print("Unexpected end of file ...")
-                raise Exception()
-            
-            if toks[0].type == Token.TokenType.NEW:  # Constructor call
+        cursor: TokenCursor = self.lexer
+        codes = cursor.codes
+        accesses: list[VariableAccess | FunctionCall | ConstructorCall] = []
+        while True:
+            i: int = cursor.index
+            code: int = codes[i]
+            if code == NEW_CODE:  # Constructor call
                 content = self.parse_constructor_call()
-            elif toks[0].type == Token.TokenType.IDENTIFIER:
-                if toks[1] is None:
-                    if not self.suppress_err: print("Unexpected end of file ...")
-                    raise Exception()
-                
-                if toks[1].type == Token.TokenType.LPAREN:
+            elif code == IDENTIFIER_CODE:
+                if codes[i+1] == END_CODE:
+                    self.error("Unexpected end of file ...", None)
+                if codes[i+1] == LPAREN_CODE:
                     content = self.parse_function_call()
                 else:
-                    content = VariableAccess(toks[0].content, toks[0].pos)
-                    self.lexer.pop_token()
+                    tok: Token = cursor.token(i)
+                    content = VariableAccess(tok.content, tok.pos)
+                    cursor.index = i + 1
+                    if self.spans is not None: self.spans.add(content, tok.start, tok.end)
+            elif code == END_CODE:
+                self.error("Unexpected end of file ...", None)
+            elif not accesses:
+                tok: Token = cursor.token(i)
+                self.error(f"Expected variable, function call, or constructor call, not {tok.content}", tok,
+                           [Token.TokenType.IDENTIFIER, Token.TokenType.NEW])
+            else:
+                tok: Token = cursor.token(i)
+                self.error(f"Expected member after '.', not {tok.content}", tok, [Token.TokenType.IDENTIFIER, Token.TokenType.NEW])
             accesses.append(content)
-            tok = self.lexer.peek_next()
 
-        return MemberAccess(accesses)
+            if not codes[cursor.index] == DOT_CODE: return MemberAccess(accesses)
+            cursor.index += 1
     
     def parse_constructor_call(self) -> ConstructorCall:
         '''
@@ -502,17 +736,14 @@ class Parser:
         if self.debug_mode: print("Constructor Call check")
         toks: list[Token] = self.lexer.next_tokens(2)
         if toks[0] is None or not toks[0].type == Token.TokenType.NEW:
-            if not self.suppress_err: print("Constructor call has no 'new' keyword")
-            raise Exception()
+            self.error("Constructor call has no 'new' keyword", toks[0], [Token.TokenType.NEW])
         if toks[1] is None or not toks[1].type == Token.TokenType.IDENTIFIER:
-            if not self.suppress_err: print("Constructor call has no name")
-            raise Exception()
+            self.error("Constructor call has no name", toks[1], [Token.TokenType.IDENTIFIER])
         name = toks[1].content
         
         tok: Token = self.lexer.peek_next()
         if tok is None:
-            if not self.suppress_err: print("Unexpected end of file")
-            raise Exception()
+            self.error("Unexpected end of file", tok)
         elif tok.type == Token.TokenType.LT:
             typedef: list[str] = self.parse_typedef()
         else:
@@ -520,14 +751,12 @@ class Parser:
 
         tok: Token = self.lexer.next_token()
         if tok is None or not tok.type == Token.TokenType.LPAREN:
-            if not self.suppress_err: print("Constructor call missing open parenthesis '('")
-            raise Exception()
+            self.error("Constructor call missing open parenthesis '('", tok, [Token.TokenType.LPAREN])
         
         args: list[Expression] = self.parse_start_args()
         tok: Token = self.lexer.next_token()
         if tok is None or not tok.type == Token.TokenType.RPAREN:
-            if not self.suppress_err: print("Constructor call has missing close parenthesis ')'")
-            raise Exception()
+            self.error("Constructor call has missing close parenthesis ')'", tok, [Token.TokenType.RPAREN])
         
         return ConstructorCall(name, typedef, args)
 
@@ -538,17 +767,14 @@ class Parser:
         if self.debug_mode: print("Function Call check")
         toks: list[Token] = self.lexer.next_tokens(2)
         if toks[0] is None or not toks[0].type == Token.TokenType.IDENTIFIER:
-            if not self.suppress_err: print("Function call has no name")
-            raise Exception()
+            self.error("Function call has no name", toks[0], [Token.TokenType.IDENTIFIER])
         if toks[1] is None or not toks[1].type == Token.TokenType.LPAREN:
-            if not self.suppress_err: print("Function call missing open parenthesis '('")
-            raise Exception()
+            self.error("Function call missing open parenthesis '('", toks[1], [Token.TokenType.LPAREN])
         
         args: list[Expression] = self.parse_start_args()
         tok: Token = self.lexer.next_token()
         if tok is None or not tok.type == Token.TokenType.RPAREN:
-            if not self.suppress_err: print("Function call has missing close parenthesis ')'")
-            raise Exception()
+            self.error("Function call has missing close parenthesis ')'", tok, [Token.TokenType.RPAREN])
         
         return FunctionCall(toks[0].content, args)
     
@@ -559,19 +785,56 @@ class Parser:
         '''
         if self.debug_mode: print("Body check")
 
+        cursor: TokenCursor = self.lexer
+        codes = cursor.codes
         body = Body([])
-        tok: Token = self.lexer.peek_next()
-        while tok is not None and not tok.type == Token.TokenType.RBRACE:
-            statement: Statement = self.parse_statement()
-            body.statements.append(statement)
-            tok: Token = self.lexer.peek_next()
-
-        if tok is None:
-            if not self.suppress_err: print("Reached end of program unexpectedly ...")
-            raise Exception()
+        i: int = cursor.index
+        while not codes[i] == RBRACE_CODE:
+            if codes[i] == END_CODE:
+                self.error("Reached end of program unexpectedly ...", None)
+            try:
+                statement: Statement = self.parse_statement()
+            except ParseError as err:
+                if not self.recover: raise
+                self.recover_from(err, cursor.stream.starts[i], False)
+            else: body.statements.append(statement)
+            i = cursor.index
         
         return body
     
+    def skip_body(self) -> DeferredBody:
+        '''
+        Skip a function body by brace matching, stopping before its close brace, and return it as a
+        DeferredBody that parses the skipped range when it is first used
+        '''
+        if self.debug_mode: print("Skipping body")
+
+        cursor: TokenCursor = self.lexer
+        types = cursor.types
+        start: int = cursor.index
+        i: int = start
+        depth: int = 0
+        while i < len(types):
+            if types[i] == LBRACE_CODE: depth += 1
+            elif types[i] == RBRACE_CODE:
+                if depth == 0: break
+                depth -= 1
+            i += 1
+        cursor.index = i
+
+        def parse() -> Body:
+            return self.parse_deferred_body(cursor.fork(start), i)
+        return DeferredBody(parse, start, i)
+
+    def parse_deferred_body(self, cursor: TokenCursor, end: int) -> Body:
+        '''
+        Parse a body skipped by skip_body, which must end exactly at its close brace (end)
+        '''
+        body: Body = Parser(cursor, self.debug_mode, self.suppress_err, spans=self.spans).parse_body()
+        if cursor.index != end:
+            self.error("Function Body is not closed ...", cursor.peek_next(), [Token.TokenType.RBRACE])
+        return body
+
     def parse_statement(self) -> Statement:
         '''
         Statement : IfBlock
@@ -588,65 +851,59 @@ class Parser:
         '''
         if self.debug_mode: print("Statement check")
 
-        toks: list[Token] = self.lexer.peek_tokens(2)
-        if toks[0] is None:
-            if not self.suppress_err: print("Reached unexpected end of file ...")
-            raise Exception()
-
-        if toks[0].type == Token.TokenType.IF:
-            return Statement(self.parse_if_block())
-        elif toks[0].type == Token.TokenType.WHILE:
-            return Statement(self.parse_while_block())
-        elif toks[0].type == Token.TokenType.FOR:
-            return Statement(self.parse_for_block())
-        elif toks[0].type == Token.TokenType.FOREACH:
-           return Statement(self.parse_foreach_block())
-        elif toks[0].type == Token.TokenType.SWITCH:
-            return Statement(self.parse_switch())
-        elif toks[0].type == Token.TokenType.BREAK:
-            if toks[1] is None or not toks[1].type == Token.TokenType.SEMICOLON:
-                if not self.suppress_err: print("Expected semicolon ';' after break statement")
-                raise Exception()
-            self.lexer.pop_tokens(2)
-            return Statement(Break())
-        elif toks[0].type == Token.TokenType.RETURN:
-           return Statement(self.parse_return())
-        elif toks[0].type == Token.TokenType.ASM:
-            return Statement(self.parse_asm_block())
-        elif toks[0].type == Token.TokenType.INC or toks[0].type == Token.TokenType.DEC:
+        cursor: TokenCursor = self.lexer
+        codes = cursor.codes
+        i: int = cursor.index
+        code: int = codes[i]
+        if code == END_CODE:
+            self.error("Reached unexpected end of file ...", None)
+
+        handler: Callable | None = self.statement_handlers.get(code)
+        if handler is not None:
+            return Statement(handler())
+        elif code == BREAK_CODE:
+            if not codes[i+1] == SEMICOLON_CODE:
+                self.error("Expected semicolon ';' after break statement", cursor.token(i+1), [Token.TokenType.SEMICOLON])
+            cursor.index = i + 2
+            brk: Break = Break()
+            if self.spans is not None: self.spans.add(brk, cursor.stream.starts[i], cursor.stream.ends[i+1])
+            return Statement(brk)
+        elif code == INC_CODE or code == DEC_CODE:
             var_update = self.parse_variable_update()
-            tok: Token = self.lexer.next_token()
-            if tok is None or not tok.type == Token.TokenType.SEMICOLON:
-                if not self.suppress_err: print("Variable update missing semicolon ';'")
-                raise Exception()
+            if not codes[cursor.index] == SEMICOLON_CODE:
+                self.error("Variable update missing semicolon ';'", cursor.next_token(), [Token.TokenType.SEMICOLON])
+            cursor.index += 1
             return Statement(var_update)
         else:
             mods: list[str] = self.parse_mods()  # Get mods for potential variable declaration
-            toks: list[Token] = self.lexer.peek_tokens(2)
-            if toks[0].type == Token.TokenType.IDENTIFIER and (toks[1].type == Token.TokenType.IDENTIFIER or toks[1].type == Token.TokenType.LT):
+            i = cursor.index
+            code = codes[i]
+            if code == END_CODE:
+                self.error("Reached unexpected end of file ...", None)
+            if code == IDENTIFIER_CODE and (codes[i+1] == IDENTIFIER_CODE or codes[i+1] == LT_CODE):
                 var_delcr = self.parse_variable_declaration()
                 var_delcr.mods = mods
 
-                tok: Token = self.lexer.next_token()
-                if tok is None or not tok.type == Token.TokenType.SEMICOLON:
-                    if not self.suppress_err: print("Expected semicolon ';' to follow variable declaration")
-                    raise Exception()
+                if not codes[cursor.index] == SEMICOLON_CODE:
+                    self.error("Expected semicolon ';' to follow variable declaration", cursor.next_token(), [Token.TokenType.SEMICOLON])
+                cursor.index += 1
                 return Statement(var_delcr)
             else:
                 member_access = self.parse_member_access()
                 if len(member_access.accesses) == 0:  member_access = None
 
-                tok: Token = self.lexer.peek_next()
-                if tok.type == Token.TokenType.SEMICOLON:
-                    self.lexer.pop_token()
+                code = codes[cursor.index]
+                if code == END_CODE:
+                    self.error("Reached unexpected end of file ...", None)
+                if code == SEMICOLON_CODE:
+                    cursor.index += 1
                     return Statement(member_access)
 
                 # Only remaining option is variable update
                 var_update = self.parse_variable_update(member_access)
-                tok: Token = self.lexer.next_token()
-                if tok is None or not tok.type == Token.TokenType.SEMICOLON:
-                    if not self.suppress_err: print("Variable update missing semicolon ';'")
-                    raise Exception()
+                if not codes[cursor.index] == SEMICOLON_CODE:
+                    self.error("Variable update missing semicolon ';'", cursor.next_token(), [Token.TokenType.SEMICOLON])
+                cursor.index += 1
                 return Statement(var_update)
 
     def parse_return(self) -> Return:
@@ -658,20 +915,17 @@ class Parser:
 
         tok: Token = self.lexer.next_token()
         if tok is None or not tok.type == Token.TokenType.RETURN:
-            if not self.suppress_err: print("Expected 'return' keyword")
-            raise Exception()
+            self.error("Expected 'return' keyword", tok, [Token.TokenType.RETURN])
         
         tok: Token = self.lexer.peek_next()
         if tok is None:
-            if not self.suppress_err: print("Unexpected end of file")
-            raise Exception()
+            self.error("Unexpected end of file", tok)
         elif not tok.type == Token.TokenType.SEMICOLON: val = self.parse_expression()
         else: val = None
 
         tok: Token = self.lexer.next_token()
         if tok is None or not tok.type == Token.TokenType.SEMICOLON:
-            if not self.suppress_err: print("Expected semicolon ';' after return statement")
-            raise Exception()
+            self.error("Expected semicolon ';' after return statement", tok, [Token.TokenType.SEMICOLON])
         return Return(val)
     
     def parse_asm_block(self) -> Asm:
@@ -680,20 +934,16 @@ class Parser:
         '''
         toks: list[Token] = self.lexer.next_tokens(4)
         if toks[0] is None or not toks[0].type == Token.TokenType.ASM:
-            if not self.suppress_err: print("How did we access asm block with no asm ...")
-            raise Exception()
+            self.error("How did we access asm block with no asm ...", toks[0], [Token.TokenType.ASM])
         
         if toks[1] is None or not toks[1].type == Token.TokenType.LBRACE:
-            if not self.suppress_err: print("Asm block missing open brace '{'")
-            raise Exception()
+            self.error("Asm block missing open brace '{'", toks[1], [Token.TokenType.LBRACE])
         
         if toks[2] is None or not toks[2].type == Token.TokenType.QUOTE:
-            if not self.suppress_err: print("Asm block missing content")
-            raise Exception()
+            self.error("Asm block missing content", toks[2], [Token.TokenType.QUOTE])
         
         if toks[3] is None or not toks[3].type == Token.TokenType.RBRACE:
-            if not self.suppress_err: print("Asm block missing close brace '}'")
-            raise Exception()
+            self.error("Asm block missing close brace '}'", toks[3], [Token.TokenType.RBRACE])
         
         return Asm(toks[2].content)
 
@@ -709,36 +959,30 @@ class Parser:
 
         tok: Token = self.lexer.next_token()
         if tok is None:
-            if not self.suppress_err: print("Unexpected end of file")
-            raise Exception()
+            self.error("Unexpected end of file", tok)
         elif not tok.type == Token.TokenType.IF:
-            if not self.suppress_err: print(f"Not an IF statement! {tok.content}")
-            raise Exception()
+            self.error(f"Not an IF statement! {tok.content}", tok, [Token.TokenType.IF])
         
         constexpr = False
 
         tok: Token = self.lexer.peek_next()
         if tok is None:
-            if not self.suppress_err: print("Unexpected end of file")
-            raise Exception()
+            self.error("Unexpected end of file", tok)
         elif tok.type == Token.TokenType.CONSTEXPR:
             constexpr = True
             self.lexer.pop_token()
     
         tok: Token = self.lexer.next_token()
         if tok is None:
-            if not self.suppress_err: print("Unexpected end of file")
-            raise Exception()
+            self.error("Unexpected end of file", tok)
         elif not tok.type == Token.TokenType.LPAREN:
-            if not self.suppress_err: print(f"IF statement has no condition!")
-            raise Exception()
+            self.error(f"IF statement has no condition!", tok, [Token.TokenType.LPAREN])
         
         conditions: Conditions = self.parse_conditions()
 
         tok: Token = self.lexer.next_token()
         if tok is None or not tok.type == Token.TokenType.RPAREN:
-            if not self.suppress_err: print("Invalid end of IF statement condition")
-            raise Exception()
+            self.error("Invalid end of IF statement condition", tok, [Token.TokenType.RPAREN])
         
         tok = self.lexer.peek_next()
         if tok is None or not tok.type == Token.TokenType.LBRACE: content = self.parse_statement()
@@ -747,26 +991,22 @@ class Parser:
             content = self.parse_body()
             tok = self.lexer.next_token()
             if tok is None or not tok.type == Token.TokenType.RBRACE:
-                if not self.suppress_err: print("Invalid end of IF statement body")
-                raise Exception()
+                self.error("Invalid end of IF statement body", tok, [Token.TokenType.RBRACE])
         
         toks: list[Token] = self.lexer.peek_tokens(2)
         if toks[0] is None:
-            if not self.suppress_err: print("Unexpected end of file ...")
-            raise Exception()
+            self.error("Unexpected end of file ...", toks[0])
         elif not toks[0].type == Token.TokenType.ELSE: return If(constexpr, conditions, content, [], None, toks[0].pos)
         self.lexer.pop_token()
 
         if toks[1] is None:
-            if not self.suppress_err: print("Unexpected end of file ...")
-            raise Exception()
+            self.error("Unexpected end of file ...", toks[1])
         elif toks[1].type == Token.TokenType.LBRACE: # Else condition
             self.lexer.pop_token()
             els = self.parse_body()
             tok = self.lexer.next_token()
             if tok is None or not tok.type == Token.TokenType.RBRACE:
-                if not self.suppress_err: print("Invalid end of IF statement body")
-                raise Exception()
+                self.error("Invalid end of IF statement body", tok, [Token.TokenType.RBRACE])
             return If(constexpr, conditions, content, [], els, toks[1].pos)
         elif toks[1].type == Token.TokenType.IF: # Else If block
             next_if = self.parse_if_block()
@@ -789,34 +1029,29 @@ class Parser:
 
         toks: list[Token] = self.lexer.next_tokens(2)
         if toks[0] is None or toks[1] is None:
-            if not self.suppress_err: print("Unexpected end of file")
-            raise Exception()
+            self.error("Unexpected end of file", toks[1])
         elif not toks[0].type == Token.TokenType.WHILE or not toks[1].type == Token.TokenType.LPAREN:
-            if not self.suppress_err: print(f"Invalid statement: {toks[0].content} {toks[1].content}")
-            raise Exception()
+            self.error(f"Invalid statement: {toks[0].content} {toks[1].content}", toks[0], [Token.TokenType.WHILE, Token.TokenType.LPAREN])
         
         conditions: Conditions = self.parse_conditions()
 
         tok: Token = self.lexer.next_token()
         if tok is None or not tok.type == Token.TokenType.RPAREN:
-            if not self.suppress_err: print("Invalid end of WHILE statement condition")
-            raise Exception()
+            self.error("Invalid end of WHILE statement condition", tok, [Token.TokenType.RPAREN])
         
         tok = self.lexer.peek_next()
         if tok is None or not tok.type == Token.TokenType.LBRACE: 
             content = self.parse_statement()
             tok = self.lexer.peek_next()
             if tok is None:
-                if not self.suppress_err: print("Unexpected end of file ...")
-                raise Exception()
+                self.error("Unexpected end of file ...", tok)
             end_pos = tok.pos
         else:
             self.lexer.pop_token()
             content = self.parse_body()
             tok = self.lexer.next_token()
             if tok is None or not tok.type == Token.TokenType.RBRACE:
-                if not self.suppress_err: print("Invalid end of WHILE statement body")
-                raise Exception()
+                self.error("Invalid end of WHILE statement body", tok, [Token.TokenType.RBRACE])
             end_pos = tok.pos
         
         return While(conditions, content, end_pos)
@@ -830,48 +1065,41 @@ class Parser:
 
         toks: list[Token] = self.lexer.next_tokens(2)
         if toks[0] is None or toks[1] is None:
-            if not self.suppress_err: print("Unexpected end of file")
-            raise Exception()
+            self.error("Unexpected end of file", toks[1])
         elif not toks[0].type == Token.TokenType.FOR or not toks[1].type == Token.TokenType.LPAREN:
-            if not self.suppress_err: print(f"Invalid statement: {toks[0].content} {toks[1].content}")
-            raise Exception()
+            self.error(f"Invalid statement: {toks[0].content} {toks[1].content}", toks[0], [Token.TokenType.FOR, Token.TokenType.LPAREN])
         
         var_declr: Variable = self.parse_variable_declaration()
         
         tok: Token = self.lexer.next_token()
         if tok is None or not tok.type == Token.TokenType.SEMICOLON:
-            if not self.suppress_err: print("Expected semicolon ';' to follow variable declaration")
-            raise Exception()
+            self.error("Expected semicolon ';' to follow variable declaration", tok, [Token.TokenType.SEMICOLON])
         
         conditions: Conditions = self.parse_conditions()
 
         tok: Token = self.lexer.next_token()
         if tok is None or not tok.type == Token.TokenType.SEMICOLON:
-            if not self.suppress_err: print("Expected semicolon ';' following conditions")
-            raise Exception()
+            self.error("Expected semicolon ';' following conditions", tok, [Token.TokenType.SEMICOLON])
         
         var_update: VariableUpdate = self.parse_variable_update()
 
         tok: Token = self.lexer.next_token()
         if tok is None or not tok.type == Token.TokenType.RPAREN:
-            if not self.suppress_err: print("Invalid end of FOR statement condition")
-            raise Exception()
+            self.error("Invalid end of FOR statement condition", tok, [Token.TokenType.RPAREN])
         
         tok = self.lexer.peek_next()
         if tok is None or not tok.type == Token.TokenType.LBRACE: 
             content = self.parse_statement()
             tok = self.lexer.peek_next()
             if tok is None:
-                if not self.suppress_err: print("Unexpected end of file ...")
-                raise Exception()
+                self.error("Unexpected end of file ...", tok)
             end_pos = tok.pos
         else:
             self.lexer.pop_token()
             content = self.parse_body()
             tok = self.lexer.next_token()
             if tok is None or not tok.type == Token.TokenType.RBRACE:
-                if not self.suppress_err: print("Invalid end of FOR statement body")
-                raise Exception()
+                self.error("Invalid end of FOR statement body", tok, [Token.TokenType.RBRACE])
             end_pos = tok.pos
         
         return For(var_declr, conditions, var_update, content, end_pos)
@@ -885,41 +1113,35 @@ class Parser:
 
         toks: list[Token] = self.lexer.next_tokens(2)
         if toks[0] is None or toks[1] is None:
-            if not self.suppress_err: print("Unexpected end of file")
-            raise Exception()
+            self.error("Unexpected end of file", toks[1])
         elif not toks[0].type == Token.TokenType.FOREACH or not toks[1].type == Token.TokenType.LPAREN:
-            if not self.suppress_err: print(f"Invalid statement: {toks[0].content} {toks[1].content}")
-            raise Exception()
+            self.error(f"Invalid statement: {toks[0].content} {toks[1].content}", toks[0], [Token.TokenType.FOREACH, Token.TokenType.LPAREN])
         
         var_declr: Variable = self.parse_variable_declaration()
 
         tok: Token = self.lexer.next_token()
         if tok is None or not tok.type == Token.TokenType.IN:
-            if not self.suppress_err: print("Expected 'in' keyword in ForEach statement")
-            raise Exception()
+            self.error("Expected 'in' keyword in ForEach statement", tok, [Token.TokenType.IN])
         
         iterable_var: MemberAccess = self.parse_member_access()
 
         tok: Token = self.lexer.next_token()
         if tok is None or not tok.type == Token.TokenType.RPAREN:
-            if not self.suppress_err: print("ForEach statement missing close parenthesis ')'")
-            raise Exception()
+            self.error("ForEach statement missing close parenthesis ')'", tok, [Token.TokenType.RPAREN])
 
         tok = self.lexer.peek_next()
         if tok is None or not tok.type == Token.TokenType.LBRACE: 
             content = self.parse_statement()
             tok = self.lexer.peek_next()
             if tok is None:
-                if not self.suppress_err: print("Unexpected end of file ...")
-                raise Exception()
+                self.error("Unexpected end of file ...", tok)
             end_pos = tok.pos
         else:
             self.lexer.pop_token()
             content = self.parse_body()
             tok = self.lexer.next_token()
             if tok is None or not tok.type == Token.TokenType.RBRACE:
-                if not self.suppress_err: print("Invalid end of FOR statement body")
-                raise Exception()
+                self.error("Invalid end of FOR statement body", tok, [Token.TokenType.RBRACE])
             end_pos = tok.pos
             
         return ForEach(var_declr, iterable_var, content, end_pos)
@@ -932,31 +1154,25 @@ class Parser:
 
         toks: list[Token] = self.lexer.next_tokens(2)
         if toks[0] is None or toks[1] is None:
-            if not self.suppress_err: print("Unexpected end of file")
-            raise Exception()
+            self.error("Unexpected end of file", toks[1])
         elif not toks[0].type == Token.TokenType.SWITCH or not toks[1].type == Token.TokenType.LPAREN:
-            if not self.suppress_err: print(f"Invalid statement: {toks[0].content} {toks[1].content}")
-            raise Exception()
+            self.error(f"Invalid statement: {toks[0].content} {toks[1].content}", toks[0], [Token.TokenType.SWITCH, Token.TokenType.LPAREN])
         
         test_val: Expression = self.parse_expression()
 
         toks: list[Token] = self.lexer.next_tokens(2)
         if toks[0] is None or toks[1] is None:
-            if not self.suppress_err: print("Unexpected end of file")
-            raise Exception()
+            self.error("Unexpected end of file", toks[1])
         elif not toks[0].type == Token.TokenType.RPAREN:
-            if not self.suppress_err: print("Switch statement missing close parenthesis ')'")
-            raise Exception()
+            self.error("Switch statement missing close parenthesis ')'", toks[0], [Token.TokenType.RPAREN])
         elif not toks[1].type == Token.TokenType.LBRACE:
-            if not self.suppress_err: print("Switch statement missing open brace '{'")
-            raise Exception()
+            self.error("Switch statement missing open brace '{'", toks[1], [Token.TokenType.LBRACE])
         
         cases: list[Case] = self.parse_cases()
 
         tok: Token = self.lexer.next_token()
         if tok is None or not tok.type == Token.TokenType.RBRACE:
-            if not self.suppress_err: print("Switch statement missing close brace '}'")
-            raise Exception()
+            self.error("Switch statement missing close brace '}'", tok, [Token.TokenType.RBRACE])
         
         return Switch(test_val, cases)
 
@@ -970,17 +1186,16 @@ class Parser:
 
         toks: list[Token] = self.lexer.peek_tokens(2)
         if toks[0] is None or toks[1] is None:
-            if not self.suppress_err: print("Unexpected end of file ...")
-            raise Exception()
+            self.error("Unexpected end of file ...", toks[1])
         
         cases: list[Case] = []
         while toks[0].type == Token.TokenType.DEFAULT or toks[0].type == Token.TokenType.CASE:
             if toks[0].type == Token.TokenType.DEFAULT:
                 if not toks[1].type == Token.TokenType.COLON:
-                    if not self.suppress_err: print("Default case missing colon ':'")
-                    raise Exception()
+                    self.error("Default case missing colon ':'", toks[1], [Token.TokenType.COLON])
                 self.lexer.pop_tokens(2)
                 cases.append(Case(None, self.parse_case_body(True)))
+                if self.spans is not None: self.spans.add(cases[-1], toks[0].start, self.lexer.last_end)
                 return cases
             else:
                 case: Case = self.parse_case()
@@ -988,8 +1203,7 @@ class Parser:
 
             toks: list[Token] = self.lexer.peek_tokens(2)
             if toks[0] is None or toks[1] is None:
-                if not self.suppress_err: print("Unexpected end of file ...")
-                raise Exception()
+                self.error("Unexpected end of file ...", toks[1])
 
 
     def parse_case(self) -> Case:
@@ -998,23 +1212,21 @@ class Parser:
         '''
         tok: Token = self.lexer.next_token()
         if tok is None or not tok.type == Token.TokenType.CASE:
-            if not self.suppress_err: print("Case missing 'case' keyword")
-            raise Exception()
+            self.error("Case missing 'case' keyword", tok, [Token.TokenType.CASE])
         
         tok: Token = self.lexer.peek_next()
         if tok is None:
-            if not self.suppress_err: print("Unexpected end of file ...")
-            raise Exception()
+            self.error("Unexpected end of file ...", tok)
         elif tok.type == Token.TokenType.VAL:
-            val: Value = Value(tok.content)
+            val: Value = Value(tok.content, tok.literal)
             self.lexer.pop_token()
+            if self.spans is not None: self.spans.add(val, tok.start, tok.end)
         else:
             val: MemberAccess = self.parse_member_access()
 
         tok: Token = self.lexer.next_token()
         if tok is None or not tok.type == Token.TokenType.COLON:
-            if not self.suppress_err: print("Case missing colon ':'")
-            raise Exception()
+            self.error("Case missing colon ':'", tok, [Token.TokenType.COLON])
         
         body: Body = self.parse_case_body(False)
         return Case(val, body)
@@ -1029,12 +1241,10 @@ class Parser:
         if self.debug_mode: print("Case Body check")
         tok: Token = self.lexer.peek_next()
         if tok is None:
-            if not self.suppress_err: print("Reached end of program unexpectedly ...")
-            raise Exception()
+            self.error("Reached end of program unexpectedly ...", tok)
         elif isDefault:
             if tok.type == Token.TokenType.CASE or tok.type == Token.TokenType.DEFAULT:
-                if not self.suppress_err: print("'default' must be final case in switch block!")
-                raise Exception()
+                self.error("'default' must be final case in switch block!", tok)
             elif tok.type == Token.TokenType.RBRACE: return CaseBody([])
 
         statements = []
@@ -1042,16 +1252,20 @@ class Parser:
             if tok.type == Token.TokenType.RBRACE: # End of switch block
                 break
             elif tok.type == Token.TokenType.BREAK:
+                start: int = tok.start
                 self.lexer.pop_token()
                 tok: Token = self.lexer.next_token()
                 if tok is None or not tok.type == Token.TokenType.SEMICOLON:
-                    if not self.suppress_err: print("Expected semicolon ';' after break statement")
-                    raise Exception()
+                    self.error("Expected semicolon ';' after break statement", tok, [Token.TokenType.SEMICOLON])
                 statements.append(Statement(Break()))
+                if self.spans is not None:
+                    self.spans.add(statements[-1].statement, start, tok.end)
+                    self.spans.add(statements[-1], start, tok.end)
                 return CaseBody(statements)
             elif tok.type == Token.TokenType.RETURN:
                 ret: Return = self.parse_return()
                 statements.append(Statement(ret))
+                if self.spans is not None: self.spans.add(statements[-1], self.spans.span(ret)[0], self.lexer.last_end)
                 return CaseBody(statements)
             
             statement: Statement = self.parse_statement()
@@ -1071,8 +1285,7 @@ class Parser:
         if self.debug_mode: print("Conditions check")
         tok: Token = self.lexer.peek_next()
         if tok is None:
-            if not self.suppress_err: print("Reached unexpected end of file ...")
-            raise Exception()
+            self.error("Reached unexpected end of file ...", tok)
         
         conditions = []
         ops = []
@@ -1083,8 +1296,7 @@ class Parser:
                 self.lexer.pop_token()
                 tok = self.lexer.peek_next()
                 if tok is None:
-                    if not self.suppress_err: print("Reached unexpected end of file ...")
-                    raise Exception()
+                    self.error("Reached unexpected end of file ...", tok)
 
             if tok.type == Token.TokenType.LPAREN:
                 self.lexer.pop_token()
@@ -1096,8 +1308,7 @@ class Parser:
                 conditions.append(sub_conditions)
                 tok: Token = self.lexer.next_token()
                 if tok is None or not tok.type == Token.TokenType.RPAREN:
-                    if not self.suppress_err: print("Expected ')' to close condition")
-                    raise Exception()
+                    self.error("Expected ')' to close condition", tok, [Token.TokenType.RPAREN])
             else:
                 sub_condition = self.parse_condition()
                 if negation: sub_condition.is_negated = not sub_condition.is_negated
@@ -1110,8 +1321,7 @@ class Parser:
 
             tok: Token = self.lexer.peek_next()
                 
-        if not self.suppress_err: print("Reached unexpected end of file ...")
-        raise Exception()
+        self.error("Reached unexpected end of file ...", self.lexer.peek_next())
 
     def parse_condition(self) -> Condition:
         '''
@@ -1123,20 +1333,16 @@ class Parser:
         left = self.parse_expression()
 
         tok: Token = self.lexer.next_token()
-        
-        cond_op = None
-        for op in ConditionOperation:
-            if tok.content == op.value:
-                cond_op = op
-                break
+        if tok is None:
+            self.error("Reached unexpected end of file ...", tok, list(condition_token_operations))
 
+        cond_op: ConditionOperation | None = condition_token_operations.get(tok.type)
         if cond_op is None:
-            if not self.suppress_err: print(f"Invalid condition operation: {tok.content}")
-            raise Exception()
+            self.error(f"Invalid condition operation: {tok.content}", tok, list(condition_token_operations))
 
         right = self.parse_expression()
 
-        return Condition(left, right, op, False)
+        return Condition(left, right, cond_op, False)
     
     def parse_variable_update(self, member_access: MemberAccess|None = None):
         '''
@@ -1148,8 +1354,7 @@ class Parser:
         '''
         tok: Token = self.lexer.peek_next()
         if tok is None:
-            if not self.suppress_err: print("Unexpected end of file ...")
-            raise Exception()
+            self.error("Unexpected end of file ...", tok)
         
         if tok.type == Token.TokenType.INC or tok.type == Token.TokenType.DEC:
             toktype = tok.type
@@ -1162,13 +1367,14 @@ class Parser:
             if member_access is None: member_access = self.parse_member_access()
 
             tok: Token = self.lexer.next_token()
-            if tok.type == Token.TokenType.INC: return VariableUpdate(member_access, VariableSetOperation.INC, None, member_access.accesses[-1].pos)
-            elif tok.type == Token.TokenType.DEC: return VariableUpdate(member_access, VariableSetOperation.DEC, None, member_access.accesses[-1].pos)
+            if tok is None:
+                self.error("Unexpected end of file ...", tok)
 
-            for op in VariableSetOperation:
-                if tok.content == op.value:
-                    return VariableUpdate(member_access, op, self.parse_expression(), member_access.accesses[-1].pos)
+            op: VariableSetOperation | None = variable_set_token_operations.get(tok.type)
+            if op == VariableSetOperation.INC or op == VariableSetOperation.DEC:
+                return VariableUpdate(member_access, op, None, member_access.accesses[-1].pos)
+            elif op is not None:
+                return VariableUpdate(member_access, op, self.parse_expression(), member_access.accesses[-1].pos)
 
-            if not self.suppress_err: print(f"Unrecognized operation: {tok.content}")
-            raise Exception()
+            self.error(f"Unrecognized operation: {tok.content}", tok)
         
\ No newline at end of file
@@ -1,2 +1,27 @@
-def test():
-    pass
\ No newline at end of file
+from .core_elements import LineIndex
+from .lexer import Token
+
+class Diagnostic:
+    def __init__(self, message: str, pos: int, expected: list[Token.TokenType]):
+        self.message: str = message
+        self.pos: int = pos  # Start of the offending token, or the end of the source if it ended early
+        self.expected: list[Token.TokenType] = expected  # Token types that would have been accepted, if known
+
+    def line_col(self, lines: LineIndex) -> tuple[int, int]:
+        return lines.line_col(self.pos)
+
+    def __str__(self) -> str:
+        output = self.message
+        if self.expected:
+            output += ' (expected ' + ', '.join(t.name for t in self.expected) + ')'
+        return output
+
+    def __eq__(self, other):
+        if not isinstance(other, Diagnostic): return False
+        return self.message == other.message and self.pos == other.pos and self.expected == other.expected
+
+class ParseError(Exception):
+    def __init__(self, diagnostic: Diagnostic, token: Token | None = None):
+        super().__init__(str(diagnostic))
+        self.diagnostic: Diagnostic = diagnostic
+        self.token: Token | None = token  # Offending token, None if the source ended early
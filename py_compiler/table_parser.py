@@ -0,0 +1,663 @@
+from .core_elements import *
+from .grammar import Grammar, Nonterminal, Production
+from .lexer import Lexer, Token, TokenCursor, TOKEN_CODES, TOKEN_TYPES
+from .parser import expression_token_operations, condition_token_operations, variable_set_token_operations
+from .parser_error_util import Diagnostic, ParseError
+
+class TableParser:
+    '''
+    Parser backend driven by LL(2) tables generated (see grammar.py) from the productions in the docstrings of the
+    build_ methods below, producing the same nodes as Parser.  Productions are expanded on an explicit stack and
+    each build_ method is called with the values of its production's symbols (the Token of a terminal, the node
+    built for a nonterminal), so nesting depth is only limited by memory instead of the recursion limit.
+
+    Lists are right recursive productions whose values are built back to front and reversed once where they are
+    used.  Only plain parsing is supported: no deferred bodies, recovery, incremental reparsing or spans.
+    '''
+    def __init__(self, lexer: Lexer | TokenCursor, debug_mode: bool = False, suppress_err: bool = False):
+        self.lexer: Lexer | TokenCursor = lexer
+        self.debug_mode: bool = debug_mode
+        self.suppress_err: bool = suppress_err
+
+    def parse_class(self) -> Class:
+        return self.parse('Program')
+
+    def parse(self, start: str = 'Program'):
+        '''
+        Parse the start nonterminal from the next tokens and return its node, leaving the tokens after it
+        '''
+        lexer: Lexer | TokenCursor = self.lexer
+        stack: list = [grammar.nonterminals[start]]
+        values: list = []
+        tok: Token | None = lexer.peek_next()
+        code: int = TOKEN_CODES[tok.type] if tok is not None else -1  # The tables are keyed by type code, -1 at the end
+        while stack:
+            sym = stack.pop()
+            if type(sym) is Nonterminal:
+                production = sym.row.get(code, sym.default)
+                depth: int = 0
+                while type(production) is dict:  # Decided by a later token
+                    depth += 1
+                    next_tok: Token | None = lexer.peek_tokens(depth + 1)[depth]
+                    row: dict = production
+                    production = row.get(TOKEN_CODES[next_tok.type] if next_tok is not None else -1, sym.default)
+                    if production is None: self.unexpected(sym, next_tok, row)
+                if production is None: self.unexpected(sym, tok, sym.row)
+                if self.debug_mode: print(production)
+
+                stack.append(production)
+                stack.extend(production.pushed)
+            elif type(sym) is Production:  # All of its symbols are parsed
+                if sym.size:
+                    args: list = values[-sym.size:]
+                    del values[-sym.size:]
+                else: args = []
+                values.append(sym.action(self, args))
+            else:
+                if code != sym:
+                    if tok is None: self.error("Reached unexpected end of file ...", tok, [TOKEN_TYPES[sym]])
+                    self.error(f"Expected {TOKEN_TYPES[sym].name}, not {tok.content}", tok, [TOKEN_TYPES[sym]])
+                lexer.pop_token()
+                values.append(tok)
+                tok = lexer.peek_next()
+                code = TOKEN_CODES[tok.type] if tok is not None else -1
+
+        return values[0]
+
+    def unexpected(self, nonterminal: Nonterminal, tok: Token | None, row: dict):
+        expected: list[Token.TokenType] = [TOKEN_TYPES[code] for code in row if code != -1]
+        if tok is None: self.error("Reached unexpected end of file ...", tok, expected)
+        self.error(f"Unexpected {tok.content} in {nonterminal}", tok, expected)
+
+    def error(self, message: str, tok: Token | None, expected: list[Token.TokenType] = []):
+        '''
+        Raise a ParseError for the offending token (None if the source ended early)
+        '''
+        if not self.suppress_err: print(message)
+        pos: int = tok.start if tok is not None else len(self.lexer.text)
+        raise ParseError(Diagnostic(message, pos, expected), tok)
+
+    def build_program(self, v: list) -> Class:
+        '''
+        Program : Mods ClassDeclaration
+        '''
+        v[1].mods = v[0]
+        return v[1]
+
+    def build_mods(self, v: list) -> list[str]:
+        '''
+        Mods : PUBLIC Mods
+              | STATIC Mods
+              | SEALED Mods
+              | ABSTRACT Mods
+              | MUTABLE Mods
+        '''
+        v[1].insert(0, v[0].content)  # Only a few mods, no need to build it reversed
+        return v[1]
+
+    def build_no_mods(self, v: list) -> list[str]:
+        '''
+        Mods : empty
+        '''
+        return []
+
+    def build_class_declaration(self, v: list) -> Class:
+        '''
+        ClassDeclaration : CLASS IDENTIFIER OptTypedef OptExtension LBRACE ClassBody ClassClose
+        '''
+        return Class(None, v[1].content, v[2], v[3], v[5])
+
+    def build_class_close(self, v: list):
+        '''
+        ClassClose : empty
+        '''
+        # The close brace is only checked, it is left to the caller like in Parser
+        tok: Token = self.lexer.peek_next()
+        if tok is None:
+            self.error("Class body missing close brace '}'", tok, [Token.TokenType.RBRACE])
+        elif not tok.type == Token.TokenType.RBRACE:
+            self.error("Expected member in class body ...", tok)
+
+    def build_opt_typedef(self, v: list) -> list[str] | None:
+        '''
+        OptTypedef : Typedef
+                    | empty
+        '''
+        return v[0] if v else None
+
+    def build_typedef(self, v: list) -> list[str]:
+        '''
+        Typedef : LT IDENTIFIER TypedefNames GT
+        '''
+        v[2].append(v[1].content)
+        v[2].reverse()
+        return v[2]
+
+    def build_typedef_names(self, v: list) -> list[str]:
+        '''
+        TypedefNames : COMMA IDENTIFIER TypedefNames
+                      | empty
+        '''
+        if not v: return []
+        v[2].append(v[1].content)
+        return v[2]
+
+    def build_opt_extension(self, v: list) -> str | None:
+        '''
+        OptExtension : EXTENDS IDENTIFIER
+                      | empty
+        '''
+        return v[1].content if v else None
+
+    def build_class_body(self, v: list) -> ClassBody:
+        '''
+        ClassBody : ClassMembers
+        '''
+        body: ClassBody = ClassBody([],[],[],[])
+        for member in reversed(v[0]):
+            if type(member) is Variable: body.member_vars.append(member)
+            elif type(member) is Constructor: body.constructors.append(member)
+            elif type(member) is Function: body.functions.append(member)
+            else: body.classes.append(member)
+        return body
+
+    def build_class_members(self, v: list) -> list[Variable | Constructor | Function | Class]:
+        '''
+        ClassMembers : Mods OptClassMember
+        '''
+        if v[1] is None: return []  # Mods before the close brace are dropped like in Parser
+        member, members = v[1]
+        member.mods = v[0]
+        members.append(member)
+        return members
+
+    def build_opt_class_member(self, v: list) -> tuple[Variable | Constructor | Function | Class, list] | None:
+        '''
+        OptClassMember : ClassMember ClassMembers
+                        | empty
+        '''
+        return (v[0], v[1]) if v else None
+
+    def build_constructor(self, v: list) -> Constructor:
+        '''
+        ClassMember : CONSTRUCTOR LPAREN StartParams RPAREN LBRACE Body RBRACE
+        '''
+        return Constructor(None, v[2], v[5])
+
+    def build_function_declaration(self, v: list) -> Function:
+        '''
+        ClassMember : IDENTIFIER FUNCTION FunctionName LPAREN StartParams RPAREN FunctionBody
+        '''
+        func: Function = Function(None, v[2], v[0].content, v[4], None)
+        if v[6] is not None: func.body = v[6]
+        return func
+
+    def build_variable_member(self, v: list) -> Variable:
+        '''
+        ClassMember : VariableDeclaration SEMICOLON
+        '''
+        return v[0]
+
+    def build_class_member(self, v: list) -> Class:
+        '''
+        ClassMember : ClassDeclaration
+        '''
+        return v[0]
+
+    def build_function_name(self, v: list) -> str:
+        '''
+        FunctionName : IDENTIFIER
+                      | OPERATOR OverloadableOperator
+        '''
+        if len(v) == 1: return v[0].content
+        return 'operator_' + str(v[1].type).removeprefix('TokenType.')
+
+    def build_overloadable_operator(self, v: list) -> Token:
+        '''
+        OverloadableOperator : ADD | SUB | MULT | DIV | MOD | BIT_AND | BIT_OR | BIT_XOR | BIT_NOT | BIT_LSHIFT | BIT_RSHIFT
+                              | BRACKETS | LEQ | GEQ | GT | NEQ | EQ | SET | INC | DEC | SET_ADD | SET_SUB | SET_MULT | SET_MOD
+        '''
+        # The operations in all_operations that are lexed as one token
+        return v[0]
+
+    def build_function_body(self, v: list) -> Body | None:
+        '''
+        FunctionBody : SEMICOLON
+                      | LBRACE Body RBRACE
+        '''
+        return v[1] if len(v) == 3 else None
+
+    def build_start_params(self, v: list) -> list[Parameter]:
+        '''
+        StartParams : Params
+                     | empty
+        '''
+        return v[0] if v else []
+
+    def build_params(self, v: list) -> list[Parameter]:
+        '''
+        Params : Param ParamList
+        '''
+        v[1].append(v[0])
+        v[1].reverse()
+        return v[1]
+
+    def build_param_list(self, v: list) -> list[Parameter]:
+        '''
+        ParamList : COMMA Param ParamList
+                   | empty
+        '''
+        if not v: return []
+        v[2].append(v[1])
+        return v[2]
+
+    def build_param(self, v: list) -> Parameter:
+        '''
+        Param : IDENTIFIER OptTypedef IDENTIFIER
+        '''
+        return Parameter(v[0].content, v[1], v[2].content)
+
+    def build_variable_declaration(self, v: list) -> Variable:
+        '''
+        VariableDeclaration : IDENTIFIER OptTypedef IDENTIFIER OptInitialization
+        '''
+        return Variable([], v[0].content, v[1] if v[1] is not None else [], v[2].content, v[2].pos, v[3])
+
+    def build_opt_initialization(self, v: list) -> Expression | None:
+        '''
+        OptInitialization : SET Expression
+                           | empty
+        '''
+        return v[1] if v else None
+
+    def build_body(self, v: list) -> Body:
+        '''
+        Body : Statements
+        '''
+        v[0].reverse()
+        return Body(v[0])
+
+    def build_statements(self, v: list) -> list[Statement]:
+        '''
+        Statements : Statement Statements
+                    | empty
+        '''
+        if not v: return []
+        v[1].append(v[0])
+        return v[1]
+
+    def build_statement(self, v: list) -> Statement:
+        '''
+        Statement : IfBlock
+                   | WhileBlock
+                   | ForBlock
+                   | ForEachBlock
+                   | Switch
+                   | Return
+                   | AsmBlock
+                   | BREAK SEMICOLON
+                   | PrefixUpdate SEMICOLON
+                   | Mods LocalStatement
+        '''
+        if len(v) == 1: return Statement(v[0])
+        elif type(v[0]) is Token: return Statement(Break())
+        elif type(v[0]) is VariableUpdate: return Statement(v[0])
+        if type(v[1]) is Variable: v[1].mods = v[0]  # Mods are dropped from anything but a declaration like in Parser
+        return Statement(v[1])
+
+    def build_local_statement(self, v: list) -> Variable | MemberAccess | VariableUpdate:
+        '''
+        LocalStatement : VariableDeclaration SEMICOLON
+                        | MemberAccess AccessStatement
+        '''
+        if type(v[0]) is Variable or v[1] is None: return v[0]
+        op, val = v[1]
+        return VariableUpdate(v[0], op, val, v[0].accesses[-1].pos)
+
+    def build_access_statement(self, v: list) -> tuple[VariableSetOperation, Expression | None] | None:
+        '''
+        AccessStatement : SEMICOLON
+                         | UpdateOperation SEMICOLON
+        '''
+        return v[0] if len(v) == 2 else None
+
+    def build_variable_update(self, v: list) -> VariableUpdate:
+        '''
+        VariableUpdate : PrefixUpdate
+                        | MemberAccess UpdateOperation
+        '''
+        if len(v) == 1: return v[0]
+        op, val = v[1]
+        return VariableUpdate(v[0], op, val, v[0].accesses[-1].pos)
+
+    def build_prefix_update(self, v: list) -> VariableUpdate:
+        '''
+        PrefixUpdate : INC MemberAccess
+                      | DEC MemberAccess
+        '''
+        return VariableUpdate(v[1], variable_set_token_operations[v[0].type], None, v[1].accesses[-1].pos)
+
+    def build_update_operation(self, v: list) -> tuple[VariableSetOperation, Expression | None]:
+        '''
+        UpdateOperation : INC
+                         | DEC
+                         | SetOperator Expression
+        '''
+        if len(v) == 1: return variable_set_token_operations[v[0].type], None
+        return v[0], v[1]
+
+    def build_set_operator(self, v: list) -> VariableSetOperation:
+        '''
+        SetOperator : SET | SET_ADD | SET_SUB | SET_MULT | SET_DIV | SET_MOD
+        '''
+        return variable_set_token_operations[v[0].type]
+
+    def build_return(self, v: list) -> Return:
+        '''
+        Return : RETURN OptExpression SEMICOLON
+        '''
+        return Return(v[1])
+
+    def build_opt_expression(self, v: list) -> Expression | None:
+        '''
+        OptExpression : Expression
+                       | empty
+        '''
+        return v[0] if v else None
+
+    def build_asm_block(self, v: list) -> Asm:
+        '''
+        AsmBlock : ASM LBRACE QUOTE RBRACE
+        '''
+        return Asm(v[2].content)
+
+    def build_if_block(self, v: list) -> If:
+        '''
+        IfBlock : IF OptConstexpr LPAREN Conditions RPAREN Block ElseBlock
+        '''
+        elifs, els, end_pos = v[6]
+        return If(v[1], v[3], v[5], elifs, els, end_pos)
+
+    def build_opt_constexpr(self, v: list) -> bool:
+        '''
+        OptConstexpr : CONSTEXPR
+                      | empty
+        '''
+        return len(v) == 1
+
+    def build_block(self, v: list) -> Body | Statement:
+        '''
+        Block : LBRACE Body RBRACE
+               | Statement
+        '''
+        return v[1] if len(v) == 3 else v[0]
+
+    def build_else_block(self, v: list) -> tuple[list[If], Body | Statement | None, int]:
+        '''
+        ElseBlock : ELSE Lookahead ElseContent
+                   | Lookahead
+        '''
+        if len(v) == 1: return [], None, v[0].pos  # Position of the token after the if block
+        elifs, els = v[2]
+        return elifs, els, v[1].pos  # Position of the token after else
+
+    def build_else_content(self, v: list) -> tuple[list[If], Body | Statement]:
+        '''
+        ElseContent : LBRACE Body RBRACE
+                     | IfBlock
+                     | Statement
+        '''
+        if len(v) == 3: return [], v[1]
+        elif type(v[0]) is Statement: return [], v[0]
+
+        # An else if takes over the else ifs and else of the if after it
+        next_if: If = v[0]
+        elifs, els = next_if.elseifs, next_if.els
+        next_if.elseifs = []
+        next_if.els = None
+        elifs.insert(0, next_if)
+        return elifs, els
+
+    def build_lookahead(self, v: list) -> Token:
+        '''
+        Lookahead : empty
+        '''
+        tok: Token = self.lexer.peek_next()
+        if tok is None:
+            self.error("Unexpected end of file ...", tok)
+        return tok
+
+    def build_loop_block(self, v: list) -> tuple[Body | Statement, int]:
+        '''
+        LoopBlock : LBRACE Body RBRACE
+                   | Statement Lookahead
+        '''
+        if len(v) == 3: return v[1], v[2].pos
+        return v[0], v[1].pos
+
+    def build_while_block(self, v: list) -> While:
+        '''
+        WhileBlock : WHILE LPAREN Conditions RPAREN LoopBlock
+        '''
+        return While(v[2], *v[4])
+
+    def build_for_block(self, v: list) -> For:
+        '''
+        ForBlock : FOR LPAREN VariableDeclaration SEMICOLON Conditions SEMICOLON VariableUpdate RPAREN LoopBlock
+        '''
+        return For(v[2], v[4], v[6], *v[8])
+
+    def build_foreach_block(self, v: list) -> ForEach:
+        '''
+        ForEachBlock : FOREACH LPAREN VariableDeclaration IN MemberAccess RPAREN LoopBlock
+        '''
+        return ForEach(v[2], v[4], *v[6])
+
+    def build_switch(self, v: list) -> Switch:
+        '''
+        Switch : SWITCH LPAREN Expression RPAREN LBRACE Cases RBRACE
+        '''
+        if v[5] is not None: v[5].reverse()
+        return Switch(v[2], v[5])
+
+    def build_cases(self, v: list) -> list[Case] | None:
+        '''
+        Cases : CASE CaseValue COLON CaseBody Cases
+               | DEFAULT COLON CaseBody
+               | empty
+        '''
+        # Like Parser, cases are only kept when they end with a default case
+        if not v: return None
+        elif len(v) == 3: return [Case(None, v[2])]
+        elif v[4] is None: return None
+        v[4].append(Case(v[1], v[3]))
+        return v[4]
+
+    def build_case_value(self, v: list) -> Value | MemberAccess:
+        '''
+        CaseValue : VAL
+                   | MemberAccess
+        '''
+        return Value(v[0].content, v[0].literal) if type(v[0]) is Token else v[0]
+
+    def build_case_body(self, v: list) -> CaseBody:
+        '''
+        CaseBody : CaseStatements
+        '''
+        v[0].reverse()
+        return CaseBody(v[0])
+
+    def build_case_statements(self, v: list) -> list[Statement]:
+        '''
+        CaseStatements : BREAK SEMICOLON
+                        | Return
+                        | Statement CaseStatements
+                        | empty
+        '''
+        # A break or return ends the case
+        if not v: return []
+        elif len(v) == 1: return [Statement(v[0])]
+        elif type(v[0]) is Token: return [Statement(Break())]
+        v[1].append(v[0])
+        return v[1]
+
+    def build_conditions(self, v: list) -> Conditions:
+        '''
+        Conditions : ConditionItem ConditionList
+        '''
+        conditions, ops = v[1]
+        conditions.append(v[0])
+        conditions.reverse()
+        ops.reverse()
+        return Conditions(conditions, ops)
+
+    def build_condition_list(self, v: list) -> tuple[list[Conditions | Condition], list[bool]]:
+        '''
+        ConditionList : AND ConditionItem ConditionList
+                       | OR ConditionItem ConditionList
+                       | empty
+        '''
+        if not v: return [], []
+        conditions, ops = v[2]
+        conditions.append(v[1])
+        ops.append(v[0].type == Token.TokenType.AND)
+        return conditions, ops
+
+    def build_condition_item(self, v: list) -> Conditions | Condition:
+        '''
+        ConditionItem : Negation ConditionTerm
+        '''
+        if v[0]:
+            if type(v[1]) is Conditions:
+                for condition in v[1].conditions:
+                    condition.is_negated = not condition.is_negated
+            else: v[1].is_negated = not v[1].is_negated
+        return v[1]
+
+    def build_negation(self, v: list) -> bool:
+        '''
+        Negation : NOT Negation
+                  | empty
+        '''
+        return not v[1] if v else False
+
+    def build_condition_term(self, v: list) -> Conditions | Condition:
+        '''
+        ConditionTerm : LPAREN Conditions RPAREN
+                       | Condition
+        '''
+        return v[1] if len(v) == 3 else v[0]
+
+    def build_condition(self, v: list) -> Condition:
+        '''
+        Condition : Expression ConditionOperator Expression
+        '''
+        return Condition(v[0], v[2], v[1], False)
+
+    def build_condition_operator(self, v: list) -> ConditionOperation:
+        '''
+        ConditionOperator : LEQ | LT | GEQ | GT | NEQ | EQ
+        '''
+        return condition_token_operations[v[0].type]
+
+    def build_expression(self, v: list) -> Expression:
+        '''
+        Expression : Operand ExpressionList
+        '''
+        values, ops = v[1]
+        values.append(v[0])
+        values.reverse()
+        ops.reverse()
+        return operation_tree(values, ops)
+
+    def build_expression_list(self, v: list) -> tuple[list[Expression], list[Operation]]:
+        '''
+        ExpressionList : Operator Operand ExpressionList
+                        | empty
+        '''
+        if not v: return [], []
+        values, ops = v[2]
+        values.append(v[1])
+        ops.append(v[0])
+        return values, ops
+
+    def build_operator(self, v: list) -> Operation:
+        '''
+        Operator : ADD | SUB | MULT | DIV | MOD | BIT_AND | BIT_OR | BIT_XOR | BIT_LSHIFT | BIT_RSHIFT
+        '''
+        return expression_token_operations[v[0].type]
+
+    def build_operand(self, v: list) -> Expression:
+        '''
+        Operand : LPAREN Expression RPAREN
+                 | BIT_NOT Operand
+                 | VAL
+                 | MemberAccess
+        '''
+        if len(v) == 3: return v[1]
+        elif len(v) == 2: return UnaryOperation(Operation.BIT_NOT, v[1])
+        elif type(v[0]) is Token: return Value(v[0].content, v[0].literal)
+        return v[0]
+
+    def build_member_access(self, v: list) -> MemberAccess:
+        '''
+        MemberAccess : Access AccessList
+        '''
+        v[1].append(v[0])
+        v[1].reverse()
+        return MemberAccess(v[1])
+
+    def build_access_list(self, v: list) -> list[VariableAccess | FunctionCall | ConstructorCall]:
+        '''
+        AccessList : DOT Access AccessList
+                    | empty
+        '''
+        if not v: return []
+        v[2].append(v[1])
+        return v[2]
+
+    def build_constructor_call(self, v: list) -> ConstructorCall:
+        '''
+        Access : NEW IDENTIFIER OptTypedef LPAREN StartArgs RPAREN
+        '''
+        return ConstructorCall(v[1].content, v[2], v[4])
+
+    def build_function_call(self, v: list) -> FunctionCall:
+        '''
+        Access : IDENTIFIER LPAREN StartArgs RPAREN
+        '''
+        return FunctionCall(v[0].content, v[2])
+
+    def build_variable_access(self, v: list) -> VariableAccess:
+        '''
+        Access : IDENTIFIER
+        '''
+        return VariableAccess(v[0].content, v[0].pos)
+
+    def build_start_args(self, v: list) -> list[Expression]:
+        '''
+        StartArgs : Args
+                   | empty
+        '''
+        return v[0] if v else []
+
+    def build_args(self, v: list) -> list[Expression]:
+        '''
+        Args : Expression ArgList
+        '''
+        v[1].append(v[0])
+        v[1].reverse()
+        return v[1]
+
+    def build_arg_list(self, v: list) -> list[Expression]:
+        '''
+        ArgList : COMMA Expression ArgList
+                 | empty
+        '''
+        if not v: return []
+        v[2].append(v[1])
+        return v[2]
+
+# Generated once from the build_ methods, in the order they are defined so earlier alternatives win ambiguities
+grammar: Grammar = Grammar([(method.__doc__, method) for name, method in TableParser.__dict__.items() if name.startswith('build_')],
+                           {name: TOKEN_CODES[toktype] for name, toktype in Token.TokenType.__members__.items()}, 'Program', end=-1)
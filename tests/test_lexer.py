@@ -1,5 +1,10 @@
+import functools
+import io
+import mmap
+import tempfile
 import unittest
-from py_compiler.lexer import Lexer, Token
+from unittest import mock
+from py_compiler.lexer import Lexer, Token, TokenCursor, TOKEN_CODES, END_CODE
 
 class TestLexerOperation(unittest.TestCase):
 
@@ -90,6 +95,393 @@ class TestLexerOperation(unittest.TestCase):
         peek = lexer.peek_next()
         self.assertIsNone(peek)
 
+    # Test mixing peeks and consumes through the lookahead buffer
+    def test_lexer_lookahead(self):
+        input_str = "a b c d e".strip()
+        lexer = Lexer(input_str)
+
+        # Test deeper peek after shallow peek
+        self.assertEqual(lexer.peek_next().content, "a")
+        self.assertListEqual([t.content for t in lexer.peek_tokens(3)], ["a", "b", "c"])
+        self.assertEqual(len(lexer.hold_tokens), 3)
+
+        # Test consuming part of the held tokens
+        self.assertEqual(lexer.next_token().content, "a")
+        self.assertListEqual([t.content for t in lexer.next_tokens(3)], ["b", "c", "d"])
+        self.assertEqual(len(lexer.hold_tokens), 0)
+
+        # Test peek past end of file is padded with None
+        peeks = lexer.peek_tokens(3)
+        self.assertEqual(peeks[0].content, "e")
+        self.assertIsNone(peeks[1])
+        self.assertIsNone(peeks[2])
+
+        # Test popping more tokens than held
+        lexer.pop_tokens(5)
+        self.assertIsNone(lexer.peek_next())
+        self.assertIsNone(lexer.next_token())
+
+    # Test master regex engine matches the original pattern loop
+    def test_lexer_engines(self):
+        input_str = '''public class array<T> extends Base {
+                            mut u32[] values = 0x1F; // comment
+                            if (a != !b && c >= 3.5) { x += 1; y <<= 2; }
+                            asm { "mov rax, 1" }
+                        }'''.strip()
+        regex_lexer = Lexer(input_str, engine='regex')
+        loop_lexer = Lexer(input_str, engine='loop')
+
+        regex_tok = regex_lexer.next_token()
+        loop_tok = loop_lexer.next_token()
+        while regex_tok is not None and loop_tok is not None:
+            self.assertEqual(regex_tok.type, loop_tok.type)
+            self.assertEqual(regex_tok.content, loop_tok.content)
+            self.assertEqual(regex_tok.pos, loop_tok.pos)
+            regex_tok = regex_lexer.next_token()
+            loop_tok = loop_lexer.next_token()
+        self.assertIsNone(regex_tok)
+        self.assertIsNone(loop_tok)
+
+        # Test DFA engine matches the master regex engine
+        regex_lexer = Lexer(input_str, engine='regex')
+        dfa_lexer = Lexer(input_str, engine='dfa')
+        regex_tok = regex_lexer.next_token()
+        dfa_tok = dfa_lexer.next_token()
+        while regex_tok is not None and dfa_tok is not None:
+            self.assertEqual(regex_tok.type, dfa_tok.type)
+            self.assertEqual(regex_tok.content, dfa_tok.content)
+            self.assertEqual(regex_tok.pos, dfa_tok.pos)
+            regex_tok = regex_lexer.next_token()
+            dfa_tok = dfa_lexer.next_token()
+        self.assertIsNone(regex_tok)
+        self.assertIsNone(dfa_tok)
+
+        # Test keyword followed by brackets and values ending on a word boundary
+        input_str = "for[] 1.x 12.3 0x1F 'a' x[]"
+        regex_stream = Lexer(input_str, engine='regex').tokenize_all()
+        dfa_stream = Lexer(input_str, engine='dfa').tokenize_all()
+        self.assertEqual(regex_stream.types, dfa_stream.types)
+        self.assertEqual(regex_stream.ends, dfa_stream.ends)
+
+        # Test unknown engine
+        with self.assertRaises(Exception):
+            Lexer(input_str, engine='unknown')
+
+    # Test keywords are resolved from scanned words
+    def test_lexer_keywords(self):
+        input_str = "public publicity _return returns for[] foreach in_ in".strip()
+        lexer = Lexer(input_str)
+
+        expected = [(Token.TokenType.PUBLIC, "public"), (Token.TokenType.IDENTIFIER, "publicity"),
+                    (Token.TokenType.IDENTIFIER, "_return"), (Token.TokenType.IDENTIFIER, "returns"),
+                    (Token.TokenType.FOR, "for"), (Token.TokenType.BRACKETS, "[]"),
+                    (Token.TokenType.FOREACH, "foreach"), (Token.TokenType.IDENTIFIER, "in_"),
+                    (Token.TokenType.IN, "in")]
+        for type, content in expected:
+            tok = lexer.next_token()
+            self.assertEqual(tok.type, type)
+            self.assertEqual(tok.content, content)
+        self.assertIsNone(lexer.next_token())
+
+    # Test lexing bytes-like sources
+    def test_lexer_bytes_source(self):
+        input_str = '''public class MyClass {
+                            u8[] a = 0x1F; // comment
+                            asm { "mov rax, 1" }
+                        }'''.strip()
+        expected = [(tok.type, tok.content, tok.pos) for tok in Lexer(input_str).tokenize_all()]
+
+        with tempfile.TemporaryFile() as file:
+            file.write(input_str.encode())
+            file.flush()
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+            for source in [input_str.encode(), memoryview(input_str.encode()), mapped]:
+                # Test tokens from next_token
+                lexer = Lexer(source)
+                tokens = []
+                tok = lexer.next_token()
+                while tok is not None:
+                    tokens.append((tok.type, tok.content, tok.pos))
+                    tok = lexer.next_token()
+                self.assertListEqual(tokens, expected)
+
+                # Test token stream
+                self.assertListEqual([(tok.type, tok.content, tok.pos) for tok in Lexer(source).tokenize_all()], expected)
+
+            # Test content is read lazily from the buffer
+            tok = Lexer(mapped).next_token()
+            self.assertIs(tok.source, mapped)
+            self.assertEqual(tok.content, "public")
+            mapped.close()
+
+    # Test tokens are slotted with lazily read, interned content
+    def test_lexer_token_content(self):
+        input_str = "u32 a = 5; u32 b = a;".strip()
+        lexer = Lexer(input_str)
+        toks = lexer.next_tokens(9)
+
+        # Test tokens only hold their span
+        self.assertFalse(hasattr(toks[0], '__dict__'))
+        self.assertEqual((toks[0].start, toks[0].end, toks[0].pos), (0, 3, 3))
+        self.assertEqual((toks[3].start, toks[3].end), (8, 9))
+
+        # Test repeated names share one string
+        self.assertEqual(toks[0].content, "u32")
+        self.assertIs(toks[0].content, toks[5].content)
+        self.assertIs(toks[1].content, toks[8].content)
+        self.assertEqual(toks[3].content, "5")
+
+    # Test relexing an edited range of a token stream
+    def test_lexer_relex(self):
+        input_str = '''public class MyClass {
+                            u8 a = 5; // comment
+                            void func f(i32 b) {
+                                asm { "
+                                    mov rax, 1
+                                " }
+                                a += b;
+                            }
+                        }'''.strip()
+        edits = [
+            (input_str.index('5'), 1, '0x1F'),  # Replace a value
+            (input_str.index('a +='), 1, 'total'),  # Rename an identifier
+            (input_str.index('// comment'), 0, '/* block */ '),  # Insert trivia
+            (input_str.index('void'), 0, 'u8 c;\n'),  # Insert a line
+            (input_str.index('mov'), 3, 'add'),  # Edit inside a multi-line quote
+            (input_str.index('= 5'), 0, '='),  # Merge into an EQ token
+            (input_str.index('u8 a'), len('u8 a = 5;'), ''),  # Delete a statement
+            (input_str.index('u8 a'), 0, '/* '),  # Open a block comment that is never closed
+        ]
+
+        for offset, removed, inserted in edits:
+            lexer = Lexer(input_str)
+            stream = lexer.tokenize_all()
+            relexed = lexer.relex(stream, offset, removed, inserted)
+
+            edited_str = input_str[:offset] + inserted + input_str[offset+removed:]
+            expected = Lexer(edited_str).tokenize_all()
+            self.assertEqual(relexed.text, edited_str)
+            self.assertEqual(lexer.text, edited_str)
+            self.assertEqual(relexed.types, expected.types)
+            self.assertEqual(relexed.starts, expected.starts)
+            self.assertEqual(relexed.ends, expected.ends)
+
+        # Test closing a block comment opened lines before the edit
+        lexer = Lexer(input_str.replace('u8 a', '/* u8 a'), keep_trivia=True)
+        stream = lexer.tokenize_all()
+        offset = stream.text.index('a +=')
+        stream = lexer.relex(stream, offset, 0, '*/ ')
+        expected = Lexer(stream.text, keep_trivia=True).tokenize_all()
+        self.assertEqual((stream.types, stream.starts), (expected.types, expected.starts))
+        self.assertEqual((stream.trivia.types, stream.trivia.starts), (expected.trivia.types, expected.trivia.starts))
+
+        # Test successive edits
+        lexer = Lexer(input_str)
+        stream = lexer.tokenize_all()
+        stream = lexer.relex(stream, 0, len('public'), 'sealed')
+        stream = lexer.relex(stream, len(stream.text), 0, ' // trailing\n')
+        self.assertEqual([t.content for t in stream][:2], ["sealed", "class"])
+        self.assertEqual(stream.types, Lexer(stream.text).tokenize_all().types)
+
+        # Test edits to bytes-like sources take bytes
+        with tempfile.TemporaryFile() as file:
+            file.write(input_str.encode())
+            file.flush()
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+            for source in [input_str.encode(), memoryview(input_str.encode()), mapped]:
+                lexer = Lexer(source, keep_trivia=True)
+                stream = lexer.tokenize_all()
+                offset = input_str.index('a +=')
+                relexed = lexer.relex(stream, offset, 1, b'total')
+                expected = Lexer(input_str[:offset] + 'total' + input_str[offset+1:], keep_trivia=True).tokenize_all()
+                self.assertEqual(relexed.text, (input_str[:offset] + 'total' + input_str[offset+1:]).encode())
+                self.assertEqual((relexed.types, relexed.starts, relexed.ends), (expected.types, expected.starts, expected.ends))
+                self.assertEqual((relexed.trivia.types, relexed.trivia.starts), (expected.trivia.types, expected.trivia.starts))
+                self.assertIn("total", [t.content for t in relexed])
+
+                with self.assertRaises(Exception):
+                    Lexer(source).relex(stream, offset, 1, 'total')
+            mapped.close()
+
+        with self.assertRaises(Exception):
+            Lexer(input_str).relex(Lexer(input_str).tokenize_all(), 0, 0, b'sealed ')
+
+    # Test reading a token stream through a cursor
+    def test_lexer_cursor(self):
+        input_str = " ".join(f"a{i} = {i};" for i in range(200)).strip()
+        expected = [(tok.type, tok.content, tok.pos) for tok in Lexer(input_str).tokenize_all()]
+
+        # Test the cursor reads the same tokens as the lexer across token blocks
+        cursor = Lexer(input_str).tokenize_all().cursor()
+        tokens = []
+        tok = cursor.next_token()
+        while tok is not None:
+            tokens.append((tok.type, tok.content, tok.pos))
+            tok = cursor.next_token()
+        self.assertListEqual(tokens, expected)
+        self.assertIsNone(cursor.peek_next())
+
+        # Test lookahead matches the lexer
+        cursor = TokenCursor(Lexer(input_str).tokenize_all())
+        lexer = Lexer(input_str)
+        for _ in range(150):
+            self.assertEqual([tok.content for tok in cursor.peek_tokens(3)], [tok.content for tok in lexer.peek_tokens(3)])
+            self.assertEqual(cursor.peek_code(1), TOKEN_CODES[lexer.peek_tokens(2)[1].type])
+            self.assertIs(cursor.peek_next(), cursor.peek_next())
+            cursor.pop_tokens(2)
+            lexer.pop_tokens(2)
+            self.assertEqual(cursor.next_token().content, lexer.next_token().content)
+
+        # Test end of stream
+        cursor = TokenCursor(Lexer("a;").tokenize_all())
+        self.assertEqual([tok.content if tok else None for tok in cursor.peek_tokens(3)], ["a", ";", None])
+        self.assertEqual([tok.content if tok else None for tok in cursor.next_tokens(3)], ["a", ";", None])
+        self.assertEqual(cursor.peek_code(), END_CODE)
+        self.assertEqual(list(cursor.codes[cursor.index:]), [END_CODE] * TokenCursor.LOOKAHEAD)
+        self.assertIsNone(cursor.next_token())
+
+        # Test popping past the end of the stream stays at the end
+        cursor = TokenCursor(Lexer("a;").tokenize_all())
+        cursor.pop_tokens(3)
+        cursor.pop_token()
+        self.assertEqual(cursor.index, 2)
+        self.assertEqual(cursor.last_end, 2)
+        self.assertIsNone(cursor.peek_next())
+        cursor.push_token(None)
+        self.assertEqual(cursor.next_token().content, ";")
+
+        # Test forks read from their own index and share the codes
+        fork = cursor.fork(0)
+        self.assertEqual(fork.next_token().content, "a")
+        self.assertEqual(cursor.index, 2)
+        self.assertIs(fork.codes, cursor.codes)
+
+    # Test offsets map to lines and columns
+    def test_lexer_line_index(self):
+        input_str = "public class A {\n\n    u8 a = 5;\n}"
+        for source in [input_str, input_str.encode()]:
+            lexer = Lexer(source)
+            self.assertEqual(list(lexer.line_index.starts), [0, 17, 18, 32])
+            self.assertEqual(len(lexer.line_index), 4)
+
+            toks = lexer.next_tokens(6)
+            self.assertEqual(lexer.line_col(toks[0].start), (1, 1))
+            self.assertEqual(lexer.line_col(toks[3].start), (1, 16))
+            self.assertEqual(lexer.line_col(toks[4].start), (3, 5))
+            self.assertEqual(lexer.line_col(toks[5].pos), (3, 9))
+            self.assertEqual(lexer.line_col(len(source)), (4, 2))
+            self.assertEqual(lexer.line_index.line_of(16), 1)
+            self.assertEqual(lexer.line_index.line_of(17), 2)
+
+        # Test the index is rebuilt after an edit
+        lexer = Lexer(input_str)
+        stream = lexer.tokenize_all()
+        self.assertEqual(len(lexer.line_index), 4)
+        lexer.relex(stream, 0, 0, "\n")
+        self.assertEqual(len(lexer.line_index), 5)
+        self.assertEqual(lexer.line_col(1), (2, 1))
+
+    # Test whitespace and comments are skipped and recorded as trivia
+    def test_lexer_trivia(self):
+        input_str = '''/* header
+                         * comment */
+                        u8 a = 5; /* a */ // b
+                        a = a /* c */ / 2;
+                        // end'''.strip()
+        lexer = Lexer(input_str, keep_trivia=True)
+        tokens = []
+        tok = lexer.next_token()
+        while tok is not None:
+            tokens.append(tok.content)
+            tok = lexer.next_token()
+        self.assertListEqual(tokens, ["u8", "a", "=", "5", ";", "a", "=", "a", "/", "2", ";"])
+
+        # Test trivia spans match the skipped text
+        comments = [t.content for t in lexer.trivia if t.type == Token.TokenType.COMMENT]
+        self.assertListEqual(comments, ["/* header\n                         * comment */", "/* a */", "// b\n", "/* c */", "// end"])
+        covered = sorted([(t.start, t.end) for t in lexer.trivia] + [(t.start, t.end) for t in Lexer(input_str).tokenize_all()])
+        self.assertEqual(covered[0][0], 0)
+        self.assertEqual(covered[-1][1], len(input_str))
+        for (_, end), (start, _) in zip(covered, covered[1:]): self.assertEqual(end, start)
+
+        # Test trivia is not recorded by default
+        lexer = Lexer(input_str)
+        self.assertEqual(lexer.next_tokens(2)[1].content, "a")
+        self.assertIsNone(lexer.trivia)
+        stream = lexer.tokenize_all()
+        self.assertIsNone(stream.trivia)
+        self.assertIsNone(lexer.relex(stream, 0, 0, "/* new */").trivia)
+
+        # Test long runs of trivia are skipped without recursing
+        input_str = "// comment\n\n" * 2000 + "/*" + " * \n" * 2000 + "*/ a"
+        for engine in ['regex', 'loop', 'dfa']:
+            lexer = Lexer(input_str, engine=engine, keep_trivia=True)
+            self.assertEqual(lexer.next_token().content, "a")
+            self.assertEqual(len(lexer.trivia), 4002)
+
+    # Test streaming tokens from a file read in chunks
+    def test_lexer_stream(self):
+        input_str = '''public class MyClass {
+                            u8[] a = 0x1F + 1.5 + 'c'; // comment
+                            for[] /* block */ x;
+                            asm { "
+                                mov rax, 1
+                            " } /* multi
+                                   line */ x / y;
+                        }'''.strip()
+        expected = [(tok.type, tok.content, tok.start, tok.end) for tok in Lexer(input_str).tokenize_all()]
+
+        # Test chunk sizes that split tokens, quotes, and comments
+        for chunk_size in [1, 2, 3, 7, 16, 1024]:
+            tokens = [(tok.type, tok.content, tok.start, tok.end) for tok in Lexer.stream(io.StringIO(input_str), chunk_size)]
+            self.assertListEqual(tokens, expected)
+            tokens = [(tok.type, tok.content, tok.start, tok.end) for tok in Lexer.stream(io.BytesIO(input_str.encode()), chunk_size)]
+            self.assertListEqual(tokens, expected)
+
+        # Test tokens are yielded lazily
+        tokens = Lexer.stream(io.StringIO(input_str), 4)
+        self.assertEqual(next(tokens).content, "public")
+        self.assertEqual(next(tokens).content, "class")
+
+        # Test empty file and unterminated quote
+        self.assertListEqual(list(Lexer.stream(io.StringIO(""))), [])
+        with self.assertRaises(Exception):
+            list(Lexer.stream(io.StringIO('asm { "mov rax, 1'), 4))
+
+    # Test bulk tokenizing into a token stream
+    def test_lexer_tokenize_all(self):
+        input_str = '''public class MyClass {
+                            u8 a = 5; // comment
+                            void func f(i32 b) { a += b; }
+                        }'''.strip()
+        stream = Lexer(input_str, keep_trivia=True).tokenize_all()
+        self.assertEqual(stream.types.typecode, 'B')
+        self.assertEqual(stream.starts.typecode, 'I')
+        self.assertEqual(stream.ends.typecode, 'I')
+
+        # Test stream matches tokens from next_token
+        lexer = Lexer(input_str)
+        tok = lexer.next_token()
+        i = 0
+        while tok is not None:
+            self.assertEqual(stream.type_of(i), tok.type)
+            self.assertEqual(stream.content_of(i), tok.content)
+            self.assertEqual(stream[i].pos, tok.pos)
+            tok = lexer.next_token()
+            i += 1
+        self.assertEqual(len(stream), i)
+        self.assertEqual([t.content for t in stream][:3], ["public", "class", "MyClass"])
+
+        # Test skipped trivia is kept alongside the stream
+        self.assertEqual(stream.trivia[0].type, Token.TokenType.WS)
+        self.assertIn("// comment\n", [t.content for t in stream.trivia])
+
+        # Test invalid content
+        with self.assertRaises(Exception):
+            Lexer("u8 a = 5 $").tokenize_all()
+
 class TestLexerTokens(unittest.TestCase):
 
     # Test class modifier tokens
@@ -332,6 +724,26 @@ class TestLexerTokens(unittest.TestCase):
         self.assertEqual(tok.type, Token.TokenType.VAL)
         self.assertEqual(tok.content, "123.456789")
 
+    # Test value tokens are decoded to a number and primitive type
+    def test_tokens_values_decoded(self):
+        input_str = "5 255 256 70000 0x1F 0xFFFFFFFF 0o17 0b101 1.5 .25 'a' '\\n' 5000000000".strip()
+        lexer = Lexer(input_str)
+
+        expected = [(5, 'u8'), (255, 'u8'), (256, 'u16'), (70000, 'u32'), (31, 'u8'), (0xFFFFFFFF, 'u32'),
+                    (15, 'u8'), (5, 'u8'), (1.5, 'f32'), (0.25, 'f32'), (97, 'char'), (10, 'char'), (5000000000, 'u64')]
+        for literal in expected:
+            tok = lexer.next_token()
+            self.assertEqual(tok.type, Token.TokenType.VAL)
+            self.assertEqual(tok.literal, literal)
+
+        # Test literals written with a decimal point are floats even when whole (typed u8 before literals were decoded)
+        for val, literal in [("1.0", (1.0, 'f32')), ("0.0", (0.0, 'f32')), ("300.0", (300.0, 'f32'))]:
+            self.assertEqual(Lexer(val).next_token().literal, literal)
+            self.assertEqual(type(Lexer(val).next_token().literal[0]), float)
+
+        # Test non-value tokens have no literal
+        self.assertIsNone(Lexer("a").next_token().literal)
+
     # Test bad value tokens
     def test_tokens_values_bad(self):
         # Non hex/octal/binary/dec
@@ -865,4 +1277,12 @@ class TestLexerTokens(unittest.TestCase):
         # Test BIT_RSHIFT token
         tok = lexer.next_token()
         self.assertEqual(tok.type, Token.TokenType.BIT_RSHIFT)
-        self.assertEqual(tok.content, ">>")
\ No newline at end of file
+        self.assertEqual(tok.content, ">>")
+
+class TestLexerTokensDFA(TestLexerTokens):
+
+    # Rerun every token test with the DFA engine
+    def setUp(self):
+        patcher = mock.patch(f'{__name__}.Lexer', functools.partial(Lexer, engine='dfa'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
@@ -6,7 +6,7 @@ import unittest
 
 if __name__ == '__main__':
     # Test cases
-    test_cases = [TestLexerOperation, TestLexerTokens, TestParser]
+    test_cases = [TestLexerOperation, TestLexerTokens, TestLexerTokensDFA, TestParser, TestParserCursor]
 
     with open('tests/test_results.log', 'w') as log_file:
         # Run the tests
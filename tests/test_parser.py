@@ -1,6 +1,11 @@
 import unittest
-from py_compiler.lexer import Lexer
+from unittest import mock
+import py_compiler.lexer as lexing
+from py_compiler.lexer import Lexer, Token, TokenCursor
 from py_compiler.parser import Parser
+from py_compiler.grammar import Grammar
+from py_compiler.table_parser import TableParser, grammar
+from py_compiler.parser_error_util import Diagnostic, ParseError
 from py_compiler.core_elements import *
 
 class TestParser(unittest.TestCase):
@@ -16,7 +21,7 @@ class TestParser(unittest.TestCase):
         c = parser.parse_class()
         self.assertEqual(c, Class(["public", "abstract"], "MyClass", ["T"], "ParentClass", ClassBody(
             [
-                Variable(["mut"], "u8", [], "a", -1, Expression([Value("5")])),
+                Variable(["mut"], "u8", [], "a", -1, operation_tree([Value("5")])),
                 Variable([], "f64", [], "z", -1)
             ],
             [Constructor([], [Parameter("i32", None, "b")], Body([]))],
@@ -24,6 +29,39 @@ class TestParser(unittest.TestCase):
             []
         )))
 
+    # Test class interface collection
+    def test_parse_class_interface(self):
+        source = '''public class MyClass<T> extends ParentClass {
+                        mut u8 a = 5;
+                        static f64 z;
+                        T t;
+                        constructor(i32 b) { a = b; }
+                        void func somefunction(u8 c) { while (a < c) { a += 1; } }
+                        i32 func broken() { a = ; }
+                    }'''
+        interface = Parser(Lexer(source), suppress_err=True).parse_class_interface()
+        self.assertEqual(interface, ClassInterface(["public"], "MyClass", ["T"], "ParentClass",
+            [
+                Variable(["mut"], "u8", [], "a", -1, operation_tree([Value("5")])),
+                Variable(["static"], "f64", [], "z", -1),
+                Variable([], "T", [], "t", -1)
+            ],
+            [Constructor([], [Parameter("i32", None, "b")], None)],
+            [
+                Function([], "somefunction", "void", [Parameter("u8", None, "c")], None),
+                Function([], "broken", "i32", [], None)
+            ],
+            []
+        ))
+        self.assertEqual(interface.get_size(), 8 + 1 + 8)
+        self.assertEqual(interface.find_member_var("t").type, "T")
+        self.assertEqual(len(interface.find_functions("somefunction")), 1)
+
+        # Same summary as the interface of a full parse
+        source = source.replace("a = ;", "return a;")
+        self.assertEqual(Parser(Lexer(source), suppress_err=True).parse_class_interface(),
+                         Parser(Lexer(source), suppress_err=True).parse_class().interface())
+
     # Test modifier collection
     def test_parse_modifiers(self): 
         parser = Parser(Lexer("public static sealed abstract mut"), suppress_err=True)
@@ -42,7 +80,7 @@ class TestParser(unittest.TestCase):
         c = parser.parse_class_declaration()
         self.assertEqual(c, Class(None, "MyClass", None, None, ClassBody(
             [
-                Variable(["mut"], "u8", [], "a", -1, Expression([Value("5")])),
+                Variable(["mut"], "u8", [], "a", -1, operation_tree([Value("5")])),
                 Variable([], "f64", [], "z", -1)
             ],
             [Constructor([], [Parameter("i32", None, "b")], Body([]))],
@@ -60,7 +98,7 @@ class TestParser(unittest.TestCase):
         c = parser.parse_class_declaration()
         self.assertEqual(c, Class(None, "MyClass", ["T"], None, ClassBody(
             [
-                Variable(["mut"], "u8", [], "a", -1, Expression([Value("5")])),
+                Variable(["mut"], "u8", [], "a", -1, operation_tree([Value("5")])),
                 Variable([], "f64", [], "z", -1)
             ],
             [Constructor([], [Parameter("i32", None, "b")], Body([]))],
@@ -78,7 +116,7 @@ class TestParser(unittest.TestCase):
         c = parser.parse_class_declaration()
         self.assertEqual(c, Class(None, "MyClass", None, "ParentClass", ClassBody(
             [
-                Variable(["mut"], "u8", [], "a", -1, Expression([Value("5")])),
+                Variable(["mut"], "u8", [], "a", -1, operation_tree([Value("5")])),
                 Variable([], "f64", [], "z", -1)
             ],
             [Constructor([], [Parameter("i32", None, "b")], Body([]))],
@@ -96,7 +134,7 @@ class TestParser(unittest.TestCase):
         c = parser.parse_class_declaration()
         self.assertEqual(c, Class(None, "MyClass", ["T"], "ParentClass", ClassBody(
             [
-                Variable(["mut"], "u8", [], "a", -1, Expression([Value("5")])),
+                Variable(["mut"], "u8", [], "a", -1, operation_tree([Value("5")])),
                 Variable([], "f64", [], "z", -1)
             ],
             [Constructor([], [Parameter("i32", None, "b")], Body([]))],
@@ -170,7 +208,7 @@ class TestParser(unittest.TestCase):
         
         self.assertEqual(class_body, ClassBody(
             [
-                Variable(["mut"], "u8", [], "a", -1, Expression([Value("5")])),
+                Variable(["mut"], "u8", [], "a", -1, operation_tree([Value("5")])),
                 Variable([], "f64", [], "z", -1)
             ],
             [Constructor([], [Parameter("i32", None, "b")], Body([]))],
@@ -178,6 +216,16 @@ class TestParser(unittest.TestCase):
             []
         ))
 
+        # Test a large class body keeps members in source order without recursing per member
+        members = ''.join(f"u32 v{i} = {i};\nvoid func f{i}() {{}}\n" for i in range(25000))
+        parser = Parser(Lexer(members + "}"), suppress_err=True)
+        class_body = parser.parse_class_body()
+        self.assertEqual(len(class_body.member_vars), 25000)
+        self.assertEqual(len(class_body.functions), 25000)
+        self.assertEqual([var.name for var in class_body.member_vars[:3]], ["v0", "v1", "v2"])
+        self.assertEqual(class_body.member_vars[-1], Variable([], "u32", [], "v24999", -1, operation_tree([Value("24999")])))
+        self.assertEqual(class_body.functions[-1].name, "f24999")
+
     # Test constructor collection
     def test_parse_constructor(self):
         # Try without params
@@ -188,7 +236,7 @@ class TestParser(unittest.TestCase):
             None, [], Body([Statement(VariableUpdate(
                     MemberAccess([VariableAccess("a", -1)]),
                     VariableSetOperation.SET_ADD,
-                    Expression([Value("1")]),
+                    operation_tree([Value("1")]),
                     -1
             ))])
         ))
@@ -202,7 +250,7 @@ class TestParser(unittest.TestCase):
             Body([Statement(VariableUpdate(
                     MemberAccess([VariableAccess("a", -1)]),
                     VariableSetOperation.SET_ADD,
-                    Expression([Value("1")]),
+                    operation_tree([Value("1")]),
                     -1
             ))])
         ))
@@ -218,7 +266,7 @@ class TestParser(unittest.TestCase):
             Body([Statement(VariableUpdate(
                     MemberAccess([VariableAccess("a", -1)]),
                     VariableSetOperation.SET_ADD,
-                    Expression([Value("1")]),
+                    operation_tree([Value("1")]),
                     -1
             ))])
         ))
@@ -229,9 +277,208 @@ class TestParser(unittest.TestCase):
 
         self.assertEqual(func, Function(
             None, "operator_ADD", "u8", [Parameter("u8", None, "a")],
-            Body([Statement(Return(Expression([MemberAccess([VariableAccess("a", -1)])])))])
+            Body([Statement(Return(operation_tree([MemberAccess([VariableAccess("a", -1)])])))])
         ))
 
+    # Test deferred function and constructor bodies
+    def test_parse_deferred_bodies(self):
+        source = '''public class MyClass {
+                        constructor(i32 b) { if (b > 0) { a = b; } }
+                        void func somefunction() { while (a < 5) { a += 1; } }
+                        void func empty() {}
+                    }'''
+        c = Parser(Lexer(source), suppress_err=True, defer_bodies=True).parse_class()
+        self.assertFalse(c.body.constructors[0].is_body_parsed())
+        self.assertFalse(c.body.functions[0].is_body_parsed())
+
+        # Bodies are parsed the first time they are used and match a full parse
+        self.assertEqual(c, Parser(Lexer(source), suppress_err=True).parse_class())
+        self.assertTrue(c.body.constructors[0].is_body_parsed())
+        self.assertTrue(all(f.is_body_parsed() for f in c.body.functions))
+
+        # Errors inside a body only surface when it is parsed
+        c = Parser(Lexer("class MyClass { void func broken() { a = ; } i32 x; }"), suppress_err=True, defer_bodies=True).parse_class()
+        self.assertEqual(len(c.body.member_vars), 1)
+        with self.assertRaises(Exception):
+            c.body.functions[0].body
+
+        # Unbalanced braces are still caught while skipping
+        with self.assertRaises(Exception):
+            Parser(Lexer("void func f() { if (a) { a = 1; }"), suppress_err=True, defer_bodies=True).parse_function_declaration()
+
+    # Test reparsing an edited class, reusing unchanged members
+    def test_parse_incremental(self):
+        # Builds its own cursors, so it uses the real Lexer when the TestParserCursor patch is active
+        source = '''public class MyClass {
+                        u8 a = 5;
+                        constructor(i32 b) { a = b; }
+                        void func first() { a += 1; }
+                        void func second() { if (a > 1) { a -= 1; } }
+                        u8 func third();
+                    }'''
+        edits = [
+            (source.index('a += 1'), 6, 'a += 10'),  # Edit inside a function
+            (source.index('u8 a'), 0, 'i32 c;\n'),  # Insert a member, moving the rest
+            (source.index('u8 a = 5;'), 9, ''),  # Delete a member
+            (source.index('a -= 1'), 0, 'while (a > 0) { a--; } '),  # Add nested braces
+        ]
+        for offset, removed, inserted in edits:
+            lexer = lexing.Lexer(source)
+            parser = Parser(lexer.tokenize_all().cursor(), suppress_err=True, incremental=True)
+            old = parser.parse_class()
+            members = old.body.member_vars + old.body.constructors + old.body.functions
+
+            edited = source[:offset] + inserted + source[offset+removed:]
+            stream = lexer.relex(parser.lexer.stream, offset, removed, inserted)
+            klass = parser.reparse_class(stream.cursor())
+            expected = Parser(lexing.Lexer(edited).tokenize_all().cursor(), suppress_err=True).parse_class()
+            self.assertEqual(klass, expected)
+
+            # Every member the edit didn't touch is the same object, moved to its new position
+            reused = [m for m in klass.body.member_vars + klass.body.constructors + klass.body.functions
+                      if any(m is old_member for old_member in members)]
+            self.assertEqual(len(reused), parser.reused)
+            self.assertGreaterEqual(parser.reused, 3)
+            self.assertEqual([v.pos for v in klass.body.member_vars], [v.pos for v in expected.body.member_vars])
+            self.assertEqual([s.statement.pos for f in klass.body.functions if f.body for s in f.body.statements if type(s.statement) is VariableUpdate],
+                             [s.statement.pos for f in expected.body.functions if f.body for s in f.body.statements if type(s.statement) is VariableUpdate])
+
+            # Reused members keep spans, moved like their positions
+            spans = SpanTable()
+            parser = Parser(lexing.Lexer(source).tokenize_all().cursor(), suppress_err=True, incremental=True, spans=spans)
+            parser.parse_class()
+            klass = parser.reparse_class(lexing.Lexer(edited).tokenize_all().cursor())
+            expected_spans = SpanTable()
+            expected = Parser(lexing.Lexer(edited).tokenize_all().cursor(), suppress_err=True, spans=expected_spans).parse_class()
+            members = klass.body.member_vars + klass.body.constructors + klass.body.functions
+            expected_members = expected.body.member_vars + expected.body.constructors + expected.body.functions
+            self.assertListEqual([parser.spans.span(m) for m in members], [expected_spans.span(m) for m in expected_members])
+            self.assertEqual(len(parser.spans), len(expected_spans))
+
+        # Reparsing again reuses every member of the unchanged source
+        parser = Parser(lexing.Lexer(source).tokenize_all().cursor(), suppress_err=True, incremental=True)
+        parser.parse_class()
+        parser.reparse_class(lexing.Lexer(source).tokenize_all().cursor())
+        self.assertEqual(parser.reused, 5)
+
+    # Test collecting every error in one pass
+    def test_parse_recover(self):
+        source = '''public class MyClass {
+                        u8 a = 5
+                        u8 b;
+                        void func f(u8) { a = 1; }
+                        void func g() {
+                            a = ;
+                            if (a == ) { a = 2; } else { a = 3; }
+                            b = 4;
+                        }
+                        + ;
+                        constructor() { a = 1 }
+                        i32 c;
+                    }'''
+        parser = Parser(Lexer(source), suppress_err=True, recover=True)
+        c = parser.parse_class()
+        self.assertListEqual(parser.diagnostics, [
+            Diagnostic("Expected semicolon ';' to follow variable declaration", source.index('u8 b'), [Token.TokenType.SEMICOLON]),
+            Diagnostic("Expected parameter name ...", source.index(') { a = 1; }'), [Token.TokenType.IDENTIFIER]),
+            Diagnostic("Expected variable, function call, or constructor call, not ;", source.index('a = ;') + 4,
+                       [Token.TokenType.IDENTIFIER, Token.TokenType.NEW]),
+            Diagnostic("Expected variable, function call, or constructor call, not )", source.index('== )') + 3,
+                       [Token.TokenType.IDENTIFIER, Token.TokenType.NEW]),
+            Diagnostic("Expected member in class body ...", source.index('+ ;'), []),
+            Diagnostic("Variable update missing semicolon ';'", source.index('}\n                        i32'), [Token.TokenType.SEMICOLON]),
+        ])
+
+        # Everything around the errors is still parsed
+        self.assertEqual(c, Class(["public"], "MyClass", None, None, ClassBody(
+            [Variable([], "i32", [], "c", -1)],
+            [Constructor([], [], Body([]))],
+            [Function([], "g", "void", [], Body([Statement(VariableUpdate(
+                MemberAccess([VariableAccess("b", -1)]), VariableSetOperation.SET, operation_tree([Value("4")]), -1))]))],
+            []
+        )))
+
+        # Reaching the end of the file is reported once
+        source = "class MyClass { void func f() { if (a > 1) { a = 1;"
+        parser = Parser(Lexer(source), suppress_err=True, recover=True)
+        self.assertEqual(len(parser.parse_class().body.functions), 0)
+        self.assertListEqual(parser.diagnostics, [Diagnostic("Reached end of program unexpectedly ...", len(source), [])])
+
+        # Files cut off at the end of the input are reported rather than crashing
+        for source, message in [
+            ("class A { void func f() { mut", "Reached unexpected end of file ..."),
+            ("class A { void func f() { a", "Unexpected end of file ..."),
+            ("class A { T func operator", "Operator overloading requires real operation, reached unexpected end of input"),
+            ("class A { u32 x = a *", "Expression missing operand after operator, reached unexpected end of file ..."),
+            ("class A { void func f() { u32 x = a *", "Expression missing operand after operator, reached unexpected end of file ..."),
+        ]:
+            parser = Parser(Lexer(source), suppress_err=True, recover=True)
+            parser.parse_class()
+            self.assertListEqual(parser.diagnostics, [Diagnostic(message, len(source), [])])
+
+        # Without recover the first error is raised
+        with self.assertRaises(ParseError) as context:
+            Parser(Lexer("class MyClass { u8 a = 5 u8 b; }"), suppress_err=True).parse_class()
+        self.assertEqual(context.exception.diagnostic, Diagnostic("Expected semicolon ';' to follow variable declaration", 25, [Token.TokenType.SEMICOLON]))
+
+    # Test recording the source span of every node
+    def test_parse_spans(self):
+        source = '''public class MyClass<T> extends Parent {
+                        static mut u8 a = 5 + 3 * (b - 1);
+                        constructor(i32 b, T c) { a = b; }
+                        public u8 func f(u8 x) {
+                            if (a > 1 && x < 3) { a -= 1; } else if (a == 0) { a = 2; } else { a++; }
+                            while (a < 10) { a += foo(1, 2).bar; }
+                            for (i32 i = 0; i < 10; i++) { break; }
+                            foreach (u8 v in list) { v = new Thing(v); }
+                            switch (a) { case 1: a = 2; break; case 2: return a; default: a = 0; }
+                            asm { "mov rax, 1" }
+                            return a;
+                        }
+                    }'''
+
+        def nodes(node) -> list:
+            found, stack = [], [node]
+            while stack:
+                node = stack.pop()
+                if type(node) is list: stack.extend(node)
+                elif hasattr(node, '__dict__') and not isinstance(node, Enum):
+                    found.append(node)
+                    stack.extend(vars(node).values())
+            return found
+
+        spans = SpanTable()
+        c = Parser(Lexer(source), suppress_err=True, spans=spans).parse_class()
+        self.assertTrue(all(node in spans for node in nodes(c)))
+        self.assertEqual(spans.span(c), (0, source.rindex('}', 0, -1)+1))  # The class close brace is left to the caller
+
+        def text(node) -> str:
+            start, end = spans.span(node)
+            return source[start:end]
+
+        func: Function = c.body.functions[0]
+        self.assertEqual(text(c.body.member_vars[0]), "static mut u8 a = 5 + 3 * (b - 1);")
+        self.assertEqual(text(c.body.member_vars[0].val), "5 + 3 * (b - 1)")
+        self.assertEqual(text(c.body.constructors[0].params[1]), "T c")
+        self.assertEqual(text(func), source[source.index('public u8'):source.rindex('}', 0, -1)+1])
+        self.assertEqual([text(s) for s in func.body.statements[:2]], ["if (a > 1 && x < 3) { a -= 1; } else if (a == 0) { a = 2; } else { a++; }",
+                                                                      "while (a < 10) { a += foo(1, 2).bar; }"])
+        self.assertEqual(text(func.body.statements[0].statement.elseifs[0].conditions), "a == 0")
+        self.assertEqual([text(case) for case in func.body.statements[4].statement.cases], ["case 1: a = 2; break;", "case 2: return a;", "default: a = 0;"])
+        self.assertEqual(text(func.body.statements[6].statement), "return a;")
+
+        # Token spans come from the token starts of a stream of the same source
+        stream = lexing.Lexer(source).tokenize_all()
+        first, last = spans.token_span(func.body.statements[1], stream.starts)
+        self.assertEqual([stream.cursor().token(i).content for i in (first, last-1)], ["while", "}"])
+
+        # Operation trees
+        spans = SpanTable()
+        source = "~(1 + a) * ~~b - 3;"
+        tree = Parser(Lexer(source), suppress_err=True, spans=spans).parse_operation_tree()
+        self.assertEqual([source.__getitem__(slice(*spans.span(node))) for node in (tree, tree.left, tree.left.left, tree.left.right, tree.left.right.operand)],
+                         ["~(1 + a) * ~~b - 3", "~(1 + a) * ~~b", "~(1 + a)", "~~b", "~b"])
+
     # Test variable declaration collection
     def test_parse_variable_declaration(self):
         # Try declaration, no initialization
@@ -248,7 +495,7 @@ class TestParser(unittest.TestCase):
         parser = Parser(Lexer("i32 x = a + b;"), suppress_err=True)
         var_declr = parser.parse_variable_declaration()
         self.assertEqual(var_declr, Variable([], "i32", [], "x", -1, 
-            Expression([
+            operation_tree([
                 MemberAccess([VariableAccess("a",-1)]),
                 MemberAccess([VariableAccess("b",-1)])
             ], [Operation.ADD])
@@ -257,7 +504,28 @@ class TestParser(unittest.TestCase):
         # Try declaration w/ typedef, initialized
         parser = Parser(Lexer("valwrapper<f64> x = 1.123;"), suppress_err=True)
         var_declr = parser.parse_variable_declaration()
-        self.assertEqual(var_declr, Variable([], "valwrapper", ["f64"], "x", -1, Expression([Value("1.123")])))
+        self.assertEqual(var_declr, Variable([], "valwrapper", ["f64"], "x", -1, operation_tree([Value("1.123")])))
+
+        # Try declaration initialized with a bitwise not
+        parser = Parser(Lexer("u8 x = ~a & 3;"), suppress_err=True)
+        var_declr = parser.parse_variable_declaration()
+        self.assertEqual(var_declr.val, BinaryOperation(UnaryOperation(Operation.BIT_NOT, MemberAccess([VariableAccess("a",-1)])), Operation.BIT_AND, Value("3")))
+
+    # Test node positions map to lines and columns
+    def test_parse_line_col(self):
+        lexer = Lexer("i32 x;\nx += y;\n  z++;")
+        parser = Parser(lexer, suppress_err=True)
+        var_declr = parser.parse_variable_declaration()
+        parser.lexer.pop_token()
+        update = parser.parse_variable_update()
+        parser.lexer.pop_token()
+        inc = parser.parse_variable_update()
+
+        # Positions are the end of the name
+        self.assertEqual(var_declr.line_col(lexer.line_index), (1, 6))
+        self.assertEqual(update.line_col(lexer.line_index), (2, 2))
+        self.assertEqual(update.val.accesses[0].line_col(lexer.line_index), (2, 7))
+        self.assertEqual(inc.line_col(lexer.line_index), (3, 4))
 
     # Test arguments
     def test_parse_arguments(self):
@@ -265,10 +533,10 @@ class TestParser(unittest.TestCase):
         args = parser.parse_args()
 
         self.assertListEqual(args, [
-            Expression([MemberAccess([VariableAccess("val1", -1)])], []),
-            Expression([Value("132")], []),
-            Expression([MemberAccess([FunctionCall("somefunction", [])])], []),
-            Expression([MemberAccess([ConstructorCall("SomeClass", None, [])])], [])
+            operation_tree([MemberAccess([VariableAccess("val1", -1)])], []),
+            operation_tree([Value("132")], []),
+            operation_tree([MemberAccess([FunctionCall("somefunction", [])])], []),
+            operation_tree([MemberAccess([ConstructorCall("SomeClass", None, [])])], [])
         ])
 
     # Test expression collection
@@ -276,17 +544,17 @@ class TestParser(unittest.TestCase):
         # Test nested expressions
         parser = Parser(Lexer("(5 * a) - b / 7 % (d + ((e + 10) / f));"), suppress_err=True)
         expr = parser.parse_expression()
-        self.assertEqual(expr, Expression([
-            Expression([
+        self.assertEqual(expr, operation_tree([
+            operation_tree([
                 Value("5"),
                 MemberAccess([VariableAccess("a", -1)])
             ], [Operation.MULT]),
             MemberAccess([VariableAccess("b", -1)]),
             Value("7"),
-            Expression([
+            operation_tree([
                 MemberAccess([VariableAccess("d", -1)]),
-                Expression([
-                    Expression([
+                operation_tree([
+                    operation_tree([
                         MemberAccess([VariableAccess("e", -1)]),
                         Value("10")
                     ], [Operation.ADD]),
@@ -298,13 +566,71 @@ class TestParser(unittest.TestCase):
         # Test all operations
         parser = Parser(Lexer("1 + 2 - 3 * 4 / 5 % 6 & 7 | 8 ^ 9 << 10 >> 11;"), suppress_err=True)
         expr = parser.parse_expression()
-        self.assertEqual(expr, Expression([
+        self.assertEqual(expr, operation_tree([
                 Value("1"), Value("2"), Value("3"), Value("4"), Value("5"), Value("6"),
                 Value("7"), Value("8"), Value("9"), Value("10"), Value("11")
             ], [Operation.ADD, Operation.SUB, Operation.MULT, Operation.DIV, Operation.MOD, 
                 Operation.BIT_AND, Operation.BIT_OR, Operation.BIT_XOR, Operation.BIT_LSHIFT, Operation.BIT_RSHIFT])
         )
 
+        # Test values keep the literal decoded by the lexer
+        parser = Parser(Lexer("300 + 0xFF - 2.5 * 'a';"), suppress_err=True)
+        expr = parser.parse_expression()
+        self.assertEqual([(val.num, val.type) for val in operation_tree_RPN(expr) if type(val) is Value], [(300, 'u16'), (255, 'u8'), (2.5, 'f32'), (97, 'char')])
+
+    # Test operator trees
+    def test_parse_operation_tree(self):
+        a = MemberAccess([VariableAccess("a", -1)])
+        b = MemberAccess([VariableAccess("b", -1)])
+
+        # Test precedence and left grouping of equal precedence
+        parser = Parser(Lexer("1 + 2 * 3 - a % 4 - b;"), suppress_err=True)
+        tree = parser.parse_operation_tree()
+        self.assertEqual(tree, BinaryOperation(
+            BinaryOperation(
+                BinaryOperation(Value("1"), Operation.ADD, BinaryOperation(Value("2"), Operation.MULT, Value("3"))),
+                Operation.SUB,
+                BinaryOperation(a, Operation.MOD, Value("4"))),
+            Operation.SUB,
+            b))
+        self.assertEqual(str(tree), "(((1 + (2 * 3)) - (a % 4)) - b)")
+        self.assertEqual([str(item) for item in tree.generate_RPN()], ["1", "2", "3", "*", "+", "a", "4", "%", "-", "b", "-"])
+        self.assertEqual(parser.lexer.next_token().content, ";")
+
+        # Test parentheses and bitwise operators
+        parser = Parser(Lexer("(a | 1) & b << 2 ^ 3;"), suppress_err=True)
+        self.assertEqual(parser.parse_operation_tree(), BinaryOperation(
+            BinaryOperation(BinaryOperation(a, Operation.BIT_OR, Value("1")), Operation.BIT_AND, BinaryOperation(b, Operation.BIT_LSHIFT, Value("2"))),
+            Operation.BIT_XOR,
+            Value("3")))
+
+        # Test unary BIT_NOT
+        parser = Parser(Lexer("~a + ~~(b - 1);"), suppress_err=True)
+        tree = parser.parse_operation_tree()
+        self.assertEqual(tree, BinaryOperation(
+            UnaryOperation(Operation.BIT_NOT, a),
+            Operation.ADD,
+            UnaryOperation(Operation.BIT_NOT, UnaryOperation(Operation.BIT_NOT, BinaryOperation(b, Operation.SUB, Value("1"))))))
+        self.assertEqual(str(tree), "(~a + ~~(b - 1))")
+        self.assertEqual([str(item) for item in tree.generate_RPN()], ["a", "~", "b", "1", "-", "~", "~", "+"])
+
+        # Test constant trees are folded
+        self.assertEqual(Parser(Lexer("1 - 2 - 3;")).parse_operation_tree().evaluate(), "-4")
+        self.assertEqual(Parser(Lexer("(0x10 | 1) << 2 ^ ~0;")).parse_operation_tree().evaluate(), str((0x10 | 1) << 2 ^ ~0))
+        self.assertEqual(Parser(Lexer("(0 - 7) / 2 + (0 - 7) % 2;")).parse_operation_tree().evaluate(), "-4")
+        self.assertEqual(Parser(Lexer("1.5 * 2;")).parse_operation_tree().evaluate(), "3.0")
+        self.assertEqual(Parser(Lexer("a + 1;")).parse_operation_tree().evaluate(), "(a + 1)")
+
+        # Test long chains do not recurse per operator
+        tree = Parser(Lexer(" + ".join(["1"] * 5000) + ";")).parse_operation_tree()
+        self.assertEqual(len(tree.generate_RPN()), 9999)
+        self.assertEqual(tree.evaluate(), "5000")
+
+        # Test incomplete trees
+        for input_str in ["1 +", "(1 + 2;", "~"]:
+            with self.assertRaises(Exception):
+                Parser(Lexer(input_str), suppress_err=True).parse_operation_tree()
+
     # Test member access
     def test_parse_member_access(self):
         # Test variable access
@@ -315,20 +641,20 @@ class TestParser(unittest.TestCase):
         # Test function call
         parser = Parser(Lexer("somefunction(val1);"), suppress_err=True)
         member_access = parser.parse_member_access()
-        self.assertEqual(member_access, MemberAccess([FunctionCall("somefunction", [Expression([MemberAccess([VariableAccess("val1", -1)])])])]))
+        self.assertEqual(member_access, MemberAccess([FunctionCall("somefunction", [operation_tree([MemberAccess([VariableAccess("val1", -1)])])])]))
 
         # Test constructor call
         parser = Parser(Lexer("new SomeClass(val1);"), suppress_err=True)
         member_access = parser.parse_member_access()
-        self.assertEqual(member_access, MemberAccess([ConstructorCall("SomeClass", None, [Expression([MemberAccess([VariableAccess("val1", -1)])])])]))
+        self.assertEqual(member_access, MemberAccess([ConstructorCall("SomeClass", None, [operation_tree([MemberAccess([VariableAccess("val1", -1)])])])]))
 
         # Test chained accesses
         parser = Parser(Lexer("val1.somefunction(val2).new SomeClass(val3).val4;"), suppress_err=True)
         member_access = parser.parse_member_access()
         self.assertEqual(member_access, MemberAccess([
             VariableAccess("val1", -1),
-            FunctionCall("somefunction", [Expression([MemberAccess([VariableAccess("val2", -1)])])]),
-            ConstructorCall("SomeClass", None, [Expression([MemberAccess([VariableAccess("val3", -1)])])]),
+            FunctionCall("somefunction", [operation_tree([MemberAccess([VariableAccess("val2", -1)])])]),
+            ConstructorCall("SomeClass", None, [operation_tree([MemberAccess([VariableAccess("val3", -1)])])]),
             VariableAccess("val4", -1)
         ]))
 
@@ -336,13 +662,13 @@ class TestParser(unittest.TestCase):
     def test_parse_constructor_call(self):
         parser = Parser(Lexer("new SomeClass(1, val1)"), suppress_err=True)
         constructor_call = parser.parse_constructor_call()
-        self.assertEqual(constructor_call, ConstructorCall("SomeClass", None, [Expression([Value("1")]), Expression([MemberAccess([VariableAccess("val1", -1)])])]))
+        self.assertEqual(constructor_call, ConstructorCall("SomeClass", None, [operation_tree([Value("1")]), operation_tree([MemberAccess([VariableAccess("val1", -1)])])]))
 
     # Test function call
     def test_parse_function_call(self):
         parser = Parser(Lexer("somefunction(1, val1)"), suppress_err=True)
         function_call = parser.parse_function_call()
-        self.assertEqual(function_call, FunctionCall("somefunction", [Expression([Value("1")]), Expression([MemberAccess([VariableAccess("val1", -1)])])]))
+        self.assertEqual(function_call, FunctionCall("somefunction", [operation_tree([Value("1")]), operation_tree([MemberAccess([VariableAccess("val1", -1)])])]))
 
     # Test body collection
     def test_parse_body(self):
@@ -374,15 +700,15 @@ class TestParser(unittest.TestCase):
             Statement(If(
                 False,
                 Conditions([Condition(
-                    Expression([MemberAccess([VariableAccess("x", -1)])]),
-                    Expression([Value("15")]),
+                    operation_tree([MemberAccess([VariableAccess("x", -1)])]),
+                    operation_tree([Value("15")]),
                     ConditionOperation.LT,
                     False
                 )], []),
                 Statement(VariableUpdate(
                     MemberAccess([VariableAccess("x", -1)]),
                     VariableSetOperation.SET_ADD,
-                    Expression([Value("1")]),
+                    operation_tree([Value("1")]),
                     -1
                 )),
                 [],
@@ -391,37 +717,37 @@ class TestParser(unittest.TestCase):
             )),
             Statement(While(
                 Conditions([Condition(
-                    Expression([MemberAccess([VariableAccess("x", -1)])]),
-                    Expression([Value("15")]),
+                    operation_tree([MemberAccess([VariableAccess("x", -1)])]),
+                    operation_tree([Value("15")]),
                     ConditionOperation.LT,
                     False
                 )], []),
                 Statement(VariableUpdate(
                     MemberAccess([VariableAccess("x", -1)]),
                     VariableSetOperation.SET_ADD,
-                    Expression([Value("1")]),
+                    operation_tree([Value("1")]),
                     -1
                 )),
                 -1
             )),
             Statement(For(
-                Variable([], "i32", [], "x", -1, Expression([Value("1")])),
+                Variable([], "i32", [], "x", -1, operation_tree([Value("1")])),
                 Conditions([Condition(
-                    Expression([MemberAccess([VariableAccess("x", -1)])]),
-                    Expression([Value("15")]),
+                    operation_tree([MemberAccess([VariableAccess("x", -1)])]),
+                    operation_tree([Value("15")]),
                     ConditionOperation.LT,
                     False
                 )], []),
                 VariableUpdate(
                     MemberAccess([VariableAccess("x", -1)]),
                     VariableSetOperation.SET_MULT,
-                    Expression([Value("2")]),
+                    operation_tree([Value("2")]),
                     -1
                 ),
                 Statement(VariableUpdate(
                     MemberAccess([VariableAccess("x", -1)]),
                     VariableSetOperation.SET_ADD,
-                    Expression([Value("1")]),
+                    operation_tree([Value("1")]),
                     -1
                 )),
                 -1
@@ -432,20 +758,20 @@ class TestParser(unittest.TestCase):
                 Statement(VariableUpdate(
                     MemberAccess([VariableAccess("x", -1)]),
                     VariableSetOperation.SET_ADD,
-                    Expression([Value("1")]),
+                    operation_tree([Value("1")]),
                     -1
                 )),
                 -1
             )),
             Statement(Switch(
-                Expression([MemberAccess([VariableAccess("x", -1)]), Value("30")], [Operation.SUB]),
+                operation_tree([MemberAccess([VariableAccess("x", -1)]), Value("30")], [Operation.SUB]),
                 [
                     Case(Value("1"), CaseBody([])),
                     Case(Value("2"), 
                         CaseBody([Statement(VariableUpdate(
                             MemberAccess([VariableAccess("z", -1)]),
                             VariableSetOperation.SET_ADD,
-                            Expression([Value("1")]),
+                            operation_tree([Value("1")]),
                             -1
                         ))])
                     ),
@@ -453,18 +779,18 @@ class TestParser(unittest.TestCase):
                         CaseBody([Statement(VariableUpdate(
                             MemberAccess([VariableAccess("z", -1)]),
                             VariableSetOperation.SET_SUB,
-                            Expression([Value("1")]),
+                            operation_tree([Value("1")]),
                             -1
                         ))]))
                 ]
             )),
-            Statement(MemberAccess([FunctionCall("somefunction", [Expression([Value("1")]), Expression([MemberAccess([VariableAccess("val1", -1)])])])])),
-            Statement(MemberAccess([ConstructorCall("SomeClass", None, [Expression([Value("1")]), Expression([MemberAccess([VariableAccess("val1", -1)])])])])),
-            Statement(Variable(["mut"], "i32", [], "x", -1, Expression([Value("5")]))),
+            Statement(MemberAccess([FunctionCall("somefunction", [operation_tree([Value("1")]), operation_tree([MemberAccess([VariableAccess("val1", -1)])])])])),
+            Statement(MemberAccess([ConstructorCall("SomeClass", None, [operation_tree([Value("1")]), operation_tree([MemberAccess([VariableAccess("val1", -1)])])])])),
+            Statement(Variable(["mut"], "i32", [], "x", -1, operation_tree([Value("5")]))),
             Statement(VariableUpdate(MemberAccess([VariableAccess("x", -1)]), VariableSetOperation.DEC, None, -1)),
             Statement(Asm("\"mov r10, r11\nadd r10, r12\nmov rax, r10\nret\"")),
             Statement(Break()),
-            Statement(Return(Expression([MemberAccess([VariableAccess("x",-1)]), Value("5")], [Operation.SUB])))
+            Statement(Return(operation_tree([MemberAccess([VariableAccess("x",-1)]), Value("5")], [Operation.SUB])))
         ]))
 
     # Test statement collection
@@ -476,15 +802,15 @@ class TestParser(unittest.TestCase):
             If(
                 False,
                 Conditions([Condition(
-                    Expression([MemberAccess([VariableAccess("x", -1)])]),
-                    Expression([Value("15")]),
+                    operation_tree([MemberAccess([VariableAccess("x", -1)])]),
+                    operation_tree([Value("15")]),
                     ConditionOperation.LT,
                     False
                 )], []),
                 Statement(VariableUpdate(
                     MemberAccess([VariableAccess("x", -1)]),
                     VariableSetOperation.SET_ADD,
-                    Expression([Value("1")]),
+                    operation_tree([Value("1")]),
                     -1
                 )),
                 [],
@@ -500,15 +826,15 @@ class TestParser(unittest.TestCase):
         self.assertEqual(statement, Statement(
             While(
                 Conditions([Condition(
-                    Expression([MemberAccess([VariableAccess("x", -1)])]),
-                    Expression([Value("15")]),
+                    operation_tree([MemberAccess([VariableAccess("x", -1)])]),
+                    operation_tree([Value("15")]),
                     ConditionOperation.LT,
                     False
                 )], []),
                 Statement(VariableUpdate(
                     MemberAccess([VariableAccess("x", -1)]),
                     VariableSetOperation.SET_ADD,
-                    Expression([Value("1")]),
+                    operation_tree([Value("1")]),
                     -1
                 )),
                 -1
@@ -521,23 +847,23 @@ class TestParser(unittest.TestCase):
 
         self.assertEqual(statement, Statement(
             For(
-                Variable([], "i32", [], "x", -1, Expression([Value("1")])),
+                Variable([], "i32", [], "x", -1, operation_tree([Value("1")])),
                 Conditions([Condition(
-                    Expression([MemberAccess([VariableAccess("x", -1)])]),
-                    Expression([Value("15")]),
+                    operation_tree([MemberAccess([VariableAccess("x", -1)])]),
+                    operation_tree([Value("15")]),
                     ConditionOperation.LT,
                     False
                 )], []),
                 VariableUpdate(
                     MemberAccess([VariableAccess("x", -1)]),
                     VariableSetOperation.SET_MULT,
-                    Expression([Value("2")]),
+                    operation_tree([Value("2")]),
                     -1
                 ),
                 Statement(VariableUpdate(
                     MemberAccess([VariableAccess("x", -1)]),
                     VariableSetOperation.SET_ADD,
-                    Expression([Value("1")]),
+                    operation_tree([Value("1")]),
                     -1
                 )),
                 -1
@@ -555,7 +881,7 @@ class TestParser(unittest.TestCase):
                 Statement(VariableUpdate(
                     MemberAccess([VariableAccess("x", -1)]),
                     VariableSetOperation.SET_ADD,
-                    Expression([Value("1")]),
+                    operation_tree([Value("1")]),
                     -1
                 )),
                 -1
@@ -568,14 +894,14 @@ class TestParser(unittest.TestCase):
 
         self.assertEqual(switch, Statement(
             Switch(
-                Expression([MemberAccess([VariableAccess("x", -1)]), Value("30")], [Operation.SUB]),
+                operation_tree([MemberAccess([VariableAccess("x", -1)]), Value("30")], [Operation.SUB]),
                 [
                     Case(Value("1"), CaseBody([])),
                     Case(Value("2"), 
                         CaseBody([Statement(VariableUpdate(
                             MemberAccess([VariableAccess("z", -1)]),
                             VariableSetOperation.SET_ADD,
-                            Expression([Value("1")]),
+                            operation_tree([Value("1")]),
                             -1
                         ))])
                     ),
@@ -583,7 +909,7 @@ class TestParser(unittest.TestCase):
                         CaseBody([Statement(VariableUpdate(
                             MemberAccess([VariableAccess("z", -1)]),
                             VariableSetOperation.SET_SUB,
-                            Expression([Value("1")]),
+                            operation_tree([Value("1")]),
                             -1
                         ))]))
                 ]
@@ -593,17 +919,17 @@ class TestParser(unittest.TestCase):
         # Try function call statement
         parser = Parser(Lexer("somefunction(1, val1);"), suppress_err=True)
         statement = parser.parse_statement()
-        self.assertEqual(statement, Statement(MemberAccess([FunctionCall("somefunction", [Expression([Value("1")]), Expression([MemberAccess([VariableAccess("val1", -1)])])])])))
+        self.assertEqual(statement, Statement(MemberAccess([FunctionCall("somefunction", [operation_tree([Value("1")]), operation_tree([MemberAccess([VariableAccess("val1", -1)])])])])))
 
         # Try constructor call statement
         parser = Parser(Lexer("new SomeClass(1, val1);"), suppress_err=True)
         statement = parser.parse_statement()
-        self.assertEqual(statement, Statement(MemberAccess([ConstructorCall("SomeClass", None, [Expression([Value("1")]), Expression([MemberAccess([VariableAccess("val1", -1)])])])])))
+        self.assertEqual(statement, Statement(MemberAccess([ConstructorCall("SomeClass", None, [operation_tree([Value("1")]), operation_tree([MemberAccess([VariableAccess("val1", -1)])])])])))
 
         # Try variable declaration statement
         parser = Parser(Lexer("mut i32 x = 5;"), suppress_err=True)
         statement = parser.parse_statement()
-        self.assertEqual(statement, Statement(Variable(["mut"], "i32", [], "x", -1, Expression([Value("5")]))))
+        self.assertEqual(statement, Statement(Variable(["mut"], "i32", [], "x", -1, operation_tree([Value("5")]))))
 
         # Try variable update statement
         parser = Parser(Lexer("--x;"), suppress_err=True)
@@ -613,7 +939,7 @@ class TestParser(unittest.TestCase):
         # Try return statement
         parser = Parser(Lexer("return x-5;"), suppress_err=True)
         statement = parser.parse_statement()
-        self.assertEqual(statement, Statement(Return(Expression([MemberAccess([VariableAccess("x",-1)]), Value("5")], [Operation.SUB]))))
+        self.assertEqual(statement, Statement(Return(operation_tree([MemberAccess([VariableAccess("x",-1)]), Value("5")], [Operation.SUB]))))
 
         # Try break statement
         parser = Parser(Lexer("break;"), suppress_err=True)
@@ -635,7 +961,7 @@ class TestParser(unittest.TestCase):
         # Try new class return
         parser = Parser(Lexer("return new SomeClass();"), suppress_err=True)
         ret = parser.parse_return()
-        self.assertEqual(ret, Return(Expression([MemberAccess([ConstructorCall("SomeClass", None, [])])])))
+        self.assertEqual(ret, Return(operation_tree([MemberAccess([ConstructorCall("SomeClass", None, [])])])))
 
     # Test ASM collection
     def test_parse_asm_block(self):
@@ -653,15 +979,15 @@ class TestParser(unittest.TestCase):
         self.assertEqual(if_block, If(
             False,
             Conditions([Condition(
-                Expression([MemberAccess([VariableAccess("x", -1)])]),
-                Expression([Value("15")]),
+                operation_tree([MemberAccess([VariableAccess("x", -1)])]),
+                operation_tree([Value("15")]),
                 ConditionOperation.LT,
                 False
             )], []),
             Statement(VariableUpdate(
                 MemberAccess([VariableAccess("x", -1)]),
                 VariableSetOperation.SET_ADD,
-                Expression([Value("1")]),
+                operation_tree([Value("1")]),
                 -1
             )),
             [],
@@ -676,15 +1002,15 @@ class TestParser(unittest.TestCase):
         self.assertEqual(if_block, If(
             True,
             Conditions([Condition(
-                Expression([MemberAccess([VariableAccess("x", -1)])]),
-                Expression([Value("15")]),
+                operation_tree([MemberAccess([VariableAccess("x", -1)])]),
+                operation_tree([Value("15")]),
                 ConditionOperation.LT,
                 False
             )], []),
             Statement(VariableUpdate(
                 MemberAccess([VariableAccess("x", -1)]),
                 VariableSetOperation.SET_ADD,
-                Expression([Value("1")]),
+                operation_tree([Value("1")]),
                 -1
             )),
             [],
@@ -699,15 +1025,15 @@ class TestParser(unittest.TestCase):
         self.assertEqual(if_block, If(
             False,
             Conditions([Condition(
-                Expression([MemberAccess([VariableAccess("x", -1)])]),
-                Expression([Value("15")]),
+                operation_tree([MemberAccess([VariableAccess("x", -1)])]),
+                operation_tree([Value("15")]),
                 ConditionOperation.LT,
                 False
             )], []),
             Body([Statement(VariableUpdate(
                 MemberAccess([VariableAccess("x", -1)]),
                 VariableSetOperation.SET_ADD,
-                Expression([Value("1")]),
+                operation_tree([Value("1")]),
                 -1
             ))]),
             [],
@@ -722,22 +1048,22 @@ class TestParser(unittest.TestCase):
         self.assertEqual(if_block, If(
             False,
             Conditions([Condition(
-                Expression([MemberAccess([VariableAccess("x", -1)])]),
-                Expression([Value("15")]),
+                operation_tree([MemberAccess([VariableAccess("x", -1)])]),
+                operation_tree([Value("15")]),
                 ConditionOperation.LT,
                 False
             )], []),
             Statement(VariableUpdate(
                 MemberAccess([VariableAccess("x", -1)]),
                 VariableSetOperation.SET_ADD,
-                Expression([Value("1")]),
+                operation_tree([Value("1")]),
                 -1
             )),
             [],
             Body([Statement(VariableUpdate(
                 MemberAccess([VariableAccess("x", -1)]),
                 VariableSetOperation.SET_SUB,
-                Expression([Value("1")]),
+                operation_tree([Value("1")]),
                 -1
             ))]),
             -1
@@ -750,30 +1076,30 @@ class TestParser(unittest.TestCase):
         self.assertEqual(if_block, If(
             False,
             Conditions([Condition(
-                Expression([MemberAccess([VariableAccess("x", -1)])]),
-                Expression([Value("15")]),
+                operation_tree([MemberAccess([VariableAccess("x", -1)])]),
+                operation_tree([Value("15")]),
                 ConditionOperation.LT,
                 False
             )], []),
             Statement(VariableUpdate(
                 MemberAccess([VariableAccess("x", -1)]),
                 VariableSetOperation.SET_ADD,
-                Expression([Value("1")]),
+                operation_tree([Value("1")]),
                 -1
             )),
             [
                 If(
                     False,
                     Conditions([Condition(
-                        Expression([MemberAccess([VariableAccess("x", -1)])]),
-                        Expression([Value("30")]),
+                        operation_tree([MemberAccess([VariableAccess("x", -1)])]),
+                        operation_tree([Value("30")]),
                         ConditionOperation.LT,
                         False
                     )], []),
                     Statement(VariableUpdate(
                         MemberAccess([VariableAccess("x", -1)]),
                         VariableSetOperation.SET_ADD,
-                        Expression([Value("2")]),
+                        operation_tree([Value("2")]),
                         -1
                     )),
                     [], None, -1
@@ -781,15 +1107,15 @@ class TestParser(unittest.TestCase):
                 If(
                     False,
                     Conditions([Condition(
-                        Expression([MemberAccess([VariableAccess("x", -1)])]),
-                        Expression([Value("45")]),
+                        operation_tree([MemberAccess([VariableAccess("x", -1)])]),
+                        operation_tree([Value("45")]),
                         ConditionOperation.LT,
                         False
                     )], []),
                     Statement(VariableUpdate(
                         MemberAccess([VariableAccess("x", -1)]),
                         VariableSetOperation.SET_ADD,
-                        Expression([Value("3")]),
+                        operation_tree([Value("3")]),
                         -1
                     )),
                     [], None, -1
@@ -798,7 +1124,7 @@ class TestParser(unittest.TestCase):
             Statement(VariableUpdate(
                 MemberAccess([VariableAccess("x", -1)]),
                 VariableSetOperation.SET_SUB,
-                Expression([Value("1")]),
+                operation_tree([Value("1")]),
                 -1
             )),
             -1
@@ -811,30 +1137,30 @@ class TestParser(unittest.TestCase):
         self.assertEqual(if_block, If(
             False,
             Conditions([Condition(
-                Expression([MemberAccess([VariableAccess("x", -1)])]),
-                Expression([Value("15")]),
+                operation_tree([MemberAccess([VariableAccess("x", -1)])]),
+                operation_tree([Value("15")]),
                 ConditionOperation.LT,
                 False
             )], []),
             Body([Statement(VariableUpdate(
                 MemberAccess([VariableAccess("x", -1)]),
                 VariableSetOperation.SET_ADD,
-                Expression([Value("1")]),
+                operation_tree([Value("1")]),
                 -1
             ))]),
             [
                 If(
                     False,
                     Conditions([Condition(
-                        Expression([MemberAccess([VariableAccess("x", -1)])]),
-                        Expression([Value("30")]),
+                        operation_tree([MemberAccess([VariableAccess("x", -1)])]),
+                        operation_tree([Value("30")]),
                         ConditionOperation.LT,
                         False
                     )], []),
                     Body([Statement(VariableUpdate(
                         MemberAccess([VariableAccess("x", -1)]),
                         VariableSetOperation.SET_ADD,
-                        Expression([Value("2")]),
+                        operation_tree([Value("2")]),
                         -1
                     ))]),
                     [], None, -1
@@ -842,15 +1168,15 @@ class TestParser(unittest.TestCase):
                 If(
                     False,
                     Conditions([Condition(
-                        Expression([MemberAccess([VariableAccess("x", -1)])]),
-                        Expression([Value("45")]),
+                        operation_tree([MemberAccess([VariableAccess("x", -1)])]),
+                        operation_tree([Value("45")]),
                         ConditionOperation.LT,
                         False
                     )], []),
                     Body([Statement(VariableUpdate(
                         MemberAccess([VariableAccess("x", -1)]),
                         VariableSetOperation.SET_ADD,
-                        Expression([Value("3")]),
+                        operation_tree([Value("3")]),
                         -1
                     ))]),
                     [], None, -1
@@ -859,7 +1185,7 @@ class TestParser(unittest.TestCase):
             Body([Statement(VariableUpdate(
                 MemberAccess([VariableAccess("x", -1)]),
                 VariableSetOperation.SET_SUB,
-                Expression([Value("1")]),
+                operation_tree([Value("1")]),
                 -1
             ))]),
             -1
@@ -873,15 +1199,15 @@ class TestParser(unittest.TestCase):
 
         self.assertEqual(while_block, While(
             Conditions([Condition(
-                Expression([MemberAccess([VariableAccess("x", -1)])]),
-                Expression([Value("15")]),
+                operation_tree([MemberAccess([VariableAccess("x", -1)])]),
+                operation_tree([Value("15")]),
                 ConditionOperation.LT,
                 False
             )], []),
             Statement(VariableUpdate(
                 MemberAccess([VariableAccess("x", -1)]),
                 VariableSetOperation.SET_ADD,
-                Expression([Value("1")]),
+                operation_tree([Value("1")]),
                 -1
             )),
             -1
@@ -893,8 +1219,8 @@ class TestParser(unittest.TestCase):
 
         self.assertEqual(while_block, While(
             Conditions([Condition(
-                Expression([MemberAccess([VariableAccess("x", -1)])]),
-                Expression([Value("15")]),
+                operation_tree([MemberAccess([VariableAccess("x", -1)])]),
+                operation_tree([Value("15")]),
                 ConditionOperation.LT,
                 False
             )], []),
@@ -902,13 +1228,13 @@ class TestParser(unittest.TestCase):
                 Statement(VariableUpdate(
                     MemberAccess([VariableAccess("x", -1)]),
                     VariableSetOperation.SET_ADD,
-                    Expression([Value("1")]),
+                    operation_tree([Value("1")]),
                     -1
                 )),
                 Statement(VariableUpdate(
                     MemberAccess([VariableAccess("x", -1)]),
                     VariableSetOperation.SET_DIV,
-                    Expression([Value("5")]),
+                    operation_tree([Value("5")]),
                     -1
                 ))
             ]),
@@ -922,23 +1248,23 @@ class TestParser(unittest.TestCase):
         for_block = parser.parse_for_block()
 
         self.assertEqual(for_block, For(
-            Variable([], "i32", [], "x", -1, Expression([Value("1")])),
+            Variable([], "i32", [], "x", -1, operation_tree([Value("1")])),
             Conditions([Condition(
-                Expression([MemberAccess([VariableAccess("x", -1)])]),
-                Expression([Value("15")]),
+                operation_tree([MemberAccess([VariableAccess("x", -1)])]),
+                operation_tree([Value("15")]),
                 ConditionOperation.LT,
                 False
             )], []),
             VariableUpdate(
                 MemberAccess([VariableAccess("x", -1)]),
                 VariableSetOperation.SET_MULT,
-                Expression([Value("2")]),
+                operation_tree([Value("2")]),
                 -1
             ),
             Statement(VariableUpdate(
                 MemberAccess([VariableAccess("x", -1)]),
                 VariableSetOperation.SET_ADD,
-                Expression([Value("1")]),
+                operation_tree([Value("1")]),
                 -1
             )),
             -1
@@ -949,30 +1275,30 @@ class TestParser(unittest.TestCase):
         for_block = parser.parse_for_block()
 
         self.assertEqual(for_block, For(
-            Variable([], "i32", [], "x", -1, Expression([Value("1")])),
+            Variable([], "i32", [], "x", -1, operation_tree([Value("1")])),
             Conditions([Condition(
-                Expression([MemberAccess([VariableAccess("x", -1)])]),
-                Expression([Value("15")]),
+                operation_tree([MemberAccess([VariableAccess("x", -1)])]),
+                operation_tree([Value("15")]),
                 ConditionOperation.LT,
                 False
             )], []),
             VariableUpdate(
                 MemberAccess([VariableAccess("x", -1)]),
                 VariableSetOperation.SET_MULT,
-                Expression([Value("2")]),
+                operation_tree([Value("2")]),
                 -1
             ),
             Body([
                 Statement(VariableUpdate(
                     MemberAccess([VariableAccess("x", -1)]),
                     VariableSetOperation.SET_ADD,
-                    Expression([Value("1")]),
+                    operation_tree([Value("1")]),
                     -1
                 )),
                 Statement(VariableUpdate(
                     MemberAccess([VariableAccess("x", -1)]),
                     VariableSetOperation.SET_DIV,
-                    Expression([Value("5")]),
+                    operation_tree([Value("5")]),
                     -1
                 ))
             ]),
@@ -991,7 +1317,7 @@ class TestParser(unittest.TestCase):
             Statement(VariableUpdate(
                 MemberAccess([VariableAccess("x", -1)]),
                 VariableSetOperation.SET_ADD,
-                Expression([Value("1")]),
+                operation_tree([Value("1")]),
                 -1
             )),
             -1
@@ -1008,13 +1334,13 @@ class TestParser(unittest.TestCase):
                 Statement(VariableUpdate(
                     MemberAccess([VariableAccess("x", -1)]),
                     VariableSetOperation.SET_ADD,
-                    Expression([Value("1")]),
+                    operation_tree([Value("1")]),
                     -1
                 )),
                 Statement(VariableUpdate(
                     MemberAccess([VariableAccess("x", -1)]),
                     VariableSetOperation.SET_DIV,
-                    Expression([Value("5")]),
+                    operation_tree([Value("5")]),
                     -1
                 ))
             ]),
@@ -1027,14 +1353,14 @@ class TestParser(unittest.TestCase):
         switch = parser.parse_switch()
 
         self.assertEqual(switch, Switch(
-            Expression([MemberAccess([VariableAccess("x", -1)]), Value("30")], [Operation.SUB]),
+            operation_tree([MemberAccess([VariableAccess("x", -1)]), Value("30")], [Operation.SUB]),
             [
                 Case(Value("1"), CaseBody([])),
                 Case(Value("2"), 
                      CaseBody([Statement(VariableUpdate(
                         MemberAccess([VariableAccess("z", -1)]),
                         VariableSetOperation.SET_ADD,
-                        Expression([Value("1")]),
+                        operation_tree([Value("1")]),
                         -1
                     ))])
                 ),
@@ -1042,7 +1368,7 @@ class TestParser(unittest.TestCase):
                      CaseBody([Statement(VariableUpdate(
                         MemberAccess([VariableAccess("z", -1)]),
                         VariableSetOperation.SET_SUB,
-                        Expression([Value("1")]),
+                        operation_tree([Value("1")]),
                         -1
                     ))]))
             ]
@@ -1059,7 +1385,7 @@ class TestParser(unittest.TestCase):
                 Statement(VariableUpdate(
                     MemberAccess([VariableAccess("z", -1)]),
                     VariableSetOperation.SET_ADD,
-                    Expression([Value("1")]),
+                    operation_tree([Value("1")]),
                     -1
                 )),
                 Statement(Break())]
@@ -1073,26 +1399,26 @@ class TestParser(unittest.TestCase):
         conditions = parser.parse_conditions()
         self.assertEqual(conditions, Conditions([
             Condition(
-                Expression([MemberAccess([VariableAccess("a", -1)])], []),
-                Expression([MemberAccess([VariableAccess("b", -1)])], []),
+                operation_tree([MemberAccess([VariableAccess("a", -1)])], []),
+                operation_tree([MemberAccess([VariableAccess("b", -1)])], []),
                 ConditionOperation.EQ,
                 False
             ),
             Condition(
-                Expression([MemberAccess([VariableAccess("c", -1)])], []),
-                Expression([MemberAccess([VariableAccess("d", -1)])], []),
+                operation_tree([MemberAccess([VariableAccess("c", -1)])], []),
+                operation_tree([MemberAccess([VariableAccess("d", -1)])], []),
                 ConditionOperation.NEQ,
                 False
             ),
             Condition(
-                Expression([MemberAccess([VariableAccess("e", -1)])], []),
-                Expression([MemberAccess([VariableAccess("f", -1)])], []),
+                operation_tree([MemberAccess([VariableAccess("e", -1)])], []),
+                operation_tree([MemberAccess([VariableAccess("f", -1)])], []),
                 ConditionOperation.LT,
                 False
             ),
             Condition(
-                Expression([MemberAccess([VariableAccess("g", -1)])], []),
-                Expression([MemberAccess([VariableAccess("h", -1)])], []),
+                operation_tree([MemberAccess([VariableAccess("g", -1)])], []),
+                operation_tree([MemberAccess([VariableAccess("h", -1)])], []),
                 ConditionOperation.GEQ,
                 False
             )], 
@@ -1104,21 +1430,21 @@ class TestParser(unittest.TestCase):
         conditions = parser.parse_conditions()
         self.assertEqual(conditions, Conditions([
             Condition(
-                Expression([MemberAccess([VariableAccess("a", -1)])], []),
-                Expression([MemberAccess([VariableAccess("b", -1)])], []),
+                operation_tree([MemberAccess([VariableAccess("a", -1)])], []),
+                operation_tree([MemberAccess([VariableAccess("b", -1)])], []),
                 ConditionOperation.EQ,
                 False
             ),
             Conditions([
                 Condition(
-                    Expression([MemberAccess([VariableAccess("c", -1)])], []),
-                    Expression([MemberAccess([VariableAccess("d", -1)])], []),
+                    operation_tree([MemberAccess([VariableAccess("c", -1)])], []),
+                    operation_tree([MemberAccess([VariableAccess("d", -1)])], []),
                     ConditionOperation.EQ,
                     True
                 ),
                 Condition(
-                    Expression([MemberAccess([VariableAccess("e", -1)])], []),
-                    Expression([MemberAccess([VariableAccess("f", -1)])], []),
+                    operation_tree([MemberAccess([VariableAccess("e", -1)])], []),
+                    operation_tree([MemberAccess([VariableAccess("f", -1)])], []),
                     ConditionOperation.EQ,
                     True
                 )],
@@ -1133,8 +1459,8 @@ class TestParser(unittest.TestCase):
         parser = Parser(Lexer("a + b > c;"), suppress_err=True)
         condition = parser.parse_condition()
         self.assertEqual(condition, Condition(
-            Expression([MemberAccess([VariableAccess("a", -1)]), MemberAccess([VariableAccess("b", -1)])], [Operation.ADD]),
-            Expression([MemberAccess([VariableAccess("c", -1)])], []),
+            operation_tree([MemberAccess([VariableAccess("a", -1)]), MemberAccess([VariableAccess("b", -1)])], [Operation.ADD]),
+            operation_tree([MemberAccess([VariableAccess("c", -1)])], []),
             ConditionOperation.GT,
             False))
 
@@ -1142,8 +1468,8 @@ class TestParser(unittest.TestCase):
         parser = Parser(Lexer("a + b >= c;"), suppress_err=True)
         condition = parser.parse_condition()
         self.assertEqual(condition, Condition(
-            Expression([MemberAccess([VariableAccess("a", -1)]), MemberAccess([VariableAccess("b", -1)])], [Operation.ADD]),
-            Expression([MemberAccess([VariableAccess("c", -1)])], []),
+            operation_tree([MemberAccess([VariableAccess("a", -1)]), MemberAccess([VariableAccess("b", -1)])], [Operation.ADD]),
+            operation_tree([MemberAccess([VariableAccess("c", -1)])], []),
             ConditionOperation.GEQ,
             False))
 
@@ -1151,8 +1477,8 @@ class TestParser(unittest.TestCase):
         parser = Parser(Lexer("a + b < c;"), suppress_err=True)
         condition = parser.parse_condition()
         self.assertEqual(condition, Condition(
-            Expression([MemberAccess([VariableAccess("a", -1)]), MemberAccess([VariableAccess("b", -1)])], [Operation.ADD]),
-            Expression([MemberAccess([VariableAccess("c", -1)])], []),
+            operation_tree([MemberAccess([VariableAccess("a", -1)]), MemberAccess([VariableAccess("b", -1)])], [Operation.ADD]),
+            operation_tree([MemberAccess([VariableAccess("c", -1)])], []),
             ConditionOperation.LT,
             False))
 
@@ -1160,8 +1486,8 @@ class TestParser(unittest.TestCase):
         parser = Parser(Lexer("a + b <= c;"), suppress_err=True)
         condition = parser.parse_condition()
         self.assertEqual(condition, Condition(
-            Expression([MemberAccess([VariableAccess("a", -1)]), MemberAccess([VariableAccess("b", -1)])], [Operation.ADD]),
-            Expression([MemberAccess([VariableAccess("c", -1)])], []),
+            operation_tree([MemberAccess([VariableAccess("a", -1)]), MemberAccess([VariableAccess("b", -1)])], [Operation.ADD]),
+            operation_tree([MemberAccess([VariableAccess("c", -1)])], []),
             ConditionOperation.LEQ,
             False))
 
@@ -1169,8 +1495,8 @@ class TestParser(unittest.TestCase):
         parser = Parser(Lexer("a + b == c;"), suppress_err=True)
         condition = parser.parse_condition()
         self.assertEqual(condition, Condition(
-            Expression([MemberAccess([VariableAccess("a", -1)]), MemberAccess([VariableAccess("b", -1)])], [Operation.ADD]),
-            Expression([MemberAccess([VariableAccess("c", -1)])], []),
+            operation_tree([MemberAccess([VariableAccess("a", -1)]), MemberAccess([VariableAccess("b", -1)])], [Operation.ADD]),
+            operation_tree([MemberAccess([VariableAccess("c", -1)])], []),
             ConditionOperation.EQ,
             False))
 
@@ -1178,11 +1504,18 @@ class TestParser(unittest.TestCase):
         parser = Parser(Lexer("a + b != c;"), suppress_err=True)
         condition = parser.parse_condition()
         self.assertEqual(condition, Condition(
-            Expression([MemberAccess([VariableAccess("a", -1)]), MemberAccess([VariableAccess("b", -1)])], [Operation.ADD]),
-            Expression([MemberAccess([VariableAccess("c", -1)])], []),
+            operation_tree([MemberAccess([VariableAccess("a", -1)]), MemberAccess([VariableAccess("b", -1)])], [Operation.ADD]),
+            operation_tree([MemberAccess([VariableAccess("c", -1)])], []),
             ConditionOperation.NEQ,
             False))
 
+        # Test invalid condition operation
+        parser = Parser(Lexer("a + b = c;"), suppress_err=True)
+        with self.assertRaises(ParseError) as context:
+            parser.parse_condition()
+        self.assertEqual(context.exception.diagnostic, Diagnostic("Invalid condition operation: =", 6, [
+            Token.TokenType.LEQ, Token.TokenType.LT, Token.TokenType.GEQ, Token.TokenType.GT, Token.TokenType.NEQ, Token.TokenType.EQ]))
+
     # Test variable update collection
     def test_parse_variable_update(self):
         # Test member access update
@@ -1191,7 +1524,7 @@ class TestParser(unittest.TestCase):
         self.assertEqual(update, VariableUpdate(
             MemberAccess([VariableAccess("a", -1), VariableAccess("b", -1), VariableAccess("c", -1)]),
             VariableSetOperation.SET_ADD,
-            Expression([Value("1")]),
+            operation_tree([Value("1")]),
             -1
         ))
 
@@ -1201,7 +1534,7 @@ class TestParser(unittest.TestCase):
         self.assertEqual(update, VariableUpdate(
             MemberAccess([VariableAccess("a", -1)]),
             VariableSetOperation.SET_ADD,
-            Expression([MemberAccess([VariableAccess("b", -1)])]),
+            operation_tree([MemberAccess([VariableAccess("b", -1)])]),
             -1
         ))
 
@@ -1211,7 +1544,7 @@ class TestParser(unittest.TestCase):
         self.assertEqual(update, VariableUpdate(
             MemberAccess([VariableAccess("a", -1)]),
             VariableSetOperation.SET_SUB,
-            Expression([MemberAccess([VariableAccess("b", -1)])]),
+            operation_tree([MemberAccess([VariableAccess("b", -1)])]),
             -1
         ))
 
@@ -1221,7 +1554,7 @@ class TestParser(unittest.TestCase):
         self.assertEqual(update, VariableUpdate(
             MemberAccess([VariableAccess("a", -1)]),
             VariableSetOperation.SET_MULT,
-            Expression([MemberAccess([VariableAccess("b", -1)])]),
+            operation_tree([MemberAccess([VariableAccess("b", -1)])]),
             -1
         ))
 
@@ -1231,7 +1564,7 @@ class TestParser(unittest.TestCase):
         self.assertEqual(update, VariableUpdate(
             MemberAccess([VariableAccess("a", -1)]),
             VariableSetOperation.SET_DIV,
-            Expression([MemberAccess([VariableAccess("b", -1)])]),
+            operation_tree([MemberAccess([VariableAccess("b", -1)])]),
             -1
         ))
 
@@ -1241,7 +1574,7 @@ class TestParser(unittest.TestCase):
         self.assertEqual(update, VariableUpdate(
             MemberAccess([VariableAccess("a", -1)]),
             VariableSetOperation.SET_MOD,
-            Expression([MemberAccess([VariableAccess("b", -1)])]),
+            operation_tree([MemberAccess([VariableAccess("b", -1)])]),
             -1
         ))
 
@@ -1283,4 +1616,112 @@ class TestParser(unittest.TestCase):
             VariableSetOperation.DEC,
             None,
             -1
-        ))
\ No newline at end of file
+        ))
+
+class TestParserCursor(TestParser):
+
+    # Rerun every parser test handing the Parser a cursor instead of a Lexer to tokenize
+    def setUp(self):
+        lexer = Lexer
+        patcher = mock.patch(f'{__name__}.Lexer', lambda text: TokenCursor(lexer(text).tokenize_all()))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+class TestTableParser(unittest.TestCase):
+
+    # Test LL(2) table generation
+    def test_grammar(self):
+        build_x, build_y = lambda v: 'x', lambda v: 'y'
+        g = Grammar([("S : A B | A C", build_x), ("S : A", build_y)], {'A': 'a', 'B': 'b', 'C': 'c'}, 'S')
+        productions = g.nonterminals['S'].productions
+        self.assertEqual([str(production) for production in productions], ["S : A B", "S : A C", "S : A"])
+        self.assertEqual(g.nonterminals['S'].row, {'a': {'b': productions[0], 'c': productions[1], None: productions[2]}})
+        self.assertIsNone(g.nonterminals['S'].default)
+        self.assertListEqual(g.conflicts, [])
+
+        # Only the ambiguities the hand-written parser settles by checking its cases in order (class members and mods
+        # are ambiguous since a class declaration leaves its close brace to the caller)
+        conflicts = {(str(nonterminal), tuple(str(production) for production in productions)) for nonterminal, _, productions in grammar.conflicts}
+        self.assertSetEqual(conflicts, {
+            ("OptClassMember", ("OptClassMember : ClassMember ClassMembers", "OptClassMember : empty")),
+            *{("Mods", (f"Mods : {mod} Mods", "Mods : empty")) for mod in ["PUBLIC", "STATIC", "SEALED", "ABSTRACT", "MUTABLE"]},
+            ("ElseBlock", ("ElseBlock : ELSE Lookahead ElseContent", "ElseBlock : Lookahead")),
+            ("ElseContent", ("ElseContent : IfBlock", "ElseContent : Statement")),
+            ("CaseStatements", ("CaseStatements : BREAK SEMICOLON", "CaseStatements : Statement CaseStatements")),
+            ("CaseStatements", ("CaseStatements : Return", "CaseStatements : Statement CaseStatements")),
+            ("ConditionTerm", ("ConditionTerm : LPAREN Conditions RPAREN", "ConditionTerm : Condition")),
+        })
+
+    # Test that both parsers build the same nodes
+    def test_parse_class(self):
+        sources = [
+            '''public abstract class MyClass<T, U> extends ParentClass {
+                   mut u8 a = 5;
+                   static List<T> z;
+                   constructor(i32 b, List<T> c) { a = b; }
+                   public u32 func operator + (MyClass o) { return a + o.a; }
+                   u32 func g(u32 a);
+                   void func f() {
+                       if (a > 1) a = 1; else if constexpr (!(b < 2 && c == 3) || d != e) { b++; } else { return; }
+                       if (a > 1) if (b > 1) a = 1; else a = 2;
+                       while (a < 10) a *= 2;
+                       for (u32 i = 0; i < 10; i++) { a -= i * (2 + b) % 3; }
+                       foreach (u32 x in this.items) s += x;
+                       switch (a) { case 1: a = 2; break; case B.c: return a; default: --a; }
+                       switch (a) { case 1: a = 2; break; }
+                       asm {"mov rax, 1"}
+                       mut List<T> l = new List<T>(1, f(2), 'c');
+                       this.g(1).h = 0x1F;
+                       g(a);
+                   }
+                   class Inner { u8 q; }
+               }''',
+            "class A { public }",
+        ]
+        for source in sources:
+            expected = Parser(Lexer(source), suppress_err=True).parse_class()
+            self.assertEqual(TableParser(Lexer(source), suppress_err=True).parse_class(), expected)
+            self.assertEqual(TableParser(TokenCursor(Lexer(source).tokenize_all()), suppress_err=True).parse_class(), expected)
+
+        # Positions are the same too
+        source = "class A { u8 func f() { if (a > 1) { a = 1; } b = 2; while (a < 1) a++; } }"
+        expected = Parser(Lexer(source), suppress_err=True).parse_class().body.functions[0].body.statements
+        statements = TableParser(Lexer(source), suppress_err=True).parse_class().body.functions[0].body.statements
+        self.assertEqual(statements[0].statement.end_pos, expected[0].statement.end_pos)
+        self.assertEqual(statements[1].statement.pos, expected[1].statement.pos)
+        self.assertEqual(statements[2].statement.end_pos, expected[2].statement.end_pos)
+
+    # Test parsing a single rule
+    def test_parse_rule(self):
+        lexer = Lexer("a + (b * c) - f(1) ;")
+        self.assertEqual(TableParser(lexer).parse('Expression'), Parser(Lexer("a + (b * c) - f(1) ;")).parse_expression())
+        self.assertEqual(lexer.peek_next().type, Token.TokenType.SEMICOLON)
+        self.assertEqual(TableParser(Lexer("~a + ~~(b - 1) ;")).parse('Expression'), Parser(Lexer("~a + ~~(b - 1) ;")).parse_expression())
+
+        self.assertEqual(TableParser(Lexer("a > 1 && (b < 2 || !c == d)")).parse('Conditions'),
+                         Parser(Lexer("a > 1 && (b < 2 || !c == d)")).parse_conditions())
+
+    # Test nesting deeper than the recursion limit
+    def test_parse_deep_nesting(self):
+        source = "class A { u8 func f() { a = " + "(" * 5000 + "1" + ")" * 5000 + "; } }"
+        self.assertEqual(TableParser(Lexer(source)).parse_class().body.functions[0].body.statements[0].statement.val, Value("1"))
+
+        source = "class A { u8 func f() { if (a > 0) a = 0; " + "else if (a > 1) a = 1; " * 5000 + "} }"
+        self.assertEqual(len(TableParser(Lexer(source)).parse_class().body.functions[0].body.statements[0].statement.elseifs), 5000)
+
+    # Test errors
+    def test_parse_errors(self):
+        source = "class A { u8 func f() { a = 1 } }"
+        with self.assertRaises(ParseError) as context:
+            TableParser(Lexer(source), suppress_err=True).parse_class()
+        self.assertEqual(context.exception.diagnostic, Diagnostic("Expected SEMICOLON, not }", source.index('} }'), [Token.TokenType.SEMICOLON]))
+
+        source = "class A { u8 func f() { if (a > 1) a = 1;"
+        with self.assertRaises(ParseError) as context:
+            TableParser(Lexer(source), suppress_err=True).parse_class()
+        self.assertEqual(context.exception.diagnostic, Diagnostic("Unexpected end of file ...", len(source), []))
+
+        source = "class A { u8 a; + }"
+        with self.assertRaises(ParseError) as context:
+            TableParser(Lexer(source), suppress_err=True).parse_class()
+        self.assertEqual(context.exception.diagnostic, Diagnostic("Expected member in class body ...", source.index('+'), []))